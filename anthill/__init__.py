@@ -1,4 +1,23 @@
-from .core import Anthill
-from .types import Agent, Response
+from importlib import import_module
 
-__all__ = ["Anthill", "Agent", "Response"]
+__all__ = ["Anthill", "Agent", "Response", "ConversationBuffer"]
+
+# loaded on first access, so `import anthill` stays cheap
+_exports = {
+    "Anthill": ".core",
+    "Agent": ".types",
+    "Response": ".types",
+    "ConversationBuffer": ".history",
+}
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,116 @@
+from contextlib import nullcontext
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Optional, Union
+
+
+class ClientManager:
+    """
+    Drop-in replacement for `pulsar.client.Client` that keeps one provider
+    client per provider, instead of building a new one (with a new HTTP
+    session) on every call. Keep-alive connections are pooled across calls,
+    threads and `Anthill` instances, so only the first call to a host pays
+    for the connection and TLS setup.
+
+    Args:
+        pool_connections (int): Number of hosts to keep pools for.
+        pool_maxsize (int): Connections kept open per host.
+        max_concurrency (int or dict): Calls in flight at once, for every
+            provider or per provider name. `None` means no limit.
+        provider_kwargs (dict): Keyword arguments to build each provider
+            client with, e.g. `{"ollama": {"base_url": "http://gpu:11434"}}`.
+        max_retries (int): Retries of the provider clients' own retry loop.
+            `None` keeps each provider's default (3 for groq, 0 for the
+            others). A call can override it with its own `max_retries`, as
+            a `RequestScheduler` does so that failed calls are retried in
+            one place only; it then gets a provider client of its own.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 32,
+        max_concurrency: Union[int, Dict[str, int], None] = None,
+        provider_kwargs: Optional[Dict[str, dict]] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_concurrency = max_concurrency
+        self.provider_kwargs = provider_kwargs or {}
+        self.max_retries = max_retries
+        self._clients = {}
+        self._semaphores = {}
+        self._lock = Lock()
+
+    def provider_client(self, provider: str, max_retries: Optional[int] = None):
+        """The shared client of a provider, created on first use, with its own `max_retries` if given."""
+        if max_retries is None:
+            max_retries = self.max_retries
+        # pulsar reads the retries from the client, so each setting has its own
+        key = (provider, max_retries)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                from pulsar.client import provide_map
+                from requests.adapters import HTTPAdapter
+
+                kwargs = self.provider_kwargs.get(provider, {})
+                if max_retries is not None:
+                    kwargs = {**kwargs, "max_retries": max_retries}
+                client = provide_map[provider](**kwargs)
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                client.session.mount("https://", adapter)
+                client.session.mount("http://", adapter)
+                self._clients[key] = client
+        return client
+
+    def limit(self, provider: str):
+        """Context manager holding one of the provider's concurrency slots."""
+        limit = self.max_concurrency
+        if isinstance(limit, dict):
+            limit = limit.get(provider)
+        if limit is None:
+            return nullcontext()
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            with self._lock:
+                semaphore = self._semaphores.setdefault(provider, BoundedSemaphore(limit))
+        return semaphore
+
+    def chat_completion(self, messages, model: str, stream: bool = False, max_retries: Optional[int] = None,
+                        **kwargs):
+        provider, _, model_name = model.partition("/")
+        client = self.provider_client(provider, max_retries)
+        if stream:
+            return self._stream(client, provider, messages=messages, model=model_name, **kwargs)
+        with self.limit(provider):
+            return client.chat_completion(messages=messages, model=model_name, stream=False, **kwargs)
+
+    def _stream(self, client, provider, **kwargs):
+        # the slot is taken when the stream starts and released when it is
+        # exhausted or closed
+        with self.limit(provider):
+            yield from client.chat_completion(stream=True, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.session.close()
+            self._clients.clear()
+
+
+_default_manager = None
+_default_lock = Lock()
+
+
+def default_client_manager() -> ClientManager:
+    """The `ClientManager` shared by every `Anthill` created without a client."""
+    global _default_manager
+    if _default_manager is None:
+        with _default_lock:
+            if _default_manager is None:
+                _default_manager = ClientManager()
+    return _default_manager
@@ -0,0 +1,147 @@
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from .manifest import ToolManifest
+
+
+def completion_key(create_params: dict, manifest: ToolManifest) -> str:
+    """
+    Stable hash of a completion request: model, system prompt, messages,
+    tool schemas and model params. Streamed and non streamed requests share
+    the same key.
+    """
+    params = {k: v for k, v in create_params.items() if k not in ("stream", "response_type")}
+    params["response_schema"] = manifest.schema_digest
+    payload = json.dumps(params, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dump_response(response):
+    if response is None:
+        return None
+    if isinstance(response, list):
+        return [dump_response(r) for r in response]
+    # the fields the model set only, so that a rebuilt model has the same `model_fields_set`
+    return response.model_dump(mode="json", exclude_unset=True)
+
+
+def load_response(payload, manifest: ToolManifest):
+    if payload is None:
+        return None
+    if isinstance(payload, list):
+        return [load_response(p, manifest) for p in payload]
+    # recorded chunks may be partial, so they are rebuilt without validation
+    return manifest.model_map[payload["func_name"]].model_construct(**payload)
+
+
+class CompletionCache(ABC):
+    """
+    Base class of completion caches.
+
+    A cached completion is the list of parsed chunks the client returned: a
+    single one for a non streamed completion. Streamed requests replay every
+    chunk, non streamed ones get the last chunk. The model that produced it,
+    which may be a fallback or hedge model, is stored with the chunks.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """The stored entry of `key`, as dumped by `save`, or None."""
+
+    @abstractmethod
+    def set(self, key: str, entry: dict) -> None:
+        """Store the dumped entry of `key`."""
+
+    def load(self, key: str, manifest: ToolManifest) -> Optional[Tuple[Optional[str], List]]:
+        """The `(model, chunks)` stored for `key`, or None. `model` is None for entries saved without one."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        if isinstance(entry, list):
+            # an entry written before models were stored
+            entry = {"model": None, "chunks": entry}
+        return entry["model"], [load_response(chunk, manifest) for chunk in entry["chunks"]]
+
+    def save(self, key: str, chunks: List, model: Optional[str] = None) -> None:
+        if chunks:
+            self.set(key, {"model": model, "chunks": [dump_response(chunk) for chunk in chunks]})
+
+    def record(self, key: str, completion, model: Optional[str] = None):
+        """Yield a completion stream, saving its chunks once it is fully consumed."""
+        chunks = []
+        for chunk in completion:
+            chunks.append(chunk)
+            yield chunk
+        self.save(key, chunks, model)
+
+    async def arecord(self, key: str, completion, model: Optional[str] = None):
+        chunks = []
+        async for chunk in completion:
+            chunks.append(chunk)
+            yield chunk
+        self.save(key, chunks, model)
+
+
+class InMemoryCompletionCache(CompletionCache):
+    """LRU completion cache kept in memory."""
+
+    def __init__(self, maxsize: Optional[int] = 1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCompletionCache(CompletionCache):
+    """Completion cache stored in a SQLite file, shared across processes and runs."""
+
+    def __init__(self, path: str):
+        import sqlite3
+
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, chunks TEXT NOT NULL)")
+        self._connection.commit()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT chunks FROM completions WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions (key, chunks) VALUES (?, ?)", (key, json.dumps(entry)))
+            self._connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM completions")
+            self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
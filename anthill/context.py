@@ -0,0 +1,279 @@
+import copy
+from collections.abc import Mapping
+from threading import Lock
+from typing import Dict, Set, Tuple
+
+_IMMUTABLE_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+_MISSING = object()
+
+
+def _equal(value, baseline) -> bool:
+    try:
+        return bool(value == baseline)
+    except Exception:
+        # e.g. arrays, whose comparison is ambiguous: count it as a change
+        return False
+
+
+class ContextVariables(dict):
+    """
+    Copy-on-write, versioned `context_variables` for a single run.
+
+    Starts as a shallow copy of the caller's dict and deep copies a mutable
+    value only the first time it is read, so agent functions can change the
+    context freely without touching the caller's dict and without a deepcopy
+    of the values a run never reads. Copies such as `dict(ctx)` or
+    `{**ctx}` read every value, so they get the run's copies too.
+
+    `version` and `key_version()` are conservative: a mutable value can be
+    changed in place by whoever reads it, so reading one bumps them like a
+    change does. `checkpoint()` reports real changes only: mutable values
+    read during the turn are compared with their value at the previous
+    checkpoint.
+
+    Parallel tool calls share the context: its bookkeeping is done under a
+    lock, so they get the same copy of a value read for the first time.
+    """
+
+    __slots__ = ("_owned", "version", "turn", "_versions", "_written", "_read", "_removed", "_baseline",
+                 "_lock", "__weakref__")
+
+    def __init__(self, base=None):
+        super().__init__(base or {})
+        self._owned = set()
+        self.version = 0
+        self.turn = 0
+        self._versions: Dict[str, int] = {}
+        self._written: Set[str] = set()
+        self._read: Set[str] = set()
+        self._removed: Set[str] = set()
+        # the mutable values as of the last checkpoint, to tell whether a read changed them
+        self._baseline: Dict[str, object] = {}
+        self._lock = Lock()
+
+    def _own(self, key, value):
+        self._owned.add(key)
+        if not isinstance(value, _IMMUTABLE_TYPES):
+            # the caller's value is never changed, so it is its own baseline
+            self._baseline[key] = value
+            value = copy.deepcopy(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _touch(self, key):
+        self.version += 1
+        self._versions[key] = self.version
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if key in self._owned and isinstance(value, _IMMUTABLE_TYPES):
+            return value
+        with self._lock:
+            value = dict.__getitem__(self, key)
+            if key not in self._owned:
+                value = self._own(key, value)
+            if not isinstance(value, _IMMUTABLE_TYPES):
+                self._touch(key)
+                self._read.add(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if dict.__contains__(self, key):
+                old = dict.__getitem__(self, key)
+                if old is value or (isinstance(value, _IMMUTABLE_TYPES) and type(old) is type(value)
+                                    and old == value):
+                    self._owned.add(key)
+                    return
+            dict.__setitem__(self, key, value)
+            self._owned.add(key)
+            self._removed.discard(key)
+            self._written.add(key)
+            self._touch(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            dict.__delitem__(self, key)
+            self._owned.discard(key)
+            self._baseline.pop(key, None)
+            self._touch(key)
+            self._written.discard(key)
+            self._read.discard(key)
+            self._removed.add(key)
+
+    def __iter__(self):
+        # not dict's own iterator, so that `dict(ctx)`, `{**ctx}` and `d.update(ctx)` read every
+        # value through `__getitem__` instead of copying the caller's values as they are
+        return dict.__iter__(self)
+
+    def key_version(self, key) -> int:
+        """The `version` of the last change, or read of a mutable value, of `key`; 0 if there was none."""
+        return self._versions.get(key, 0)
+
+    @property
+    def dirty(self) -> Set[str]:
+        """Keys that may have changed since the last checkpoint: set, removed, or mutable and read."""
+        return self._written | self._read | self._removed
+
+    def checkpoint(self) -> Tuple[Dict[str, object], Set[str]]:
+        """
+        End a turn: return the values changed and the keys removed since the
+        previous checkpoint, and start tracking the next turn.
+        """
+        with self._lock:
+            changed = {key: dict.__getitem__(self, key) for key in self._written}
+            for key in self._read - self._written:
+                value = dict.__getitem__(self, key)
+                if not _equal(value, self._baseline.get(key, _MISSING)):
+                    changed[key] = value
+            for key, value in changed.items():
+                if isinstance(value, _IMMUTABLE_TYPES):
+                    self._baseline.pop(key, None)
+                else:
+                    self._baseline[key] = copy.deepcopy(value)
+            removed = self._removed
+            self._written, self._read, self._removed = set(), set(), set()
+            self.turn += 1
+        return changed, removed
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(dict.keys(self)):
+            del self[key]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        merged = self.copy()
+        merged.update(other)
+        return merged
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def copy(self):
+        """A new context with the current values and no history, tracking its own changes."""
+        return ContextVariables(self.to_dict())
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return ContextVariables(copy.deepcopy(self.to_dict(), memo))
+
+    def __reduce__(self):
+        # the bookkeeping (and its lock) belongs to the run: a pickled context starts afresh
+        return ContextVariables, (self.to_dict(),)
+
+    def to_dict(self) -> dict:
+        """
+        Plain dict of the current values. Values the run never read are shared
+        with the caller's dict, as in a shallow copy.
+        """
+        return dict(dict.items(self))
+
+
+def detach(context: Mapping) -> ContextVariables:
+    """A copy of a context that shares no mutable value with it once read, for `merge` to apply back."""
+    return ContextVariables(context.to_dict() if isinstance(context, ContextVariables) else dict(context))
+
+
+def merge(context: dict, detached: ContextVariables) -> None:
+    """Apply the changes made to a `detach`ed copy back to its context."""
+    changed, removed = detached.checkpoint()
+    context.update(changed)
+    for key in removed:
+        if key in context:
+            del context[key]
+
+
+class ContextView(Mapping):
+    """
+    Read-only view of a context in which missing keys read as "", like a
+    `defaultdict(str)` copy of it, but without copying it on every turn.
+    """
+
+    __slots__ = ("context",)
+
+    def __init__(self, context: Mapping):
+        self.context = context
+
+    def __getitem__(self, key):
+        if key in self.context:
+            return self.context[key]
+        return ""
+
+    def get(self, key, default=None):
+        return self.context.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.context
+
+    def __iter__(self):
+        return iter(self.context)
+
+    def __len__(self):
+        return len(self.context)
+
+
+class TrackingContextView(ContextView):
+    """A `ContextView` that records the keys read through it, and whether it was iterated."""
+
+    __slots__ = ("reads", "iterated")
+
+    def __init__(self, context: Mapping):
+        super().__init__(context)
+        self.reads = set()
+        self.iterated = False
+
+    def __getitem__(self, key):
+        self.reads.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.reads.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.reads.add(key)
+        return super().__contains__(key)
+
+    def __iter__(self):
+        self.iterated = True
+        return super().__iter__()
+
+    def __len__(self):
+        self.iterated = True
+        return super().__len__()
@@ -1,20 +1,37 @@
 # Standard library imports
-import copy
-import json
-from collections import defaultdict
-from typing import List, Optional, Union
+import contextvars
+import inspect
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from threading import Lock
+from typing import Iterator, List, Optional, Union
 
 # Package/library imports
-from pulsar.client import Client
-from pulsar.prompt import AGENTIC_PROMPT
-from pulsar.helpers import function_to_pydantic
+from pydantic import ValidationError
 
 # Local imports
 from .util import debug_print
-from .prompt import build_prompt
+from .clients import default_client_manager
+from .completion_cache import CompletionCache, completion_key
+from .context import ContextVariables, ContextView, detach, merge
+from .graph import AgentGraph
+from .history import ConversationBuffer, message_chars, project_history
+from .invoker import call_name
+from .instructions import InstructionsCache
+from .manifest import __CTX_VARS_NAME__, get_manifest
+from .prompt import agentic_prompt, build_prompt
+from .scheduler import PRIORITY_BATCH, request_priority
+from .sessions import SessionStore
+from .stream import AsyncCompletionStream, CompletionStream, DeltaTracker
+from .timeouts import ToolTimeout
+from .tracing import RunTrace, Tracer, current_trace
 from .types import (
     Agent,
     AgentResponse,
+    BatchResult,
+    ContextDiff,
     Message,
     Response,
     Result,
@@ -22,49 +39,138 @@ from .types import (
 # import logging
 # logging.basicConfig(level=logging.DEBUG)
 
-__CTX_VARS_NAME__ = "context_variables"
-
 
 class Anthill:
-    def __init__(self, client=None):
+    def __init__(
+        self,
+        client=None,
+        max_tool_workers=None,
+        completion_cache: Optional[CompletionCache] = None,
+        tracer: Optional[Tracer] = None,
+        session_store: Optional[SessionStore] = None,
+        graph: Optional[AgentGraph] = None,
+        instructions_cache: Optional[InstructionsCache] = None,
+        max_timed_tool_workers: int = 32,
+    ):
         if client is None:
-            client = Client()
+            client = default_client_manager()
 
         self.client = client
+        self.completion_cache = completion_cache
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.session_store = session_store
+        self.graph = graph
+        self.instructions_cache = instructions_cache
+        self.max_tool_workers = max_tool_workers
+        self.max_timed_tool_workers = max_timed_tool_workers
+        self._tool_executor = None
+        self._timeout_executor = None
+        self._model_executor = None
+        # concurrent runs (run_batch) may all reach for a pool at once
+        self._executor_lock = Lock()
 
-    def get_chat_completion(
+    def _executor(self, attribute: str, **kwargs) -> ThreadPoolExecutor:
+        executor = getattr(self, attribute)
+        if executor is None:
+            with self._executor_lock:
+                executor = getattr(self, attribute)
+                if executor is None:
+                    executor = ThreadPoolExecutor(**kwargs)
+                    setattr(self, attribute, executor)
+        return executor
+
+    @property
+    def tool_executor(self) -> ThreadPoolExecutor:
+        """Thread pool running tool calls in parallel, created on first use."""
+        return self._executor("_tool_executor", max_workers=self.max_tool_workers,
+                              thread_name_prefix="anthill-tool")
+
+    @property
+    def timeout_executor(self) -> ThreadPoolExecutor:
+        """
+        Thread pool running sync tool calls that have a deadline, created on
+        first use, with at most `max_timed_tool_workers` threads. A call that
+        times out keeps its thread until it returns.
+        """
+        return self._executor("_timeout_executor", max_workers=self.max_timed_tool_workers,
+                              thread_name_prefix="anthill-timed-tool")
+
+    @property
+    def model_executor(self) -> ThreadPoolExecutor:
+        """Thread pool running hedged model calls, created on first use."""
+        return self._executor("_model_executor", thread_name_prefix="anthill-model")
+
+    def close(self) -> None:
+        """
+        Shut down the thread pools without waiting for the calls still
+        running, e.g. tool calls that timed out. The client is not closed.
+        """
+        with self._executor_lock:
+            executors = self._tool_executor, self._timeout_executor, self._model_executor
+            self._tool_executor = self._timeout_executor = self._model_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _manifest(self, agent):
+        node = self.graph.node(agent) if self.graph is not None else None
+        return node.manifest if node is not None else get_manifest(agent)
+
+    def _run_state(self, agent, messages, context_variables, session_id, max_duration=None):
+        if session_id is not None and self.session_store is None:
+            raise ValueError("session_id requires an Anthill created with a session_store")
+        return _RunState(agent, messages, context_variables, self.tracer,
+                         self.session_store if session_id is not None else None, session_id, max_duration)
+
+    def _completion_params(
         self,
         agent: Agent,
-        history: List,
+        history: Union[List, ConversationBuffer],
         context_variables: dict,
         model_override: str,
         stream: bool,
         debug: bool,
-    ) -> Message:
-        context_variables = defaultdict(str, context_variables)
-        instructions = (
-            agent.instructions(context_variables)
-            if callable(agent.instructions)
-            else agent.instructions
-        )
-        instructions = "\n".join(
-            [f"- {i}" for i in instructions]) if isinstance(instructions, list) else instructions
-  
-        tool_list = [{"name": f.__name__, "doc": f.__doc__ if f.__doc__ is not None else ""}
-                     for f in agent.functions]
-        tool_list.append({"name": "agent_response", "doc": "Use this tool to answer/ask to user"})
-  
-        system_prompt = build_prompt(
-            agent.name, instructions, tool_list)
-        messages = []
-
-        for h in history:
-            if h["content"] is not None:
-                messages.append(dict(role=h["role"], content=h["content"]))
-            tool_calls = h.get("tool_calls") or []
-            for t in tool_calls:
-                tool = t["arguments"]
-                messages.append(dict(role=h["role"], content=str(tool)))
+        trace: RunTrace,
+    ) -> dict:
+        node = self.graph.node(agent) if self.graph is not None else None
+        with trace.span("schema_build", agent=agent.name):
+            manifest = node.manifest if node is not None else get_manifest(agent)
+
+        reduced = None
+        if agent.history_policy is not None:
+            with trace.span("history_reduction", agent=agent.name):
+                # policies must not modify the entries they are given
+                entries = history.entries if isinstance(history, ConversationBuffer) else history
+                reduced = agent.history_policy(entries)
+                if reduced is entries:
+                    reduced = None
+
+        with trace.span("prompt_build", agent=agent.name):
+            if node is not None and node.system_prompt is not None:
+                system_prompt = node.system_prompt
+            elif self.instructions_cache is not None and callable(agent.instructions):
+                system_prompt = self.instructions_cache.system_prompt(
+                    agent, manifest, context_variables, partial(self._system_prompt, agent, manifest))
+            else:
+                system_prompt = self._system_prompt(agent, manifest, ContextView(context_variables))
+
+            if not isinstance(history, ConversationBuffer):
+                messages = project_history(reduced if reduced is not None else history)
+                chars = message_chars(messages)
+            elif reduced is not None:
+                # only the entries the policy changed are converted again
+                messages, chars = history.project(reduced)
+            else:
+                messages = history.messages
+                chars = history.chars
+        trace.add_prompt(len(system_prompt) + chars, len(messages))
 
         debug_print(
             debug,
@@ -72,47 +178,292 @@ class Anthill:
             system_prompt,
             messages)
 
-        pydc_functions = [function_to_pydantic(f, include_name=True, skip_params=[__CTX_VARS_NAME__]) for f in agent.functions]
-
-        if len(pydc_functions) > 1:
-            response_type = Union[AgentResponse, List[Union[*pydc_functions]]]
-        elif len(pydc_functions) > 0:
-            response_type = Union[AgentResponse, List[*pydc_functions]]
-        else:
-            response_type = AgentResponse
-
         create_params = {
             "model": model_override or agent.model,
             "messages": messages,
             "system": system_prompt,
-            "response_type": response_type,
+            "response_type": manifest.response_type,
             "stream": stream,
-            "prompt_template": AGENTIC_PROMPT,
+            "prompt_template": agentic_prompt(),
             **agent.model_params
         }
+        return create_params
+
+    def _system_prompt(self, agent, manifest, context_variables):
+        instructions = (
+            agent.instructions(context_variables)
+            if callable(agent.instructions)
+            else agent.instructions
+        )
+        instructions = "\n".join(
+            [f"- {i}" for i in instructions]) if isinstance(instructions, list) else instructions
+
+        return build_prompt(
+            agent.name, instructions, manifest.tool_list, template=agent.prompt_template)
+
+    def get_chat_completion(
+        self,
+        agent: Agent,
+        history: Union[List, ConversationBuffer],
+        context_variables: dict,
+        model_override: str,
+        stream: bool,
+        debug: bool,
+        bypass_cache: bool = False,
+        trace: Optional[RunTrace] = None,
+    ) -> Message:
+        trace = trace or RunTrace(self.tracer)
+        create_params = self._completion_params(
+            agent, history, context_variables, model_override, stream, debug, trace)
+
+        cache = None if bypass_cache else self.completion_cache
+        if cache is None:
+            model, response = self._complete(create_params, agent, model_override, trace)
+        else:
+            manifest = self._manifest(agent)
+            key = completion_key(create_params, manifest)
+            cached = cache.load(key, manifest)
+            if cached is not None:
+                debug_print(debug, "Completion cache hit:", key)
+                model, chunks = cached
+                model, response = model or create_params["model"], iter(chunks) if stream else chunks[-1]
+            else:
+                model, response = self._complete(create_params, agent, model_override, trace)
+                if stream:
+                    response = cache.record(key, response, model)
+                else:
+                    cache.save(key, [response], model)
 
-        response = self.client.chat_completion(**create_params)
         if stream:
+            return CompletionStream(response, model)
+        return self._make_message(response, agent, model)
+
+    def _models(self, create_params, agent, model_override):
+        # an overridden model is pinned: no fallback
+        if model_override:
+            return [create_params["model"]]
+        return [create_params["model"], *agent.fallback_models]
+
+    def _complete(self, create_params, agent, model_override, trace):
+        """Call the client, falling back and hedging over the agent's models. Returns (model, response)."""
+        models = self._models(create_params, agent, model_override)
+        if len(models) == 1:
+            return models[0], self._call_client(create_params, trace, agent)
+        if agent.hedge_after is None:
+            return self._fallback_completion(create_params, models, trace, agent)
+        return self._hedged_completion(create_params, models, agent.hedge_after, trace, agent)
+
+    def _start_completion(self, create_params, model, trace, agent):
+        # a stream counts as started, and valid, once its first chunk arrived
+        params = {**create_params, "model": model}
+        response = self._call_client(params, trace, agent)
+        if not params["stream"]:
             return response
-        return self._make_message(response, agent)
+        chunks = iter(response)
+        return _StartedStream(next(chunks, _STREAM_DONE), chunks)
+
+    def _fallback_completion(self, create_params, models, trace, agent):
+        for index, model in enumerate(models):
+            try:
+                return model, _resume(self._start_completion(create_params, model, trace, agent))
+            except Exception as e:
+                if index == len(models) - 1:
+                    raise
+                now = time.perf_counter()
+                trace.record("fallback", now, now, {"model": model, "error": type(e).__name__})
+
+    def _hedged_completion(self, create_params, models, hedge_after, trace, agent):
+        models = list(models)
+        pending = {}
+        error = None
 
-    def _make_message(self, response, agent):
+        def launch():
+            model = models.pop(0)
+            context = contextvars.copy_context()
+            future = self.model_executor.submit(
+                context.run, self._start_completion, create_params, model, trace, agent)
+            pending[future] = model
+
+        launch()
+        while pending:
+            # hedge once the only request in flight is slower than hedge_after
+            timeout = hedge_after if models and len(pending) == 1 else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                now = time.perf_counter()
+                trace.record("hedge", now, now, {"model": models[0]})
+                launch()
+                continue
+
+            for future in done:
+                model = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    if models and not pending:
+                        launch()
+                    continue
+                # losers include futures finished in the same `done` set:
+                # the callback closes their streams right away
+                for loser in pending:
+                    loser.cancel()
+                    loser.add_done_callback(_discard_completion)
+                return model, _resume(response)
+        raise error
+
+    def _call_client(self, create_params, trace, agent):
+        token = current_trace.set(trace)
+        try:
+            # streamed calls are timed by the run loop, as they last until the
+            # stream is consumed
+            if create_params["stream"]:
+                return self.client.chat_completion(**create_params)
+            with trace.span("model_call", agent=agent.name, model=create_params["model"]):
+                return self.client.chat_completion(**create_params)
+        finally:
+            current_trace.reset(token)
+
+    async def aget_chat_completion(
+        self,
+        agent: Agent,
+        history: Union[List, ConversationBuffer],
+        context_variables: dict,
+        model_override: str,
+        stream: bool,
+        debug: bool,
+        bypass_cache: bool = False,
+        trace: Optional[RunTrace] = None,
+    ) -> Message:
+        trace = trace or RunTrace(self.tracer)
+        params = (agent, history, context_variables, model_override, stream, debug, trace)
+        if agent.history_policy is not None:
+            # a policy may block, e.g. RollingSummary calling a model: keep it off the event loop
+            context = contextvars.copy_context()
+            create_params = await _running_loop().run_in_executor(
+                None, partial(context.run, self._completion_params, *params))
+        else:
+            create_params = self._completion_params(*params)
+
+        cache = None if bypass_cache else self.completion_cache
+        if cache is not None:
+            manifest = self._manifest(agent)
+            key = completion_key(create_params, manifest)
+            cached = cache.load(key, manifest)
+            if cached is not None:
+                debug_print(debug, "Completion cache hit:", key)
+                model, chunks = cached
+                model = model or create_params["model"]
+                if stream:
+                    return AsyncCompletionStream(_aiter_chunks(chunks), model)
+                return self._make_message(chunks[-1], agent, model)
+
+        model, response = await self._acomplete(create_params, agent, model_override, trace)
+        if stream:
+            if cache is not None:
+                response = cache.arecord(key, response, model)
+            return AsyncCompletionStream(response, model)
+
+        if cache is not None:
+            cache.save(key, [response], model)
+        return self._make_message(response, agent, model)
+
+    async def _acomplete(self, create_params, agent, model_override, trace):
+        models = self._models(create_params, agent, model_override)
+        if len(models) == 1:
+            return models[0], await self._acall_model(create_params, trace, agent)
+        if agent.hedge_after is None:
+            for index, model in enumerate(models):
+                try:
+                    return model, _aresume(await self._astart_completion(create_params, model, trace, agent))
+                except Exception as e:
+                    if index == len(models) - 1:
+                        raise
+                    now = time.perf_counter()
+                    trace.record("fallback", now, now, {"model": model, "error": type(e).__name__})
+        return await self._ahedged_completion(create_params, models, agent.hedge_after, trace, agent)
+
+    async def _acall_model(self, create_params, trace, agent):
+        if create_params["stream"]:
+            return _aiter_chunks(await self._acall_client(create_params, trace))
+        with trace.span("model_call", agent=agent.name, model=create_params["model"]):
+            return await self._acall_client(create_params, trace)
+
+    async def _astart_completion(self, create_params, model, trace, agent):
+        params = {**create_params, "model": model}
+        response = await self._acall_model(params, trace, agent)
+        if not params["stream"]:
+            return response
+        return _StartedStream(await anext(response, _STREAM_DONE), response)
+
+    async def _ahedged_completion(self, create_params, models, hedge_after, trace, agent):
+        import asyncio
+
+        models = list(models)
+        pending = {}
+        error = None
+
+        def launch():
+            model = models.pop(0)
+            task = asyncio.ensure_future(self._astart_completion(create_params, model, trace, agent))
+            pending[task] = model
+
+        launch()
+        while pending:
+            timeout = hedge_after if models and len(pending) == 1 else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                now = time.perf_counter()
+                trace.record("hedge", now, now, {"model": models[0]})
+                launch()
+                continue
+
+            for task in done:
+                model = pending.pop(task)
+                try:
+                    response = task.result()
+                except Exception as e:
+                    error = e
+                    if models and not pending:
+                        launch()
+                    continue
+                # losers include tasks finished in the same `done` set, or
+                # before cancel() could stop them: their streams are closed
+                for loser in pending:
+                    loser.cancel()
+                    loser.add_done_callback(_adiscard_completion)
+                return model, _aresume(response)
+        raise error
+
+    async def _acall_client(self, create_params, trace):
+        token = current_trace.set(trace)
+        try:
+            chat_completion = self.client.chat_completion
+            if inspect.iscoroutinefunction(chat_completion):
+                return await chat_completion(**create_params)
+            # executor threads don't inherit the context (trace, priority)
+            loop = _running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(None, partial(context.run, chat_completion, **create_params))
+        finally:
+            current_trace.reset(token)
+
+    def _make_message(self, response, agent, model=None):
         if response is None:
-            return Message(sender=agent.name, role="assistant", content=None)
+            return Message(sender=agent.name, role="assistant", content=None, model=model)
 
         if isinstance(response, AgentResponse):
             return Message(sender=agent.name, role="assistant",
-                           content=response.content)
+                           content=response.content, model=model)
 
         response = response if isinstance(response, list) else [response]
-        tool_calls = []
-        for r in response:
-            args = r.model_dump(mode="json")
-            name = args.pop("func_name")
-            tool_calls.append({"name": name, "arguments": args})
+        tool_calls = [_tool_call(r) for r in response]
 
-        return Message(sender=agent.name, role="assistant",
-                       tool_calls=tool_calls)
+        message = Message(sender=agent.name, role="assistant",
+                          tool_calls=tool_calls, model=model)
+        # the validated models, for tools to read their arguments from
+        message._parsed_tool_calls = response
+        return message
 
     def handle_function_result(self, result, debug) -> Result:
         match result:
@@ -140,75 +491,195 @@ class Anthill:
         current_agent: Agent,
         context_variables: dict,
         debug: bool,
+        parallel: Optional[bool] = None,
+        trace: Optional[RunTrace] = None,
+        deadline: Optional[float] = None,
+    ) -> Response:
+        trace = trace or RunTrace(self.tracer)
+        invokers = self._manifest(current_agent).invokers
+        calls = [self._prepare_tool_call(tool_call, invokers, context_variables, current_agent.tool_timeout)
+                 for tool_call in tool_calls]
+
+        if self._is_parallel(parallel, current_agent, calls):
+            futures = [self.tool_executor.submit(self._call_tool, *call, trace, deadline) for call in calls]
+            raw_results = [future.result() for future in futures]
+        else:
+            raw_results = (self._call_tool(*call, trace, deadline) for call in calls)
+
+        return self._merge_tool_results(calls, raw_results, debug)
+
+    async def ahandle_tool_calls(
+        self,
+        tool_calls: List,
+        current_agent: Agent,
+        context_variables: dict,
+        debug: bool,
+        parallel: Optional[bool] = None,
+        trace: Optional[RunTrace] = None,
+        deadline: Optional[float] = None,
     ) -> Response:
+        trace = trace or RunTrace(self.tracer)
+        invokers = self._manifest(current_agent).invokers
+        calls = [self._prepare_tool_call(tool_call, invokers, context_variables, current_agent.tool_timeout)
+                 for tool_call in tool_calls]
+
+        if self._is_parallel(parallel, current_agent, calls):
+            raw_results = await _gather(*[self._acall_tool(*call, trace, deadline) for call in calls])
+        else:
+            raw_results = [await self._acall_tool(*call, trace, deadline) for call in calls]
+
+        return self._merge_tool_results(calls, raw_results, debug)
+
+    def _merge_tool_results(self, calls, raw_results, debug) -> Response:
         partial_response = Response(
             messages=[], agent=None, context_variables={})
-        
-        tool_dict = {f.__name__: f for f in current_agent.functions}
 
-        for tool_call in tool_calls:
-            name = tool_call["name"]
-            args = tool_call["arguments"]
+        # results are merged in call order whatever order they finished in
+        for (name, *_), raw_result in zip(calls, raw_results):
+            if isinstance(raw_result, ToolTimeout):
+                partial_response.messages.append(raw_result.message())
+                continue
+            result: Result = self.handle_function_result(raw_result, debug)
+            self._add_tool_result(partial_response, name, result)
 
-            func = tool_dict[name]
-            
-            if __CTX_VARS_NAME__ in func.__code__.co_varnames:
-                args[__CTX_VARS_NAME__] = context_variables
+        return partial_response
 
-            raw_result = func(**args)
+    def _call_tool_after(self, previous, name, invoker, args, timeout, trace, deadline):
+        # keeps early dispatched calls sequential unless running in parallel
+        if previous is not None:
+            wait([previous])
+        return self._call_tool(name, invoker, args, timeout, trace, deadline)
 
-            result: Result = self.handle_function_result(raw_result, debug)
+    def _call_tool(self, name, invoker, args, timeout, trace, deadline=None):
+        timeout = _remaining(timeout, deadline)
+        if timeout is None:
+            with trace.span("tool_call", tool=name):
+                return invoker(args)
+        if timeout <= 0:
+            return self._tool_timed_out(name, 0.0, trace)
 
-            partial_response.messages.append(
-                {
-                    "role": "tool",
-                    # "tool_call_id": func.id,
-                    "tool_name": name,
-                    "content": f"Tool {name} finished with status: {result.value}",
-                }
-            )
-            partial_response.context_variables.update(result.context_variables)
-            if result.agent:
-                partial_response.agent = result.agent
+        # a thread can't be stopped: on timeout the call is abandoned, not
+        # killed, so it works on a detached context whose changes are only
+        # merged back if it finishes in time
+        context = args[__CTX_VARS_NAME__] if invoker.takes_context else None
+        if context is not None:
+            detached = detach(context)
+            args = {**args, __CTX_VARS_NAME__: detached}
+        future = self.timeout_executor.submit(self._call_tool, name, invoker, args, None, trace)
+        try:
+            result = future.result(timeout)
+        except FutureTimeoutError:
+            # a call still queued was never started: every worker is busy
+            started = not future.cancel()
+            return self._tool_timed_out(name, timeout, trace, started)
+        if context is not None:
+            merge(context, detached)
+        return result
 
-        return partial_response
+    async def _acall_tool(self, name, invoker, args, timeout, trace, deadline=None):
+        # async tools run on the loop, sync ones in the default executor
+        if not invoker.is_async:
+            loop = _running_loop()
+            return await loop.run_in_executor(None, self._call_tool, name, invoker, args, timeout, trace, deadline)
+
+        timeout = _remaining(timeout, deadline)
+        if timeout is not None and timeout <= 0:
+            return self._tool_timed_out(name, 0.0, trace)
+
+        try:
+            with trace.span("tool_call", tool=name):
+                # on timeout the call is cancelled where it is awaiting
+                return await _wait_for(invoker.acall(args), timeout)
+        except TimeoutError:
+            return self._tool_timed_out(name, timeout, trace)
+
+    def _tool_timed_out(self, name, timeout, trace, started=True) -> ToolTimeout:
+        now = time.perf_counter()
+        trace.record("tool_timeout", now, now, {"tool": name, "timeout": timeout, "started": started})
+        return ToolTimeout(name, timeout, started)
+
+    def _is_parallel(self, parallel, agent, calls):
+        if parallel is None:
+            parallel = agent.parallel_tool_calls
+        return parallel and len(calls) > 1
+
+    def _prepare_tool_call(self, tool_call, invokers, context_variables, default_timeout=None):
+        name = call_name(tool_call)
+        invoker = invokers[name]
+        timeout = invoker.timeout if invoker.timeout is not None else default_timeout
+        return name, invoker, invoker.arguments(tool_call, context_variables), timeout
+
+    def _add_tool_result(self, partial_response, name, result):
+        partial_response.messages.append(
+            {
+                "role": "tool",
+                # "tool_call_id": func.id,
+                "tool_name": name,
+                "content": f"Tool {name} finished with status: {result.value}",
+            }
+        )
+        partial_response.context_variables.update(result.context_variables)
+        if result.agent:
+            partial_response.agent = result.agent
 
     def run_and_stream(
         self,
         agent: Agent,
-        messages: List,
+        messages: Union[List, ConversationBuffer],
         context_variables: dict = {},
         model_override: str = None,
         debug: bool = False,
         max_turns: int = float("inf"),
+        max_duration: Optional[float] = None,
         execute_tools: bool = True,
+        parallel_tool_calls: Optional[bool] = None,
+        bypass_cache: bool = False,
+        stream_deltas: bool = False,
+        early_tool_dispatch: bool = False,
+        session_id: Optional[str] = None,
     ):
-        active_agent = agent
-        context_variables = copy.deepcopy(context_variables)
-        history = copy.deepcopy(messages)
-        init_len = len(messages)
+        state = self._run_state(agent, messages, context_variables, session_id, max_duration)
 
-        while len(history) - init_len < max_turns:
+        while state.turns_left(max_turns):
             # get completion with current history, agent
+            start = state.turn_start()
+            dispatch = None
+            if early_tool_dispatch and execute_tools:
+                dispatch = _EarlyDispatch(
+                    self, state.agent, state.context_variables, parallel_tool_calls, state.trace, state.deadline)
             completion = self.get_chat_completion(
-                agent=active_agent,
-                history=history,
-                context_variables=context_variables,
+                agent=state.agent,
+                history=state.history,
+                context_variables=state.context_variables,
                 model_override=model_override,
+                bypass_cache=bypass_cache,
                 stream=True,
                 debug=debug,
+                trace=state.trace,
             )
 
             yield {"delim": "start"}
-            for chunk in completion:
-                message = self._make_message(chunk, active_agent)
-                yield message
+            if stream_deltas:
+                tracker = DeltaTracker(state.agent.name)
+                for chunk in completion:
+                    state.first_chunk(start)
+                    if dispatch is not None:
+                        dispatch.feed(chunk)
+                    yield from tracker.feed(chunk)
+                yield from tracker.finish()
+                message = self._make_message(tracker.last, state.agent, completion.model)
+            else:
+                for chunk in completion:
+                    state.first_chunk(start)
+                    if dispatch is not None:
+                        dispatch.feed(chunk)
+                    message = self._make_message(chunk, state.agent, completion.model)
+                    yield message
             yield {"delim": "end"}
+            state.streamed(start)
 
             debug_print(debug, "Received completion:", message)
-            history.append(
-                json.loads(message.model_dump_json())
-            )
+            state.add_message(message)
             tool_calls = message.tool_calls or []
             if len(tool_calls) == 0 or not execute_tools:
                 debug_print(debug, "Ending turn.")
@@ -216,32 +687,33 @@ class Anthill:
 
             # handle function calls, updating context_variables, and switching
             # agents
-            partial_response = self.handle_tool_calls(
-                message.tool_calls, active_agent, context_variables, debug
-            )
-            history.extend(partial_response.messages)
-            context_variables.update(partial_response.context_variables)
-            if partial_response.agent:
-                active_agent = partial_response.agent
-
-        yield {
-            "response": Response(
-                messages=history[init_len:],
-                agent=active_agent,
-                context_variables=context_variables,
-            )
-        }
+            if dispatch is not None:
+                partial_response = dispatch.results(_tool_calls(message), debug)
+            else:
+                partial_response = self.handle_tool_calls(
+                    _tool_calls(message), state.agent, state.context_variables, debug,
+                    parallel=parallel_tool_calls, trace=state.trace, deadline=state.deadline,
+                )
+            state.apply(partial_response)
+
+        yield {"response": state.response()}
 
     def run(
         self,
         agent: Agent,
-        messages: List,
+        messages: Union[List, ConversationBuffer],
         context_variables: dict = {},
         model_override: str = None,
         stream: bool = False,
         debug: bool = False,
         max_turns: int = float("inf"),
+        max_duration: Optional[float] = None,
         execute_tools: bool = True,
+        parallel_tool_calls: Optional[bool] = None,
+        bypass_cache: bool = False,
+        stream_deltas: bool = False,
+        early_tool_dispatch: bool = False,
+        session_id: Optional[str] = None,
     ) -> Response:
         if stream:
             return self.run_and_stream(
@@ -251,29 +723,32 @@ class Anthill:
                 model_override=model_override,
                 debug=debug,
                 max_turns=max_turns,
+                max_duration=max_duration,
                 execute_tools=execute_tools,
+                parallel_tool_calls=parallel_tool_calls,
+                bypass_cache=bypass_cache,
+                stream_deltas=stream_deltas,
+                early_tool_dispatch=early_tool_dispatch,
+                session_id=session_id,
             )
-        active_agent = agent
-        context_variables = copy.deepcopy(context_variables)
-        history = copy.deepcopy(messages)
-        init_len = len(messages)
+        state = self._run_state(agent, messages, context_variables, session_id, max_duration)
 
-        while len(history) - init_len < max_turns and active_agent:
+        while state.turns_left(max_turns) and state.agent:
 
             # get completion with current history, agent
             message = self.get_chat_completion(
-                agent=active_agent,
-                history=history,
-                context_variables=context_variables,
+                agent=state.agent,
+                history=state.history,
+                context_variables=state.context_variables,
                 model_override=model_override,
+                bypass_cache=bypass_cache,
                 stream=stream,
                 debug=debug,
+                trace=state.trace,
             )
             debug_print(debug, "Received completion:", message)
             # message.sender = active_agent.name
-            history.append(
-                json.loads(message.model_dump_json())
-            )
+            state.add_message(message)
 
             if not message.tool_calls or not execute_tools:
                 debug_print(debug, "Ending turn.")
@@ -282,15 +757,471 @@ class Anthill:
             # handle function calls, updating context_variables, and switching
             # agents
             partial_response = self.handle_tool_calls(
-                message.tool_calls, active_agent, context_variables, debug
+                _tool_calls(message), state.agent, state.context_variables, debug,
+                parallel=parallel_tool_calls, trace=state.trace, deadline=state.deadline,
             )
-            history.extend(partial_response.messages)
-            context_variables.update(partial_response.context_variables)
-            if partial_response.agent:
-                active_agent = partial_response.agent
+            state.apply(partial_response)
 
+        return state.response()
+
+    def run_batch(
+        self,
+        agent: Agent,
+        messages_list: List[Union[List, ConversationBuffer]],
+        context_variables: Union[dict, List[dict]] = {},
+        max_concurrency: int = 8,
+        **kwargs,
+    ) -> List[BatchResult]:
+        """
+        Run many independent conversations, at most `max_concurrency` at a time.
+
+        `context_variables` is either shared by every conversation or a list
+        with one dict per conversation, and `kwargs` are passed to `run`,
+        except `stream`: a batch collects whole responses. A failing
+        conversation doesn't affect the others: its `BatchResult` holds the
+        error instead of a response. Results are in input order.
+        """
+        results = [None] * len(messages_list)
+        for result in self.run_batch_iter(
+                agent, messages_list, context_variables, max_concurrency, **kwargs):
+            results[result.index] = result
+        return results
+
+    def run_batch_iter(
+        self,
+        agent: Agent,
+        messages_list: List[Union[List, ConversationBuffer]],
+        context_variables: Union[dict, List[dict]] = {},
+        max_concurrency: int = 8,
+        **kwargs,
+    ) -> Iterator[BatchResult]:
+        """Like `run_batch`, but yields each result as soon as its conversation finishes."""
+        if kwargs.get("stream"):
+            # raised on the call rather than on the first result
+            raise ValueError("run_batch doesn't stream: use run(stream=True) per conversation")
+        kwargs.pop("stream", None)
+        if isinstance(context_variables, dict):
+            context_variables = [context_variables] * len(messages_list)
+        return self._batch_iter(agent, messages_list, context_variables, max_concurrency, kwargs)
+
+    def _batch_iter(self, agent, messages_list, context_variables, max_concurrency, kwargs):
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="anthill-batch")
+        try:
+            futures = [
+                executor.submit(self._run_batch_item, index, agent, messages, context, kwargs)
+                for index, (messages, context) in enumerate(zip(messages_list, context_variables))
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # don't start the remaining conversations if the consumer stops early
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run_batch_item(self, index, agent, messages, context_variables, kwargs):
+        try:
+            with request_priority(PRIORITY_BATCH):
+                response = self.run(agent=agent, messages=messages, context_variables=context_variables, **kwargs)
+        except Exception as e:
+            return BatchResult(index=index, error=e)
+        return BatchResult(index=index, response=response)
+
+    async def arun_stream(
+        self,
+        agent: Agent,
+        messages: Union[List, ConversationBuffer],
+        context_variables: dict = {},
+        model_override: str = None,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_duration: Optional[float] = None,
+        execute_tools: bool = True,
+        parallel_tool_calls: Optional[bool] = None,
+        bypass_cache: bool = False,
+        stream_deltas: bool = False,
+        session_id: Optional[str] = None,
+    ):
+        state = self._run_state(agent, messages, context_variables, session_id, max_duration)
+
+        while state.turns_left(max_turns):
+            # get completion with current history, agent
+            start = state.turn_start()
+            completion = await self.aget_chat_completion(
+                agent=state.agent,
+                history=state.history,
+                context_variables=state.context_variables,
+                model_override=model_override,
+                bypass_cache=bypass_cache,
+                stream=True,
+                debug=debug,
+                trace=state.trace,
+            )
+
+            yield {"delim": "start"}
+            if stream_deltas:
+                tracker = DeltaTracker(state.agent.name)
+                async for chunk in completion:
+                    state.first_chunk(start)
+                    for event in tracker.feed(chunk):
+                        yield event
+                for event in tracker.finish():
+                    yield event
+                message = self._make_message(tracker.last, state.agent, completion.model)
+            else:
+                async for chunk in completion:
+                    state.first_chunk(start)
+                    message = self._make_message(chunk, state.agent, completion.model)
+                    yield message
+            yield {"delim": "end"}
+            state.streamed(start)
+
+            debug_print(debug, "Received completion:", message)
+            state.add_message(message)
+            tool_calls = message.tool_calls or []
+            if len(tool_calls) == 0 or not execute_tools:
+                debug_print(debug, "Ending turn.")
+                break
+
+            # handle function calls, updating context_variables, and switching
+            # agents
+            partial_response = await self.ahandle_tool_calls(
+                _tool_calls(message), state.agent, state.context_variables, debug,
+                parallel=parallel_tool_calls, trace=state.trace, deadline=state.deadline,
+            )
+            state.apply(partial_response)
+
+        yield {"response": state.response()}
+
+    async def arun(
+        self,
+        agent: Agent,
+        messages: Union[List, ConversationBuffer],
+        context_variables: dict = {},
+        model_override: str = None,
+        debug: bool = False,
+        max_turns: int = float("inf"),
+        max_duration: Optional[float] = None,
+        execute_tools: bool = True,
+        parallel_tool_calls: Optional[bool] = None,
+        bypass_cache: bool = False,
+        session_id: Optional[str] = None,
+    ) -> Response:
+        state = self._run_state(agent, messages, context_variables, session_id, max_duration)
+
+        while state.turns_left(max_turns) and state.agent:
+
+            # get completion with current history, agent
+            message = await self.aget_chat_completion(
+                agent=state.agent,
+                history=state.history,
+                context_variables=state.context_variables,
+                model_override=model_override,
+                bypass_cache=bypass_cache,
+                stream=False,
+                debug=debug,
+                trace=state.trace,
+            )
+            debug_print(debug, "Received completion:", message)
+            state.add_message(message)
+
+            if not message.tool_calls or not execute_tools:
+                debug_print(debug, "Ending turn.")
+                break
+
+            # handle function calls, updating context_variables, and switching
+            # agents
+            partial_response = await self.ahandle_tool_calls(
+                _tool_calls(message), state.agent, state.context_variables, debug,
+                parallel=parallel_tool_calls, trace=state.trace, deadline=state.deadline,
+            )
+            state.apply(partial_response)
+
+        return state.response()
+
+
+_STREAM_DONE = object()
+
+
+class _StartedStream:
+    """A completion stream with its first chunk already received."""
+
+    __slots__ = ("first", "chunks")
+
+    def __init__(self, first, chunks):
+        self.first = first
+        self.chunks = chunks
+
+
+def _resume(response):
+    if not isinstance(response, _StartedStream):
+        return response
+    return _resume_stream(response)
+
+
+def _resume_stream(started):
+    if started.first is not _STREAM_DONE:
+        yield started.first
+        yield from started.chunks
+
+
+def _aresume(response):
+    if not isinstance(response, _StartedStream):
+        return response
+    return _aresume_stream(response)
+
+
+async def _aresume_stream(started):
+    if started.first is not _STREAM_DONE:
+        yield started.first
+        async for chunk in started.chunks:
+            yield chunk
+
+
+def _discard_completion(future):
+    # the losing call of a hedge: close its stream once it started
+    if future.cancelled() or future.exception() is not None:
+        return
+    response = future.result()
+    if isinstance(response, _StartedStream) and hasattr(response.chunks, "close"):
+        response.chunks.close()
+
+
+# tasks closing the streams of losing async hedges, referenced until they finish
+_closing = set()
+
+
+def _adiscard_completion(task):
+    # the losing call of an async hedge: close its stream once it started
+    if task.cancelled() or task.exception() is not None:
+        return
+    response = task.result()
+    if isinstance(response, _StartedStream) and hasattr(response.chunks, "aclose"):
+        closing = _running_loop().create_task(_aclose_quietly(response.chunks))
+        _closing.add(closing)
+        closing.add_done_callback(_closing.discard)
+
+
+async def _aclose_quietly(chunks):
+    try:
+        await chunks.aclose()
+    except Exception:
+        # nobody reads a losing stream, so there is no one to report to
+        pass
+
+
+async def _aiter_chunks(completion):
+    """
+    Iterate a completion stream from an async or a sync client without
+    blocking the loop. Closing the iterator closes the stream.
+    """
+    if hasattr(completion, "__aiter__"):
+        try:
+            async for chunk in completion:
+                yield chunk
+        finally:
+            if hasattr(completion, "aclose"):
+                await completion.aclose()
+        return
+    if isinstance(completion, list):
+        for chunk in completion:
+            yield chunk
+        return
+
+    loop = _running_loop()
+    iterator = iter(completion)
+    try:
+        while (chunk := await loop.run_in_executor(None, next, iterator, _STREAM_DONE)) is not _STREAM_DONE:
+            yield chunk
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+
+# asyncio is imported on first use: it weighs as much as the rest of the
+# package and sync-only callers never need it
+def _running_loop():
+    import asyncio
+
+    return asyncio.get_running_loop()
+
+
+async def _gather(*awaitables):
+    import asyncio
+
+    return await asyncio.gather(*awaitables)
+
+
+async def _wait_for(awaitable, timeout):
+    """`asyncio.wait_for`, raising the builtin `TimeoutError` on every Python version."""
+    import asyncio
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError from None
+
+
+def _remaining(timeout, deadline):
+    """The seconds a tool call may take, given its timeout and the run's monotonic deadline."""
+    if deadline is None:
+        return timeout
+    left = deadline - time.monotonic()
+    return left if timeout is None else min(timeout, left)
+
+
+def _tool_calls(message: Message) -> List:
+    """The tool calls of a message, as their validated models when it has them."""
+    return message._parsed_tool_calls or message.tool_calls
+
+
+def _tool_call(response) -> dict:
+    # only the arguments the model sent: the function's own defaults apply to the others
+    args = response.model_dump(mode="json", exclude_unset=True)
+    name = args.pop("func_name")
+    return {"name": name, "arguments": args}
+
+
+class _EarlyDispatch:
+    """
+    Starts streamed tool calls on the tool executor while the completion is
+    still arriving. A call is dispatched once a later call has started and
+    its arguments validate against the manifest model; calls still pending
+    when the stream ends are dispatched then.
+    """
+
+    __slots__ = ("anthill", "manifest", "context_variables", "trace", "parallel", "calls", "futures",
+                 "timeout", "deadline")
+
+    def __init__(self, anthill, agent, context_variables, parallel, trace, deadline=None):
+        self.anthill = anthill
+        self.manifest = anthill._manifest(agent)
+        self.context_variables = context_variables
+        self.trace = trace
+        self.timeout = agent.tool_timeout
+        self.deadline = deadline
+        self.parallel = agent.parallel_tool_calls if parallel is None else parallel
+        self.calls = []
+        self.futures = []
+
+    def feed(self, chunk):
+        if not isinstance(chunk, list):
+            return
+        # the last call may still be growing, the ones before it are complete
+        for response in chunk[len(self.futures):-1]:
+            validated = self._validate(_tool_call(response))
+            if validated is None:
+                break
+            self._submit(validated)
+
+    def results(self, tool_calls, debug) -> Response:
+        for tool_call in tool_calls[len(self.futures):]:
+            self._submit(tool_call)
+        raw_results = [future.result() for future in self.futures]
+        return self.anthill._merge_tool_results(self.calls, raw_results, debug)
+
+    def _validate(self, tool_call):
+        """The validated model of a complete tool call, else None."""
+        name = tool_call["name"]
+        if name not in self.manifest.invokers:
+            return None
+        try:
+            return self.manifest.model_map[name].model_validate({"func_name": name, **tool_call["arguments"]})
+        except ValidationError:
+            return None
+
+    def _submit(self, tool_call):
+        call = self.anthill._prepare_tool_call(
+            tool_call, self.manifest.invokers, self.context_variables, self.timeout)
+        previous = None if self.parallel or not self.futures else self.futures[-1]
+        self.calls.append(call)
+        self.futures.append(self.anthill.tool_executor.submit(
+            self.anthill._call_tool_after, previous, *call, self.trace, self.deadline))
+
+
+class _RunState:
+    """Mutable state of a single run: active agent, history, context and trace."""
+
+    __slots__ = ("agent", "history", "context_variables", "init_len", "trace", "_first_chunk",
+                 "session_store", "session_id", "session_len", "context_diffs", "deadline")
+
+    def __init__(self, agent, messages, context_variables, tracer, session_store=None, session_id=None,
+                 max_duration=None):
+        self.agent = agent
+        self.context_variables = ContextVariables(context_variables)
+        self.session_store = session_store
+        self.session_id = session_id
+        if session_store is not None:
+            # the stored history followed by the new messages of this run
+            self.history = session_store.load_buffer(session_id)
+            self.history.extend(messages)
+        elif isinstance(messages, ConversationBuffer):
+            self.history = messages.copy()
+        else:
+            self.history = ConversationBuffer(messages)
+        self.session_len = len(self.history) - len(messages)
+        self.init_len = len(self.history)
+        self.trace = RunTrace(tracer)
+        self._first_chunk = True
+        self.context_diffs = []
+        self.deadline = time.monotonic() + max_duration if max_duration is not None else None
+
+    def turns_left(self, max_turns) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.trace.metrics.deadline_exceeded = True
+            return False
+        return len(self.history) - self.init_len < max_turns
+
+    def turn_start(self) -> Optional[float]:
+        # a streamed turn is timed when tracing, and for the first chunk of the run
+        if self.trace.enabled or self._first_chunk:
+            return time.perf_counter()
+        return None
+
+    def first_chunk(self, start):
+        if self._first_chunk:
+            self._first_chunk = False
+            self.trace.record("first_chunk", start, time.perf_counter(), {"agent": self.agent.name})
+
+    def streamed(self, start):
+        """Account for a streamed completion that began at `start`."""
+        if self.trace.enabled:
+            self.trace.record("model_call", start, time.perf_counter(), {"agent": self.agent.name})
+        else:
+            self.trace.count("model_call")
+
+    def add_message(self, message: Message):
+        chars = self.history.chars
+        self.history.append(message.model_dump())
+        self.trace.add_completion(self.history.chars - chars)
+
+    def apply(self, partial_response: Response):
+        self.history.extend(partial_response.messages)
+        self.context_variables.update(partial_response.context_variables)
+        self.end_turn()
+        if partial_response.agent:
+            now = time.perf_counter()
+            self.trace.record("handoff", now, now, {"from": self.agent.name, "to": partial_response.agent.name})
+            self.agent = partial_response.agent
+
+    def end_turn(self):
+        context = self.context_variables
+        turn = context.turn
+        changed, removed = context.checkpoint()
+        if changed or removed:
+            self.context_diffs.append(
+                ContextDiff(turn=turn, version=context.version, changed=changed, removed=sorted(removed)))
+
+    def response(self) -> Response:
+        self.end_turn()
+        if self.session_store is not None:
+            added = self.history.to_dicts(self.session_len)
+            self.session_store.append(self.session_id, added)
+            messages = added[self.init_len - self.session_len:]
+        else:
+            messages = self.history.to_dicts(self.init_len)
         return Response(
-            messages=history[init_len:],
-            agent=active_agent,
-            context_variables=context_variables,
+            messages=messages,
+            agent=self.agent,
+            context_variables=self.context_variables.to_dict(),
+            metrics=self.trace.finish(len(messages)),
+            context_diffs=self.context_diffs,
         )
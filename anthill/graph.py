@@ -0,0 +1,228 @@
+import builtins
+import dis
+import functools
+import inspect
+import warnings
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+from .invoker import tool_name
+from .manifest import ToolManifest, get_manifest
+from .prompt import build_prompt
+from .types import Agent
+
+
+UNDEFINED = object()
+
+_LOADS = ("LOAD_GLOBAL", "LOAD_NAME", "LOAD_DEREF", "LOAD_CLOSURE")
+
+
+class AgentGraphError(ValueError):
+    """Raised when the functions of an agent graph reference targets that don't exist."""
+
+
+class AgentGraphWarning(UserWarning):
+    """Issued when a `transfer*` function references agents but returns none of them."""
+
+
+def _unwrap(func):
+    while True:
+        if isinstance(func, functools.partial):
+            func = func.func
+        elif inspect.ismethod(func):
+            func = func.__func__
+        elif hasattr(func, "__wrapped__"):
+            func = func.__wrapped__
+        elif not inspect.isfunction(func) and inspect.isfunction(getattr(type(func), "__call__", None)):
+            # a callable instance
+            func = type(func).__call__
+        else:
+            return func
+
+
+def referenced_names(func) -> Dict[str, object]:
+    """
+    The globals and closure variables a function reads, by name, with their
+    current value. Names that don't resolve are mapped to `UNDEFINED`.
+    """
+    func = _unwrap(func)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return {}
+
+    closure = dict(zip(code.co_freevars, (c.cell_contents if _cell_is_set(c) else UNDEFINED
+                                          for c in func.__closure__ or ())))
+    names = {}
+    codes = [code]
+    while codes:
+        current = codes.pop()
+        for instruction in dis.get_instructions(current):
+            if instruction.opname in ("LOAD_GLOBAL", "LOAD_NAME"):
+                name = instruction.argval
+                if name in func.__globals__:
+                    names[name] = func.__globals__[name]
+                elif not hasattr(builtins, name):
+                    names[name] = UNDEFINED
+            elif instruction.opname in ("LOAD_DEREF", "LOAD_CLOSURE") and instruction.argval in closure:
+                names[instruction.argval] = closure[instruction.argval]
+        codes.extend(c for c in current.co_consts if inspect.iscode(c))
+    return names
+
+
+def _span(instruction):
+    positions = getattr(instruction, "positions", None)
+    if positions is None or positions.lineno is None or positions.end_lineno is None:
+        return None
+    return (positions.lineno, positions.col_offset or 0), (positions.end_lineno, positions.end_col_offset or 0)
+
+
+def returned_names(func) -> Set[str]:
+    """
+    The globals and closure variables a function reads in its `return`
+    statements. When the bytecode has no source positions, every name it
+    reads counts.
+    """
+    func = _unwrap(func)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return set()
+
+    instructions = list(dis.get_instructions(code))
+    # a RETURN_VALUE spans its whole return statement
+    returns = [_span(i) for i in instructions if i.opname == "RETURN_VALUE"]
+    names = set()
+    for instruction in instructions:
+        if instruction.opname not in _LOADS:
+            continue
+        span = _span(instruction)
+        if span is None or any(r is None or (r[0] <= span[0] and span[1] <= r[1]) for r in returns):
+            names.add(instruction.argval)
+    return names
+
+
+def _cell_is_set(cell) -> bool:
+    try:
+        cell.cell_contents
+    except ValueError:
+        return False
+    return True
+
+
+def handoff_targets(func) -> List[Agent]:
+    """The agents a function can return: those it references in its `return` statements."""
+    returned = returned_names(func)
+    targets = []
+    for name, value in referenced_names(func).items():
+        if name in returned and isinstance(value, Agent) and not any(value is t for t in targets):
+            targets.append(value)
+    return targets
+
+
+class AgentNode:
+    """
+    The precompiled state of one agent in a graph.
+
+    Attributes:
+        agent (Agent): The agent.
+        manifest (ToolManifest): Its tool schemas.
+        system_prompt (str): Its rendered system prompt, when its
+            instructions don't depend on context variables, else `None`.
+        handoffs (dict): The agents each of its functions can hand off to.
+    """
+
+    __slots__ = ("agent", "manifest", "system_prompt", "handoffs")
+
+    def __init__(self, agent: Agent, manifest: ToolManifest, handoffs: Dict[str, List[Agent]]):
+        self.agent = agent
+        self.manifest = manifest
+        self.handoffs = handoffs
+        self.system_prompt = None
+        instructions = agent.instructions
+        if not callable(instructions):
+            if isinstance(instructions, list):
+                instructions = "\n".join(f"- {i}" for i in instructions)
+            self.system_prompt = build_prompt(
+                agent.name, instructions, manifest.tool_list, template=agent.prompt_template)
+
+
+class AgentGraph:
+    """
+    Every agent reachable from `root` through handoffs, discovered without
+    running anything: an agent's functions are read for the agents they
+    return, as globals or closure variables. An agent only mentioned
+    elsewhere in a function, e.g. compared with or logged, is not a handoff.
+
+    Building the graph validates it and precompiles each agent's tool
+    schemas and, for static instructions, its system prompt. Pass it to
+    `Anthill(graph=...)` so runs find this state with a dict lookup on
+    every turn and handoff.
+
+    The graph is a snapshot: call `compile()` again after changing the
+    functions or instructions of its agents.
+
+    Raises:
+        AgentGraphError: If a function references a name that doesn't
+            exist, if a `transfer*` function references no agent, or if two
+            different agents share a name. A `transfer*` function that
+            references agents without returning them issues an
+            `AgentGraphWarning` instead.
+    """
+
+    def __init__(self, root: Agent):
+        self.root = root
+        self.nodes: Dict[int, AgentNode] = {}
+        self.by_name: Dict[str, Agent] = {}
+        self.compile()
+
+    def compile(self) -> None:
+        nodes, by_name, errors = {}, {}, []
+        queue = deque([self.root])
+        while queue:
+            agent = queue.popleft()
+            if id(agent) in nodes:
+                continue
+            if agent.name in by_name:
+                errors.append(f"two agents are named {agent.name!r}")
+
+            handoffs = {}
+            for func in agent.functions:
+                name = tool_name(func)
+                references = referenced_names(func)
+                missing = sorted(n for n, value in references.items() if value is UNDEFINED)
+                if missing:
+                    errors.append(f"{agent.name}.{name} references undefined names: {', '.join(missing)}")
+                targets = handoff_targets(func)
+                if name.startswith("transfer") and not targets and not missing:
+                    mentioned = [value.name for value in references.values() if isinstance(value, Agent)]
+                    if mentioned:
+                        warnings.warn(f"{agent.name}.{name} references {', '.join(mentioned)} without returning "
+                                      "it: it is not part of the graph", AgentGraphWarning, stacklevel=3)
+                    else:
+                        errors.append(f"{agent.name}.{name} doesn't reference any agent")
+                if targets:
+                    handoffs[name] = targets
+                    queue.extend(targets)
+
+            nodes[id(agent)] = AgentNode(agent, get_manifest(agent), handoffs)
+            by_name[agent.name] = agent
+
+        if errors:
+            raise AgentGraphError("Invalid agent graph: " + "; ".join(errors))
+        self.nodes, self.by_name = nodes, by_name
+
+    def node(self, agent: Agent) -> Optional[AgentNode]:
+        return self.nodes.get(id(agent))
+
+    def get(self, name: str) -> Agent:
+        """The agent with this name."""
+        return self.by_name[name]
+
+    @property
+    def agents(self) -> List[Agent]:
+        return [node.agent for node in self.nodes.values()]
+
+    def __contains__(self, agent: Agent) -> bool:
+        return id(agent) in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
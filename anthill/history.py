@@ -0,0 +1,204 @@
+import operator
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Iterator, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class MessageRecord(Mapping):
+    """
+    Compact, read-only form of one history entry.
+
+    Reads like the dict it was built from (`record["role"]`, `record.get(...)`,
+    `{**record}`, `record == entry`), but without a hash table and key strings
+    per message: the common fields are slots, and role, sender, tool and model
+    names are interned so every message of a conversation shares them. Any
+    other key goes to `extra`. History reduction memoizes its token estimate
+    and digest of a record on it, as records don't change.
+    """
+
+    __slots__ = ("role", "content", "sender", "tool_calls", "tool_name", "model", "extra", "_tokens", "_digest")
+
+    FIELDS = ("sender", "role", "tool_name", "content", "tool_calls", "model")
+
+    def __init__(self, role: str, content=_MISSING, sender=_MISSING, tool_calls=_MISSING,
+                 tool_name=_MISSING, model=_MISSING, extra: Optional[dict] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.sender = sys.intern(sender) if type(sender) is str else sender
+        self.tool_calls = tool_calls
+        self.tool_name = sys.intern(tool_name) if type(tool_name) is str else tool_name
+        self.model = sys.intern(model) if type(model) is str else model
+        self.extra = extra or None
+        self._tokens = None
+        self._digest = None
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> "MessageRecord":
+        if type(entry) is cls:
+            return entry
+        if entry.keys() <= _FIELD_SET:
+            return cls(**entry)
+        return cls(extra={k: v for k, v in entry.items() if k not in _FIELD_SET},
+                   **{k: v for k, v in entry.items() if k in _FIELD_SET})
+
+    def to_dict(self) -> dict:
+        entry = {key: value for key, value in zip(self.FIELDS, _field_values(self)) if value is not _MISSING}
+        if self.extra:
+            entry.update(self.extra)
+        return entry
+
+    def __getitem__(self, key):
+        value = getattr(self, key, _MISSING) if key in _FIELD_SET else _MISSING
+        if value is _MISSING:
+            if self.extra and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = getattr(self, key, _MISSING) if key in _FIELD_SET else _MISSING
+        if value is _MISSING:
+            return self.extra.get(key, default) if self.extra else default
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if getattr(self, key) is not _MISSING:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __reduce__(self):
+        return MessageRecord.from_dict, (self.to_dict(),)
+
+    def __repr__(self):
+        return f"MessageRecord({self.to_dict()!r})"
+
+
+_FIELD_SET = frozenset(MessageRecord.FIELDS)
+_field_values = operator.attrgetter(*MessageRecord.FIELDS)
+
+
+def to_dicts(entries) -> List[dict]:
+    """History entries, records or dicts, in the plain dict format."""
+    return [entry.to_dict() if type(entry) is MessageRecord else entry for entry in entries]
+
+
+def project_entry(entry: dict) -> List[dict]:
+    """Convert one history entry into the messages sent to the client."""
+    messages = []
+    if entry["content"] is not None:
+        messages.append(dict(role=entry["role"], content=entry["content"]))
+    tool_calls = entry.get("tool_calls") or []
+    for t in tool_calls:
+        tool = t["arguments"]
+        messages.append(dict(role=entry["role"], content=str(tool)))
+    return messages
+
+
+def message_chars(messages: List[dict]) -> int:
+    """Total content length of client messages."""
+    return sum(len(m["content"]) if isinstance(m["content"], str) else len(str(m["content"]))
+               for m in messages)
+
+
+def project_history(history: List[dict]) -> List[dict]:
+    messages = []
+    for entry in history:
+        messages.extend(project_entry(entry))
+    return messages
+
+
+class ConversationBuffer:
+    """
+    A conversation history together with its client messages.
+
+    Entries are converted once, when they are added, so each turn only pays
+    for the new entries instead of the whole history. Pass a buffer as
+    `messages` to `Anthill.run` to reuse the conversion across runs:
+
+        buffer = ConversationBuffer()
+        buffer.append({"role": "user", "content": "Hi!"})
+        response = client.run(agent=agent, messages=buffer)
+        buffer.extend(response.messages)
+
+    Entries are stored as `MessageRecord`s; `to_dicts()` returns them in
+    the `Response.messages` format.
+
+    Attributes:
+        entries (list): The history entries, as `MessageRecord`s.
+        messages (list): The client messages projected from the entries.
+        chars (int): Total content length of the client messages.
+    """
+
+    __slots__ = ("entries", "messages", "chars", "_starts", "_chars_before")
+
+    def __init__(self, entries: List[dict] = None):
+        self.entries = []
+        self.messages = []
+        self.chars = 0
+        # per entry: index of its first client message, and chars of the messages before it
+        self._starts = array("q")
+        self._chars_before = array("q")
+        if entries:
+            self.extend(entries)
+
+    def append(self, entry: dict) -> None:
+        entry = MessageRecord.from_dict(entry)
+        messages = project_entry(entry)
+        self._starts.append(len(self.messages))
+        self._chars_before.append(self.chars)
+        self.entries.append(entry)
+        self.messages.extend(messages)
+        self.chars += message_chars(messages)
+
+    def extend(self, entries: List[dict]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def project(self, entries: List[dict]) -> Tuple[List[dict], int]:
+        """
+        Client messages and their total length for `entries`, a reduction of
+        this buffer's entries. The entries it kept at its end, the same
+        objects as the buffer's last entries, reuse their converted messages;
+        only the others are converted.
+        """
+        kept = 0
+        total = len(self.entries)
+        while kept < len(entries) and kept < total and entries[-1 - kept] is self.entries[-1 - kept]:
+            kept += 1
+        head = project_history(entries[:len(entries) - kept])
+        if not kept:
+            return head, message_chars(head)
+        first = total - kept
+        chars = message_chars(head) + self.chars - self._chars_before[first]
+        return head + self.messages[self._starts[first]:], chars
+
+    def to_dicts(self, start: int = 0) -> List[dict]:
+        """The entries from `start` on, as plain dicts."""
+        return to_dicts(self.entries[start:])
+
+    def copy(self) -> "ConversationBuffer":
+        """Shallow copy, sharing the already converted messages."""
+        buffer = ConversationBuffer()
+        buffer.entries = self.entries.copy()
+        buffer.messages = self.messages.copy()
+        buffer.chars = self.chars
+        buffer._starts = array("q", self._starts)
+        buffer._chars_before = array("q", self._chars_before)
+        return buffer
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
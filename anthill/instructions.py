@@ -0,0 +1,111 @@
+import weakref
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from typing import Callable, Mapping, Optional
+
+from .context import _IMMUTABLE_TYPES, ContextVariables, TrackingContextView
+
+InstructionsCacheInfo = namedtuple("InstructionsCacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+_ABSENT = object()
+
+
+def _snapshot(context: Mapping, key):
+    """What a later render must find under `key` to reuse the prompt."""
+    if key not in context:
+        return _ABSENT
+    value = dict.__getitem__(context, key) if isinstance(context, dict) else context[key]
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return type(value), value
+    if isinstance(context, ContextVariables):
+        # mutable values can change in place: compare versions, in the same run only
+        return "version", context.key_version(key)
+    return None
+
+
+class _Entry:
+    __slots__ = ("instructions", "manifest", "context", "reads", "keys", "prompt")
+
+    def __init__(self, instructions, manifest, context, reads, keys, prompt):
+        self.instructions = instructions
+        self.manifest = manifest
+        self.context = context
+        self.reads = reads
+        self.keys = keys
+        self.prompt = prompt
+
+    def matches(self, instructions, manifest, context) -> bool:
+        if self.instructions is not instructions or self.manifest is not manifest:
+            return False
+        if self.keys is not None and tuple(context) != self.keys:
+            return False
+        for key, snapshot in self.reads:
+            if snapshot is None:
+                return False
+            if snapshot.__class__ is tuple and snapshot[0] == "version" and self.context() is not context:
+                return False
+            if _snapshot(context, key) != snapshot:
+                return False
+        return True
+
+
+class InstructionsCache:
+    """
+    Memoizes the system prompts of agents with callable instructions.
+
+    The instructions are called with a view of `context_variables` that
+    records the keys they read. The rendered prompt is reused until one of
+    those keys changes: immutable values are compared, mutable ones are
+    tracked through the run's context versions. Instructions that iterate
+    the context depend on its set of keys too.
+
+    Only use it with instructions that depend on nothing but the context
+    (not on the time, a database...). Pass it to
+    `Anthill(instructions_cache=InstructionsCache())`.
+
+    Attributes:
+        maxsize (int): Maximum number of cached prompts, one per agent.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def system_prompt(self, agent, manifest, context: Mapping, render: Callable[[Mapping], str]) -> str:
+        """
+        The prompt `render(view)` returns for this agent and context, reusing
+        the previous one when the keys the instructions read haven't changed.
+        """
+        key = (agent.name, id(agent.instructions), id(manifest), agent.prompt_template)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.matches(agent.instructions, manifest, context):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.prompt
+            self.misses += 1
+
+        view = TrackingContextView(context)
+        prompt = render(view)
+        reads = tuple((k, _snapshot(context, k)) for k in view.reads)
+        keys = tuple(context) if view.iterated else None
+        context_ref = weakref.ref(context) if isinstance(context, ContextVariables) else lambda: None
+
+        with self._lock:
+            self._entries[key] = _Entry(agent.instructions, manifest, context_ref, reads, keys, prompt)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return prompt
+
+    def cache_info(self) -> InstructionsCacheInfo:
+        with self._lock:
+            return InstructionsCacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,119 @@
+import functools
+import inspect
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+
+from .manifest import __CTX_VARS_NAME__
+from .timeouts import get_tool_timeout
+from .tool_cache import get_tool_cache
+
+
+def tool_name(func: Callable) -> str:
+    """The tool name of an agent function, also for partials and callable instances."""
+    name = getattr(func, "__name__", None)
+    if name is not None:
+        return name
+    if isinstance(func, functools.partial):
+        return tool_name(func.func)
+    return type(func).__name__
+
+
+def tool_doc(func: Callable) -> str:
+    doc = getattr(func, "__doc__", None)
+    if isinstance(func, functools.partial) and doc == functools.partial.__doc__:
+        doc = func.func.__doc__
+    elif not inspect.isroutine(func) and not isinstance(func, functools.partial) and doc == type(func).__doc__:
+        # a callable instance documents its __call__, or its class
+        doc = type(func).__call__.__doc__ or doc
+    return doc if doc is not None else ""
+
+
+def is_async_callable(func: Callable) -> bool:
+    while isinstance(func, functools.partial):
+        func = func.func
+    if inspect.iscoroutinefunction(func):
+        return True
+    call = getattr(type(func), "__call__", None)
+    return not inspect.isroutine(func) and inspect.iscoroutinefunction(call)
+
+
+class ToolInvoker:
+    """
+    Calls one agent function for tool calls, with the analysis of its
+    signature done once, when it is built.
+
+    Works for any callable `inspect.signature` understands: functions, bound
+    methods, `functools.partial` objects and callable instances.
+
+    Attributes:
+        func (callable): The agent function.
+        name (str): Its tool name.
+        doc (str): Its docstring, "" if it has none.
+        signature (inspect.Signature): Its signature.
+        takes_context (bool): Whether it has a `context_variables` parameter.
+        is_async (bool): Whether calling it returns a coroutine.
+        cache (ToolCache): Its `cached_tool` cache, if any.
+        timeout (float): Its `tool_timeout` deadline in seconds, if any.
+    """
+
+    __slots__ = ("func", "name", "doc", "signature", "takes_context", "is_async", "cache", "timeout",
+                 "_parameters", "_positional", "_var_keyword")
+
+    def __init__(self, func: Callable):
+        self.func = func
+        self.name = tool_name(func)
+        self.doc = tool_doc(func)
+        self.signature = inspect.signature(func)
+        parameters = self.signature.parameters
+        self.takes_context = __CTX_VARS_NAME__ in parameters
+        self.is_async = is_async_callable(func)
+        self.cache = get_tool_cache(func)
+        self.timeout = get_tool_timeout(func)
+        self._parameters = frozenset(name for name, p in parameters.items()
+                                     if p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD))
+        self._positional = tuple(name for name, p in parameters.items() if p.kind is p.POSITIONAL_ONLY)
+        self._var_keyword = any(p.kind is p.VAR_KEYWORD for p in parameters.values())
+
+    def arguments(self, call, context_variables=None) -> dict:
+        """
+        The keyword arguments of a tool call, given as its validated pydantic
+        model or as a `{"name": ..., "arguments": {...}}` dict.
+
+        From a model, only the fields the model set are passed, read as
+        attributes, so the function's own defaults apply to the others.
+        """
+        if isinstance(call, BaseModel):
+            args = {name: getattr(call, name) for name in call.model_fields_set
+                    if name != "func_name" and (self._var_keyword or name in self._parameters)}
+        else:
+            args = call["arguments"]
+        if self.takes_context:
+            args = {**args, __CTX_VARS_NAME__: context_variables}
+        return args
+
+    def __call__(self, args: dict):
+        if self.cache is not None:
+            return self.cache.call(self._call, args)
+        return self._call(**args)
+
+    async def acall(self, args: dict):
+        if self.cache is not None:
+            return await self.cache.acall(self._call, args)
+        return await self._call(**args)
+
+    def _call(self, **args):
+        if self._positional:
+            positional = [args.pop(name) for name in self._positional if name in args]
+            return self.func(*positional, **args)
+        return self.func(**args)
+
+    def __repr__(self):
+        return f"ToolInvoker({self.name}{self.signature})"
+
+
+def call_name(call) -> Optional[str]:
+    """The function name of a tool call, given as a model or a dict."""
+    if isinstance(call, BaseModel):
+        return getattr(call, "func_name", None)
+    return call["name"]
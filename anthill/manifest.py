@@ -0,0 +1,112 @@
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Union
+
+from .types import Agent, AgentResponse
+
+__CTX_VARS_NAME__ = "context_variables"
+
+AGENT_RESPONSE_TOOL = {"name": "agent_response", "doc": "Use this tool to answer/ask to user"}
+
+
+class ToolManifest:
+    """
+    Everything derived from an agent's functions that is needed on a turn.
+
+    Built once per functions tuple and shared by every agent, turn and run
+    using the same functions.
+
+    Attributes:
+        functions (tuple): The agent functions the manifest was built from.
+        models (list): The pydantic model of each function call.
+        response_type (type): The response type requested from the client.
+        tool_list (list): The tools (name and doc) listed in the system prompt.
+        tool_map (dict): The function for each tool name.
+        invokers (dict): The `ToolInvoker` for each tool name.
+        model_map (dict): The model for each tool name, agent_response included.
+    """
+
+    __slots__ = ("functions", "models", "response_type", "tool_list", "tool_map", "invokers", "model_map",
+                 "_schema_digest")
+
+    def __init__(self, functions):
+        from pulsar.helpers import function_to_pydantic
+
+        from .invoker import ToolInvoker
+
+        self.functions = tuple(functions)
+        invokers = [ToolInvoker(f) for f in self.functions]
+        self.models = [
+            function_to_pydantic(_Described(invoker), include_name=True, skip_params=[__CTX_VARS_NAME__])
+            for invoker in invokers
+        ]
+
+        if len(self.models) > 1:
+            self.response_type = Union[AgentResponse, List[Union[*self.models]]]
+        elif len(self.models) > 0:
+            self.response_type = Union[AgentResponse, List[*self.models]]
+        else:
+            self.response_type = AgentResponse
+
+        self.tool_list = [{"name": invoker.name, "doc": invoker.doc} for invoker in invokers]
+        self.tool_list.append(AGENT_RESPONSE_TOOL)
+        self.tool_map = {invoker.name: invoker.func for invoker in invokers}
+        self.invokers = {invoker.name: invoker for invoker in invokers}
+        self.model_map = {invoker.name: m for invoker, m in zip(invokers, self.models)}
+        self.model_map[AGENT_RESPONSE_TOOL["name"]] = AgentResponse
+        self._schema_digest = None
+
+    @property
+    def schema_digest(self) -> str:
+        """Hash of the tool JSON schemas, computed on first use."""
+        if self._schema_digest is None:
+            schemas = [m.model_json_schema() for m in self.models]
+            payload = json.dumps(schemas, sort_keys=True)
+            self._schema_digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return self._schema_digest
+
+
+class _Described:
+    """
+    What the schema builder reads of a function (name, doc and signature),
+    for callables without a `__name__` such as partials and instances.
+    """
+
+    def __init__(self, invoker):
+        self.__name__ = invoker.name
+        self.__doc__ = invoker.doc
+        self.__signature__ = invoker.signature
+
+    def __call__(self, *args, **kwargs):
+        raise TypeError("schema stand-in, not callable")
+
+
+_MANIFEST_CACHE_SIZE = 256
+_manifest_cache = OrderedDict()
+_manifest_lock = Lock()
+
+
+def get_manifest(agent: Agent) -> ToolManifest:
+    """Return the cached manifest for the agent's current functions."""
+    # A cached manifest holds its functions, so their ids can't be reused
+    # by other objects while the entry is alive.
+    key = tuple(map(id, agent.functions))
+    with _manifest_lock:
+        manifest = _manifest_cache.get(key)
+        if manifest is not None:
+            _manifest_cache.move_to_end(key)
+            return manifest
+
+    manifest = ToolManifest(agent.functions)
+    with _manifest_lock:
+        _manifest_cache[key] = manifest
+        if len(_manifest_cache) > _MANIFEST_CACHE_SIZE:
+            _manifest_cache.popitem(last=False)
+    return manifest
+
+
+def clear_manifest_cache():
+    with _manifest_lock:
+        _manifest_cache.clear()
@@ -1,4 +1,4 @@
-from jinja2 import Environment
+from functools import lru_cache
 
 PROMPT = """
 Your are {{ agent_name }}. You must use agent_response tool to answer/ask to user and use transfer tools when is not related to your topic.
@@ -22,11 +22,64 @@ You are part of a team of agents, if any transfer tool/function are available us
 {% endif %}
 """
 
-def build_prompt(agent_name, instructions, tool_list):
-    template = Environment().from_string(PROMPT)
-    template_content = template.render(
+# Rendered in place of the instructions to find where they go in the static parts.
+_INSTRUCTIONS_MARKERS = ("\x00__anthill_instructions_a__\x00", "\x00__anthill_instructions_b__\x00")
+
+
+
+@lru_cache(maxsize=1)
+def _environment():
+    # jinja2 is only imported once a prompt is rendered
+    from jinja2 import Environment
+    return Environment()
+
+
+@lru_cache(maxsize=128)
+def get_template(source=PROMPT):
+    """Compile a prompt template once per template source."""
+    return _environment().from_string(source)
+
+
+@lru_cache(maxsize=1)
+def agentic_prompt() -> str:
+    """The output format prompt pulsar wraps the conversation with."""
+    from pulsar.prompt import AGENTIC_PROMPT
+    return AGENTIC_PROMPT
+
+
+@lru_cache(maxsize=1024)
+def _static_parts(source, agent_name, tools):
+    """Render everything but the instructions, returning the text around them.
+
+    Returns None when the template doesn't place the instructions exactly once
+    verbatim, in which case the prompt has to be fully rendered on each call.
+    """
+    template = get_template(source)
+    tool_list = [{"name": name, "doc": doc} for name, doc in tools]
+    splits = [
+        template.render(agent_name=agent_name, instructions=marker, tool_list=tool_list).split(marker)
+        for marker in _INSTRUCTIONS_MARKERS
+    ]
+    # Filters or conditionals on the instructions show up as a difference between the two renders.
+    if len(splits[0]) != 2 or splits[0] != splits[1]:
+        return None
+    return splits[0][0], splits[0][1]
+
+
+def clear_prompt_cache():
+    get_template.cache_clear()
+    _static_parts.cache_clear()
+
+
+def build_prompt(agent_name, instructions, tool_list, template=None):
+    source = template or PROMPT
+    tools = tuple((tool["name"], tool["doc"]) for tool in tool_list)
+    parts = _static_parts(source, agent_name, tools)
+    if parts is not None:
+        return f"{parts[0]}{instructions}{parts[1]}"
+
+    return get_template(source).render(
         agent_name=agent_name,
         instructions=instructions,
         tool_list=tool_list
     )
-    return template_content
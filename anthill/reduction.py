@@ -0,0 +1,238 @@
+import hashlib
+import json
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, List
+
+from .history import MessageRecord, message_chars, project_entry, to_dicts
+from .util import estimate_tokens
+
+# formatting tokens the providers add around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def entry_tokens(entry: dict) -> int:
+    """Estimated prompt tokens of one history entry, memoized on `MessageRecord`s."""
+    tokens = entry._tokens if type(entry) is MessageRecord else None
+    if tokens is None:
+        messages = project_entry(entry)
+        tokens = estimate_tokens(message_chars(messages)) + MESSAGE_OVERHEAD_TOKENS * len(messages)
+        if type(entry) is MessageRecord:
+            entry._tokens = tokens
+    return tokens
+
+
+def history_tokens(entries: List[dict]) -> int:
+    return sum(entry_tokens(entry) for entry in entries)
+
+
+def is_tool_chatter(entry: dict) -> bool:
+    """Tool results and assistant messages made only of tool calls."""
+    return entry["role"] == "tool" or (bool(entry.get("tool_calls")) and not entry.get("content"))
+
+
+def _drop_leading_tool_results(entries):
+    # a tool result without the call that produced it confuses the model
+    start = 0
+    while start < len(entries) - 1 and entries[start]["role"] == "tool":
+        start += 1
+    return entries[start:]
+
+
+class HistoryPolicy(ABC):
+    """
+    Base class of history reduction steps.
+
+    A policy maps the history entries of a run to the entries sent to the
+    model. It must not modify the entries it is given; returning the same
+    list means nothing was reduced. Set one on `Agent.history_policy`.
+    """
+
+    @abstractmethod
+    def __call__(self, entries: List[dict]) -> List[dict]:
+        """The entries to send to the model."""
+
+
+class HistoryPipeline(HistoryPolicy):
+    """Applies several policies in order."""
+
+    def __init__(self, *policies: Callable[[List[dict]], List[dict]]):
+        self.policies = policies
+
+    def __call__(self, entries: List[dict]) -> List[dict]:
+        for policy in self.policies:
+            entries = policy(entries)
+        return entries
+
+
+class TokenWindow(HistoryPolicy):
+    """
+    Keeps the most recent entries that fit in `max_tokens`, plus the first
+    `keep_first` entries (e.g. the message stating the task). The last entry
+    is always kept.
+    """
+
+    def __init__(self, max_tokens: int, keep_first: int = 0):
+        self.max_tokens = max_tokens
+        self.keep_first = keep_first
+
+    def __call__(self, entries: List[dict]) -> List[dict]:
+        head = entries[:self.keep_first]
+        budget = self.max_tokens - history_tokens(head)
+
+        start = len(entries)
+        while start > len(head):
+            tokens = entry_tokens(entries[start - 1])
+            if tokens > budget and start < len(entries):
+                break
+            budget -= tokens
+            start -= 1
+
+        if start == len(head):
+            return entries
+        return head + _drop_leading_tool_results(entries[start:])
+
+
+class TruncateToolResults(HistoryPolicy):
+    """Shortens tool results longer than `max_chars`, except the `keep_last` most recent ones."""
+
+    def __init__(self, max_chars: int = 2000, keep_last: int = 1):
+        self.max_chars = max_chars
+        self.keep_last = keep_last
+
+    def __call__(self, entries: List[dict]) -> List[dict]:
+        tool_indexes = [i for i, entry in enumerate(entries) if entry["role"] == "tool"]
+        older = tool_indexes[:len(tool_indexes) - self.keep_last] if self.keep_last else tool_indexes
+        long = [i for i in older
+                if isinstance(entries[i]["content"], str) and len(entries[i]["content"]) > self.max_chars]
+        if not long:
+            return entries
+
+        entries = list(entries)
+        for i in long:
+            content = entries[i]["content"]
+            entries[i] = {**entries[i], "content": (
+                f"{content[:self.max_chars]}... [{len(content) - self.max_chars} characters truncated]")}
+        return entries
+
+
+class DropToolChatter(HistoryPolicy):
+    """
+    Drops tool calls and their results that came before the last
+    `keep_turns` user messages, keeping the text the agents answered with.
+    """
+
+    def __init__(self, keep_turns: int = 1):
+        if keep_turns < 1:
+            raise ValueError("keep_turns must be at least 1")
+        self.keep_turns = keep_turns
+
+    def __call__(self, entries: List[dict]) -> List[dict]:
+        users = [i for i, entry in enumerate(entries) if entry["role"] == "user"]
+        if len(users) < self.keep_turns:
+            return entries
+        boundary = users[-self.keep_turns]
+
+        kept = [entry for entry in entries[:boundary] if not is_tool_chatter(entry)]
+        if len(kept) == boundary:
+            return entries
+        return kept + entries[boundary:]
+
+
+def _entry_digest(entry: dict) -> bytes:
+    digest = entry._digest if type(entry) is MessageRecord else None
+    if digest is None:
+        payload = json.dumps(dict(entry), sort_keys=True, default=repr)
+        digest = hashlib.sha256(payload.encode("utf-8")).digest()
+        if type(entry) is MessageRecord:
+            entry._digest = digest
+    return digest
+
+
+def _prefix_digests(entries, count) -> List[str]:
+    """Digests of `entries[:1]`, `entries[:2]`... `entries[:count]`, each chained on the previous one."""
+    digest = hashlib.sha256()
+    digests = []
+    for entry in entries[:count]:
+        digest.update(_entry_digest(entry))
+        digests.append(digest.hexdigest())
+    return digests
+
+
+class RollingSummary(HistoryPolicy):
+    """
+    Once the history goes over `max_tokens`, replaces everything but its most
+    recent `keep_tokens` with a summary.
+
+    `summarize(previous_summary, entries)` returns the new summary given the
+    previous one ("" at first) and the entries to fold into it, typically
+    with a call to a small model. Summaries are cached by a digest of all
+    the entries they cover, so each turn only summarizes the entries that
+    left the window since the previous turn, and conversations only share a
+    summary when they share everything it summarizes.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, List[dict]], str],
+        max_tokens: int,
+        keep_tokens: int = None,
+        role: str = "user",
+        maxsize: int = 1024,
+    ):
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.keep_tokens = keep_tokens if keep_tokens is not None else max_tokens // 2
+        self.role = role
+        self.maxsize = maxsize
+        # digest of the summarized entries -> summary
+        self._summaries = OrderedDict()
+        self._lock = Lock()
+
+    def __call__(self, entries: List[dict]) -> List[dict]:
+        if not entries or history_tokens(entries) <= self.max_tokens:
+            return entries
+
+        split = len(entries)
+        budget = self.keep_tokens
+        while split > 1:
+            tokens = entry_tokens(entries[split - 1])
+            if tokens > budget and split < len(entries):
+                break
+            budget -= tokens
+            split -= 1
+        recent = _drop_leading_tool_results(entries[split:])
+        split = len(entries) - len(recent)
+
+        summary = self._summary(entries, split)
+        return [{"role": self.role, "content": f"Summary of the earlier conversation: {summary}"}] + recent
+
+    def _summary(self, entries, count) -> str:
+        digests = _prefix_digests(entries, count)
+        summary, start = "", 0
+        with self._lock:
+            # the longest summarized prefix of these entries
+            for end in range(count, 0, -1):
+                cached = self._summaries.get(digests[end - 1])
+                if cached is not None:
+                    summary, start = cached, end
+                    break
+
+        if start < count:
+            summary = self.summarize(summary, to_dicts(entries[start:count]))
+
+        key = digests[count - 1]
+        with self._lock:
+            if 0 < start < count:
+                # the conversation moved on: its shorter summary won't be needed
+                self._summaries.pop(digests[start - 1], None)
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            if len(self._summaries) > self.maxsize:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def clear(self) -> None:
+        with self._lock:
+            self._summaries.clear()
@@ -1,2 +1,16 @@
-from .repl import run_demo_loop
-from .app import run_demo_app
+from importlib import import_module
+
+__all__ = ["run_demo_loop", "run_demo_app"]
+
+_exports = {
+    "run_demo_loop": ".repl",
+    "run_demo_app": ".app",
+}
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -5,9 +5,10 @@ import json
 from pathlib import Path
 import inspect
 import base64
-import dill
 
 def serialize_agent(agent, seen=None):
+    import dill
+
     if seen is None:
         seen = set()
         
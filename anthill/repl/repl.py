@@ -1,42 +1,38 @@
 import json
 
 from anthill import Anthill
-from anthill.types import Message
+from anthill.stream import ContentDelta, ToolCallEnd, ToolCallStart
 
 
 def process_and_print_streaming_response(response):
-    content = ""
     last_sender = ""
-    tool_calls_printed = False
+    printed = False
 
     for chunk in response:
-        if isinstance(chunk, Message):
+        if isinstance(chunk, (ContentDelta, ToolCallStart)):
             # Handle sender/role changes
             if chunk.sender and chunk.sender != last_sender:
                 last_sender = chunk.sender
                 print(f"\033[94m{last_sender}:\033[0m", end=" ", flush=True)
 
-            # Handle content streaming
-            if chunk.content is not None:
-                # Only print the new content (delta)
-                new_content = chunk.content[len(content):]
-                print(new_content, end="", flush=True)
-                content = chunk.content
-
-            # Handle tool calls
-            if chunk.tool_calls is not None and len(chunk.tool_calls) > 0 and not tool_calls_printed:
-                for tool_call in chunk.tool_calls:
-                    name = tool_call["name"]
-                    if name:
-                        print(f"\033[95m{name}\033[0m()", end="", flush=True)
-                tool_calls_printed = True  # Mark tool calls as printed to avoid duplicates
+        if isinstance(chunk, ContentDelta):
+            print(chunk.delta, end="", flush=True)
+            printed = True
+        elif isinstance(chunk, ToolCallStart):
+            print(f"\033[95m{chunk.name}\033[0m", end="", flush=True)
+            printed = True
+        elif isinstance(chunk, ToolCallEnd):
+            arg_str = json.dumps(chunk.arguments).replace(":", "=")
+            print(f"({arg_str[1:-1]})", end=" ", flush=True)
+
+        if not isinstance(chunk, dict):
+            continue
 
         # Handle end of message
-        if "delim" in chunk and chunk["delim"] == "end":
-            if content or tool_calls_printed:
+        if chunk.get("delim") == "end":
+            if printed:
                 print()  # Add final newline
-            content = ""
-            tool_calls_printed = False
+            printed = False
 
         # Handle response object
         if "response" in chunk:
@@ -66,9 +62,15 @@ def pretty_print_messages(messages) -> None:
 
 
 def run_demo_loop(
-    starting_agent, client=None, context_variables=None, stream=False, debug=False
+    starting_agent, client=None, context_variables=None, stream=False, debug=False,
+    session_store=None, session_id=None,
 ) -> None:
-    ant_client = Anthill(client=client)
+    """
+    Chat with `starting_agent` on the command line. With a `session_store`
+    and `session_id`, the conversation is persisted in the store and resumed
+    from it, instead of being kept in memory.
+    """
+    ant_client = Anthill(client=client, session_store=session_store)
     print("Starting Anthill CLI 🐜")
 
     messages = []
@@ -76,14 +78,21 @@ def run_demo_loop(
 
     while True:
         user_input = input("\033[90mUser\033[0m: ")
-        messages.append({"role": "user", "content": user_input})
+        message = {"role": "user", "content": user_input}
+        if session_id:
+            run_messages = [message]
+        else:
+            messages.append(message)
+            run_messages = messages
 
         response = ant_client.run(
             agent=agent,
-            messages=messages,
+            messages=run_messages,
             context_variables=context_variables or {},
             stream=stream,
             debug=debug,
+            stream_deltas=stream,
+            session_id=session_id,
         )
 
         if stream:
@@ -91,5 +100,6 @@ def run_demo_loop(
         else:
             pretty_print_messages(response.messages)
 
-        messages.extend(response.messages)
+        if not session_id:
+            messages.extend(response.messages)
         agent = response.agent
@@ -2,7 +2,8 @@ import streamlit as st
 import json
 import argparse
 from anthill import Anthill
-from anthill.types import Message, Agent
+from anthill.stream import ContentDelta, ToolCallEnd
+from anthill.types import Agent
 import base64
 import dill
 
@@ -78,28 +79,30 @@ def main():
             messages=st.session_state.messages,
             context_variables=context_vars,
             stream=True,
-            debug=args.debug
+            debug=args.debug,
+            stream_deltas=True,
         )
         
         response_data = None
         with st.chat_message("assistant"):
             tool_placeholder = st.empty()
             content_placeholder = st.empty()
+            content = ""
             tool_calls = []
             for chunk in response:
-                if isinstance(chunk, Message):
-                    if chunk.content:
-                        content_placeholder.write(f"{chunk.sender}: {chunk.content}")
-                    
-                    for tool_call in chunk.tool_calls or []:
-                        name, tool_args = tool_call["name"], tool_call["arguments"]
-                        arg_str = json.dumps(tool_args).replace(":", "=")
-                        tool_calls.append(f"{name}({arg_str[1:-1]})")
-                        tool_placeholder.info(tool_calls)
-                
-                if "response" in chunk:
-                    response_data = chunk["response"]
-                    break
+                if isinstance(chunk, ContentDelta):
+                    content += chunk.delta
+                    content_placeholder.write(f"{chunk.sender}: {content}")
+                elif isinstance(chunk, ToolCallEnd):
+                    arg_str = json.dumps(chunk.arguments).replace(":", "=")
+                    tool_calls.append(f"{chunk.name}({arg_str[1:-1]})")
+                    tool_placeholder.info(tool_calls)
+                elif isinstance(chunk, dict):
+                    if chunk.get("delim") == "start":
+                        content = ""
+                    if "response" in chunk:
+                        response_data = chunk["response"]
+                        break
         
         if response_data:
             st.session_state.messages.extend(response_data.messages)
@@ -0,0 +1,298 @@
+import heapq
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Condition, Lock
+from typing import Dict, Optional, Tuple, Type
+
+from .clients import ClientManager
+from .tracing import current_trace
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_EVAL = 20
+
+_priority: ContextVar[int] = ContextVar("anthill_request_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """
+    Run the completions made in this block with `priority`: lower values
+    are served first when a rate limit makes requests queue up.
+    `run_batch` uses `PRIORITY_BATCH`, wrap evals in `PRIORITY_EVAL`.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class TokenBucket:
+    """
+    `rate` requests per second, with bursts of up to `capacity` requests.
+
+    The rate adapts to the provider: `throttle` halves it, down to
+    `min_rate`, when a call is rate limited, and `recover` raises it back
+    towards the configured rate, a tenth of it per successful call.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: Optional[float] = None):
+        self.rate = self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token if one is available and return 0, else return the seconds until one is."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def throttle(self, retry_after: float = 0.0) -> None:
+        """Halve the rate and hand out no token for the next `retry_after` seconds."""
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0) - retry_after * self.rate
+
+    def recover(self) -> None:
+        """Raise the rate a step back towards `max_rate`."""
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class _Lane:
+    """Requests waiting for one token bucket, served by priority then arrival."""
+
+    __slots__ = ("bucket", "condition", "waiters")
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.condition = Condition()
+        self.waiters = []
+
+
+class SchedulerStats:
+    """Counters of a `RequestScheduler`, across every run using it."""
+
+    __slots__ = ("requests", "retries", "failures", "throttles", "queue_wait", "max_queue_wait")
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttles = 0
+        self.queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def __repr__(self):
+        return (f"SchedulerStats(requests={self.requests}, retries={self.retries}, failures={self.failures}, "
+                f"throttles={self.throttles}, queue_wait={self.queue_wait:.3f}, max_queue_wait={self.max_queue_wait:.3f})")
+
+
+def is_retryable(error: Exception) -> bool:
+    import requests
+    from pulsar.client import RetryableAPIError
+
+    if isinstance(error, RetryableAPIError):
+        return error.is_retryable()
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether the provider rejected a call for going over its rate limit."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return "rate limit" in str(getattr(error, "message", "")).lower()
+
+
+class RequestScheduler:
+    """
+    Client wrapper adding rate limiting, retries and priorities to
+    `chat_completion`:
+
+        client = Anthill(client=RequestScheduler(
+            default_client_manager(), rate_limits={"groq": 5, "openai/gpt-4o": 20}))
+
+    Args:
+        client: The wrapped client.
+        rate_limits (dict): Requests per second, by "provider/model" or
+            "provider". The most specific key applies; others are unlimited.
+            A rate-limited call slows its bucket down until calls succeed
+            again, see `TokenBucket`.
+        burst (dict): Bucket capacities, by the same keys. Defaults to one
+            second of requests.
+        max_retries (int): Retries of a failed call, when the error is
+            retryable (429, 5xx, connection errors, ...). When it is not 0
+            and the wrapped client is a `ClientManager`, the scheduler's
+            calls ask it for provider clients without retries of their own.
+        base_delay (float): First retry delay in seconds, doubled on each
+            retry, with full jitter, up to `max_delay`. A longer retry-after
+            from the provider wins.
+    """
+
+    def __init__(
+        self,
+        client,
+        rate_limits: Optional[Dict[str, float]] = None,
+        burst: Optional[Dict[str, float]] = None,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        retryable: Tuple[Type[Exception], ...] = None,
+        sleep=time.sleep,
+    ):
+        self.client = client
+        self.rate_limits = rate_limits or {}
+        self.burst = burst or {}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.sleep = sleep
+        self.stats = SchedulerStats()
+        self._lanes = {}
+        self._lock = Lock()
+        self._sequence = itertools.count()
+        # a single retry layer: a failing call is tried max_retries + 1 times, not N x M. Only
+        # the scheduler's own calls opt out, the wrapped client is shared with other users
+        self._client_kwargs = {"max_retries": 0} if max_retries and isinstance(client, ClientManager) else {}
+
+    def chat_completion(self, messages, model: str, stream: bool = False, **kwargs):
+        # read now: a stream is consumed later, maybe in another context
+        priority, trace = _priority.get(), current_trace.get()
+        if stream:
+            return self._stream(priority, trace, messages=messages, model=model, **kwargs)
+
+        for attempt in itertools.count():
+            self.wait_turn(model, priority, trace)
+            try:
+                completion = self.client.chat_completion(
+                    messages=messages, model=model, stream=False, **self._client_kwargs, **kwargs)
+            except Exception as e:
+                self._retry_or_raise(e, attempt, model, trace)
+                continue
+            self._recover(model)
+            return completion
+
+    def _stream(self, priority, trace, model, **kwargs):
+        # a stream is retried only if it fails before its first chunk
+        for attempt in itertools.count():
+            self.wait_turn(model, priority, trace)
+            try:
+                completion = iter(self.client.chat_completion(
+                    model=model, stream=True, **self._client_kwargs, **kwargs))
+                first = next(completion)
+            except StopIteration:
+                return
+            except Exception as e:
+                self._retry_or_raise(e, attempt, model, trace)
+                continue
+            self._recover(model)
+            yield first
+            yield from completion
+            return
+
+    def wait_turn(self, model: str, priority: int = PRIORITY_INTERACTIVE, trace=None) -> float:
+        """Block until the model's rate limit lets a request through, returning the wait."""
+        lane = self._lane(model)
+        with self._lock:
+            self.stats.requests += 1
+        if lane is None:
+            return 0.0
+
+        start = time.perf_counter()
+        entry = (priority, next(self._sequence))
+        with lane.condition:
+            heapq.heappush(lane.waiters, entry)
+            try:
+                while True:
+                    if lane.waiters[0] == entry:
+                        delay = lane.bucket.take()
+                        if delay == 0:
+                            break
+                        lane.condition.wait(delay)
+                    else:
+                        lane.condition.wait()
+            finally:
+                lane.waiters.remove(entry)
+                heapq.heapify(lane.waiters)
+                lane.condition.notify_all()
+
+        end = time.perf_counter()
+        wait = end - start
+        with self._lock:
+            self.stats.queue_wait += wait
+            self.stats.max_queue_wait = max(self.stats.max_queue_wait, wait)
+        if trace is not None:
+            trace.record("queue_wait", start, end, {"model": model, "priority": priority})
+        return wait
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None) or 0.0
+        return max(backoff, retry_after)
+
+    def _recover(self, model: str):
+        lane = self._lane(model)
+        if lane is not None and lane.bucket.rate < lane.bucket.max_rate:
+            with lane.condition:
+                lane.bucket.recover()
+
+    def _throttle(self, model: str, error: Exception):
+        lane = self._lane(model)
+        if lane is None:
+            return
+        with lane.condition:
+            lane.bucket.throttle(getattr(error, "retry_after", None) or 0.0)
+        with self._lock:
+            self.stats.throttles += 1
+
+    def _retry_or_raise(self, error, attempt, model, trace):
+        if is_rate_limited(error):
+            self._throttle(model, error)
+        retryable = isinstance(error, self.retryable) if self.retryable else is_retryable(error)
+        if not retryable or attempt >= self.max_retries:
+            with self._lock:
+                self.stats.failures += 1
+            raise error
+
+        delay = self.retry_delay(attempt, error)
+        with self._lock:
+            self.stats.retries += 1
+        if trace is not None:
+            now = time.perf_counter()
+            trace.record("retry", now, now + delay, {"model": model, "error": type(error).__name__})
+        self.sleep(delay)
+
+    def _lane(self, model: str) -> Optional[_Lane]:
+        lane = self._lanes.get(model)
+        if lane is not None:
+            return lane
+        with self._lock:
+            if model not in self._lanes:
+                key = model if model in self.rate_limits else model.partition("/")[0]
+                # models without their own limit share their provider's lane
+                if key in self.rate_limits:
+                    if key not in self._lanes:
+                        self._lanes[key] = _Lane(TokenBucket(self.rate_limits[key], self.burst.get(key)))
+                    self._lanes[model] = self._lanes[key]
+                else:
+                    self._lanes[model] = None
+            return self._lanes[model]
@@ -0,0 +1,228 @@
+import glob
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import List, Optional
+
+from .history import ConversationBuffer
+
+
+class SessionStore(ABC):
+    """
+    Base class of session stores: an append-only message history per
+    session id.
+
+    Backends implement `read`, `write`, `rewrite`, `sessions` and `delete`.
+    The store also keeps the converted history of the most recently used
+    sessions in memory, so a run on a session only converts the messages
+    added since its last run. It assumes it is the only writer of its
+    sessions; pass `cache_size=0` when several processes share them.
+    """
+
+    def __init__(self, cache_size: int = 64):
+        self.cache_size = cache_size
+        self._buffers = OrderedDict()
+        self._buffers_lock = Lock()
+
+    @abstractmethod
+    def read(self, session_id: str, last: Optional[int] = None) -> List[dict]:
+        """The stored messages of a session, or only its `last` ones; [] for an unknown session."""
+
+    @abstractmethod
+    def write(self, session_id: str, messages: List[dict]) -> None:
+        """Append messages to a session."""
+
+    @abstractmethod
+    def rewrite(self, session_id: str, messages: List[dict]) -> None:
+        """Replace all the messages of a session."""
+
+    @abstractmethod
+    def sessions(self) -> List[str]:
+        """The ids of the stored sessions."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session."""
+
+    def load(self, session_id: str, last: Optional[int] = None) -> List[dict]:
+        """The messages of a session, or only its `last` ones."""
+        return self.read(session_id, last)
+
+    def load_buffer(self, session_id: str) -> ConversationBuffer:
+        """The whole session as a `ConversationBuffer` the caller is free to modify."""
+        with self._buffers_lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is not None:
+                self._buffers.move_to_end(session_id)
+                return buffer.copy()
+
+        buffer = ConversationBuffer(self.read(session_id))
+        self._cache(session_id, buffer)
+        return buffer.copy()
+
+    def append(self, session_id: str, messages: List[dict]) -> None:
+        if not messages:
+            return
+        self.write(session_id, messages)
+        with self._buffers_lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is not None:
+                buffer.extend(messages)
+
+    def compact(self, session_id: str, keep_last: Optional[int] = None) -> None:
+        """Rewrite a session's log in one piece, keeping only its `keep_last` messages if given."""
+        self.rewrite(session_id, self.read(session_id, keep_last))
+        self._forget(session_id)
+
+    def remove(self, session_id: str) -> None:
+        self.delete(session_id)
+        self._forget(session_id)
+
+    def import_logs(self, pattern: str = "logs/session_*.json", overwrite: bool = False) -> List[str]:
+        """
+        Import sessions saved as a JSON array of messages per file, like
+        `logs/session_YYYYMMDD-HHMMSS.json`. The file name without extension
+        becomes the session id. Returns the imported session ids.
+        """
+        existing = set(self.sessions())
+        imported = []
+        for path in sorted(glob.glob(pattern)):
+            session_id = os.path.splitext(os.path.basename(path))[0]
+            if session_id in existing and not overwrite:
+                continue
+            with open(path, encoding="utf-8") as f:
+                messages = json.load(f)
+            self.rewrite(session_id, messages)
+            self._forget(session_id)
+            imported.append(session_id)
+        return imported
+
+    def _cache(self, session_id, buffer):
+        if not self.cache_size:
+            return
+        with self._buffers_lock:
+            self._buffers[session_id] = buffer
+            self._buffers.move_to_end(session_id)
+            if len(self._buffers) > self.cache_size:
+                self._buffers.popitem(last=False)
+
+    def _forget(self, session_id):
+        with self._buffers_lock:
+            self._buffers.pop(session_id, None)
+
+
+class JsonLinesSessionStore(SessionStore):
+    """Session store writing one JSON lines file per session in `directory`."""
+
+    def __init__(self, directory: str, cache_size: int = 64):
+        super().__init__(cache_size)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+
+    def path(self, session_id: str) -> str:
+        if not session_id or os.sep in session_id or session_id.startswith("."):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def read(self, session_id: str, last: Optional[int] = None) -> List[dict]:
+        path = self.path(session_id)
+        if not os.path.exists(path):
+            return []
+        with self._lock, open(path, encoding="utf-8") as f:
+            lines = deque(f, maxlen=last) if last is not None else f.readlines()
+        messages = []
+        for line in lines:
+            try:
+                messages.append(json.loads(line))
+            except json.JSONDecodeError:
+                # a line cut short by an interrupted append
+                continue
+        return messages
+
+    def write(self, session_id: str, messages: List[dict]) -> None:
+        payload = "".join(json.dumps(m) + "\n" for m in messages)
+        with self._lock, open(self.path(session_id), "a", encoding="utf-8") as f:
+            f.write(payload)
+
+    def rewrite(self, session_id: str, messages: List[dict]) -> None:
+        path = self.path(session_id)
+        payload = "".join(json.dumps(m) + "\n" for m in messages)
+        with self._lock:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(path + ".tmp", path)
+
+    def sessions(self) -> List[str]:
+        return sorted(name[:-len(".jsonl")] for name in os.listdir(self.directory)
+                      if name.endswith(".jsonl"))
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            try:
+                os.remove(self.path(session_id))
+            except FileNotFoundError:
+                pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store keeping every session in one SQLite file."""
+
+    def __init__(self, path: str, cache_size: int = 64):
+        import sqlite3
+
+        super().__init__(cache_size)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS messages "
+            "(id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, message TEXT NOT NULL)")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self._connection.commit()
+        self._lock = Lock()
+
+    def read(self, session_id: str, last: Optional[int] = None) -> List[dict]:
+        with self._lock:
+            if last is None:
+                rows = self._connection.execute(
+                    "SELECT message FROM messages WHERE session_id = ? ORDER BY id", (session_id,)).fetchall()
+            else:
+                rows = self._connection.execute(
+                    "SELECT message FROM (SELECT id, message FROM messages WHERE session_id = ? "
+                    "ORDER BY id DESC LIMIT ?) ORDER BY id", (session_id, last)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def write(self, session_id: str, messages: List[dict]) -> None:
+        rows = [(session_id, json.dumps(m)) for m in messages]
+        with self._lock:
+            self._connection.executemany("INSERT INTO messages (session_id, message) VALUES (?, ?)", rows)
+            self._connection.commit()
+
+    def rewrite(self, session_id: str, messages: List[dict]) -> None:
+        rows = [(session_id, json.dumps(m)) for m in messages]
+        with self._lock:
+            with self._connection:
+                self._connection.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                self._connection.executemany("INSERT INTO messages (session_id, message) VALUES (?, ?)", rows)
+
+    def compact(self, session_id: str, keep_last: Optional[int] = None) -> None:
+        super().compact(session_id, keep_last)
+        with self._lock:
+            self._connection.execute("VACUUM")
+
+    def sessions(self) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT session_id FROM messages ORDER BY session_id").fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,160 @@
+from typing import List
+
+from .types import AgentResponse
+
+
+class ContentDelta:
+    """New text appended to the agent response."""
+
+    __slots__ = ("sender", "delta")
+
+    def __init__(self, sender: str, delta: str):
+        self.sender = sender
+        self.delta = delta
+
+    def __repr__(self):
+        return f"ContentDelta(sender={self.sender!r}, delta={self.delta!r})"
+
+
+class ToolCallStart:
+    """The model started the tool call at `index` of the message."""
+
+    __slots__ = ("sender", "index", "name")
+
+    def __init__(self, sender: str, index: int, name: str):
+        self.sender = sender
+        self.index = index
+        self.name = name
+
+    def __repr__(self):
+        return f"ToolCallStart(sender={self.sender!r}, index={self.index}, name={self.name!r})"
+
+
+class ToolCallArgsDelta:
+    """Arguments of the tool call at `index` that changed since the previous event."""
+
+    __slots__ = ("index", "arguments")
+
+    def __init__(self, index: int, arguments: dict):
+        self.index = index
+        self.arguments = arguments
+
+    def __repr__(self):
+        return f"ToolCallArgsDelta(index={self.index}, arguments={self.arguments!r})"
+
+
+class ToolCallEnd:
+    """The tool call at `index` is complete, with its final arguments."""
+
+    __slots__ = ("index", "name", "arguments")
+
+    def __init__(self, index: int, name: str, arguments: dict):
+        self.index = index
+        self.name = name
+        self.arguments = arguments
+
+    def __repr__(self):
+        return f"ToolCallEnd(index={self.index}, name={self.name!r}, arguments={self.arguments!r})"
+
+
+def _call_arguments(call) -> dict:
+    return {field: getattr(call, field, None) for field in type(call).model_fields if field != "func_name"}
+
+
+class DeltaTracker:
+    """
+    Turns the growing partial responses of a completion stream into delta
+    events. Only the text appended since the previous chunk and the tool
+    call still being generated are looked at, so each chunk costs the size
+    of its delta rather than the size of the whole response.
+    """
+
+    __slots__ = ("sender", "last", "_content_len", "_calls")
+
+    def __init__(self, sender: str):
+        self.sender = sender
+        self.last = None
+        self._content_len = 0
+        self._calls = []
+
+    def feed(self, chunk) -> List:
+        self.last = chunk
+        if chunk is None:
+            return []
+
+        if isinstance(chunk, AgentResponse):
+            content = chunk.content or ""
+            if len(content) <= self._content_len:
+                return []
+            delta = content[self._content_len:]
+            self._content_len = len(content)
+            return [ContentDelta(self.sender, delta)]
+
+        calls = chunk if isinstance(chunk, list) else [chunk]
+        events = []
+        # earlier calls are complete, only the open one and new ones can change
+        for index in range(max(len(self._calls) - 1, 0), len(calls)):
+            call = calls[index]
+            if index == len(self._calls):
+                if self._calls:
+                    events.append(self._end(index - 1))
+                self._calls.append((call.func_name, {}))
+                events.append(ToolCallStart(self.sender, index, call.func_name))
+
+            previous = self._calls[index][1]
+            arguments = _call_arguments(call)
+            changed = {k: v for k, v in arguments.items() if previous.get(k, _UNSET) != v}
+            if changed:
+                previous.update(changed)
+                events.append(ToolCallArgsDelta(index, changed))
+        return events
+
+    def finish(self) -> List:
+        """Events closing the stream: the end of the open tool call, if any."""
+        if not self._calls:
+            return []
+        return [self._end(len(self._calls) - 1)]
+
+    def _end(self, index):
+        name, arguments = self._calls[index]
+        return ToolCallEnd(index, name, dict(arguments))
+
+
+_UNSET = object()
+
+
+class CompletionStream:
+    """The chunks of a streamed completion, with the model that produced them."""
+
+    __slots__ = ("model", "_chunks")
+
+    def __init__(self, chunks, model: str):
+        self.model = model
+        self._chunks = iter(chunks)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class AsyncCompletionStream:
+    """`CompletionStream` over an async iterator."""
+
+    __slots__ = ("model", "_chunks")
+
+    def __init__(self, chunks, model: str):
+        self.model = model
+        self._chunks = chunks.__aiter__()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._chunks.__anext__()
@@ -0,0 +1,52 @@
+from typing import Callable, Optional
+
+
+def tool_timeout(seconds: float):
+    """
+    Give an agent function its own deadline, overriding the agent's
+    `tool_timeout`:
+
+        @tool_timeout(5)
+        def search_orders(query):
+            ...
+    """
+    def decorator(func):
+        func.tool_timeout = seconds
+        return func
+    return decorator
+
+
+def get_tool_timeout(func: Callable) -> Optional[float]:
+    return getattr(func, "tool_timeout", None)
+
+
+class ToolTimeout:
+    """
+    The result of a tool call that didn't finish before its deadline.
+    `started` is False when no worker was free to start it in time.
+    """
+
+    __slots__ = ("name", "timeout", "started")
+
+    def __init__(self, name: str, timeout: float, started: bool = True):
+        self.name = name
+        self.timeout = timeout
+        self.started = started
+
+    def message(self) -> dict:
+        """The tool error message added to the history in place of the result."""
+        error = {"type": "timeout", "timeout": self.timeout}
+        if self.started:
+            reason = f"timed out after {self.timeout:g} seconds"
+        else:
+            reason = f"no worker was free to start it within {self.timeout:g} seconds"
+            error["started"] = False
+        return {
+            "role": "tool",
+            "tool_name": self.name,
+            "content": f"Tool {self.name} failed: {reason}",
+            "error": error,
+        }
+
+    def __repr__(self):
+        return f"ToolTimeout({self.name!r}, {self.timeout!r}, started={self.started!r})"
@@ -0,0 +1,113 @@
+import json
+import time
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from typing import Callable, Optional
+
+from .manifest import __CTX_VARS_NAME__
+
+ToolCacheInfo = namedtuple("ToolCacheInfo", ["hits", "misses", "evictions", "maxsize", "currsize"])
+
+_MISSING = object()
+
+
+class ToolCache:
+    """
+    LRU cache, with optional TTL, for the results of one agent function.
+
+    Results are keyed on the canonical JSON of the call arguments, without
+    `context_variables` unless `include_context` is set.
+
+    Attributes:
+        maxsize (int): Maximum number of cached results, None for no limit.
+        ttl (float): Seconds a result stays valid, None for no expiry.
+        include_context (bool): Whether `context_variables` is part of the key.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 128, ttl: Optional[float] = None, include_context: bool = False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.include_context = include_context
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def make_key(self, args: dict) -> str:
+        if not self.include_context and __CTX_VARS_NAME__ in args:
+            args = {k: v for k, v in args.items() if k != __CTX_VARS_NAME__}
+        return json.dumps(args, sort_keys=True, default=repr)
+
+    def lookup(self, key: str):
+        """Return the cached result for the key, or `_MISSING`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return _MISSING
+
+    def store(self, key: str, value) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def call(self, func: Callable, args: dict):
+        key = self.make_key(args)
+        value = self.lookup(key)
+        if value is _MISSING:
+            value = func(**args)
+            self.store(key, value)
+        return value
+
+    async def acall(self, func: Callable, args: dict):
+        key = self.make_key(args)
+        value = self.lookup(key)
+        if value is _MISSING:
+            value = await func(**args)
+            self.store(key, value)
+        return value
+
+    def cache_info(self) -> ToolCacheInfo:
+        with self._lock:
+            return ToolCacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def cached_tool(func: Callable = None, *, maxsize: Optional[int] = 128, ttl: Optional[float] = None,
+                include_context: bool = False):
+    """
+    Mark an agent function as cacheable. The function itself is returned
+    unchanged with a `tool_cache` attribute, which `Anthill` checks before
+    calling it for a tool call.
+
+        @cached_tool(ttl=60)
+        def get_flight(flight_number):
+            ...
+    """
+    def decorator(func):
+        func.tool_cache = ToolCache(maxsize=maxsize, ttl=ttl, include_context=include_context)
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_tool_cache(func: Callable) -> Optional[ToolCache]:
+    return getattr(func, "tool_cache", None)
@@ -0,0 +1,201 @@
+import json
+import time
+import uuid
+from contextvars import ContextVar
+from threading import Lock
+from typing import Optional
+
+from .types import RunMetrics
+from .util import estimate_tokens
+
+
+class Span:
+    """
+    A timed step of a run.
+
+    Attributes:
+        run_id (str): The id of the run the span belongs to.
+        name (str): The step: "run", "schema_build", "history_reduction", "prompt_build",
+            "model_call", "first_chunk", "tool_call", "tool_timeout", "handoff",
+            "fallback", "hedge", or with a `RequestScheduler`, "queue_wait"
+            and "retry".
+        start (float): Start time, in seconds since the epoch.
+        duration (float): Duration in seconds.
+        attributes (dict): Step details, e.g. the agent or tool name.
+    """
+
+    __slots__ = ("run_id", "name", "start", "duration", "attributes")
+
+    def __init__(self, run_id, name, start, duration, attributes):
+        self.run_id = run_id
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.attributes = attributes
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Receives the spans of every run. This base class is the default and
+    ignores them: runs only keep their `RunMetrics` summary.
+    """
+
+    enabled = False
+
+    def on_span(self, span: Span) -> None:
+        pass
+
+
+class RecordingTracer(Tracer):
+    """Keeps every span in memory, mostly useful in tests."""
+
+    enabled = True
+
+    def __init__(self):
+        self.spans = []
+        self._lock = Lock()
+
+    def on_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+class JsonLinesExporter(Tracer):
+    """Appends each span as a JSON line to a file."""
+
+    enabled = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = Lock()
+
+    def on_span(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class _SpanContext:
+    __slots__ = ("trace", "name", "attributes", "start")
+
+    def __init__(self, trace, name, attributes):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.record(self.name, self.start, time.perf_counter(), self.attributes)
+        return False
+
+
+class _NoSpan:
+    """The span of a run without a tracer: times nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+# steps counted in `RunMetrics` whether or not they are timed
+_COUNTERS = {
+    "model_call": "model_calls",
+    "tool_call": "tool_calls",
+    "handoff": "handoffs",
+    "retry": "retries",
+    "tool_timeout": "tool_timeouts",
+}
+
+
+class RunTrace:
+    """
+    Times the steps of one run, summing them into its `RunMetrics`.
+
+    Without a tracer that records spans (`enabled`), steps are only counted:
+    no span is timed or built, and `RunMetrics.timings` stays empty.
+    """
+
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.enabled = self.tracer.enabled
+        self.run_id = uuid.uuid4().hex
+        self.metrics = RunMetrics()
+        self._wall_start = time.time()
+        self._start = time.perf_counter()
+        self._lock = Lock()
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            self.count(name)
+            return _NO_SPAN
+        return _SpanContext(self, name, attributes)
+
+    def count(self, name: str) -> None:
+        """Count a step without timing it."""
+        counter = _COUNTERS.get(name)
+        if counter is not None:
+            with self._lock:
+                setattr(self.metrics, counter, getattr(self.metrics, counter) + 1)
+
+    def record(self, name: str, start: float, end: float, attributes: dict = None) -> None:
+        duration = end - start
+        if name == "first_chunk" and self.metrics.time_to_first_chunk is None:
+            self.metrics.time_to_first_chunk = duration
+        if not self.enabled:
+            self.count(name)
+            return
+
+        with self._lock:
+            timings = self.metrics.timings
+            timings[name] = timings.get(name, 0.0) + duration
+            counter = _COUNTERS.get(name)
+            if counter is not None:
+                setattr(self.metrics, counter, getattr(self.metrics, counter) + 1)
+
+        wall_start = self._wall_start + (start - self._start)
+        self.tracer.on_span(Span(self.run_id, name, wall_start, duration, attributes or {}))
+
+    def add_prompt(self, chars: int, messages: int) -> None:
+        with self._lock:
+            self.metrics.prompt_messages += messages
+            self.metrics.estimated_prompt_tokens += estimate_tokens(chars)
+
+    def add_completion(self, chars: int) -> None:
+        with self._lock:
+            self.metrics.estimated_completion_tokens += estimate_tokens(chars)
+
+    def finish(self, messages: int) -> RunMetrics:
+        end = time.perf_counter()
+        self.metrics.messages = messages
+        self.metrics.duration = end - self._start
+        if self.enabled:
+            self.tracer.on_span(Span(self.run_id, "run", self._wall_start, self.metrics.duration, {}))
+        return self.metrics
+
+
+# the trace of the run making a client call, for client wrappers to report to
+current_trace: ContextVar[Optional[RunTrace]] = ContextVar("anthill_current_trace", default=None)
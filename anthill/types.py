@@ -1,7 +1,7 @@
-from typing import List, Callable, Union, Optional, Literal
+from typing import Dict, List, Callable, Union, Optional, Literal
 
 # Third-party imports
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 
 class AgentResponse(BaseModel):
@@ -15,6 +15,12 @@ class Agent(BaseModel):
                         ] = "You are a helpful agent."
     functions: List = []
     model_params: Optional[dict] = {}
+    prompt_template: Optional[str] = None
+    parallel_tool_calls: bool = False
+    history_policy: Optional[Callable] = None
+    fallback_models: List[str] = []
+    hedge_after: Optional[float] = None
+    tool_timeout: Optional[float] = None
 
 
 class Message(BaseModel):
@@ -22,12 +28,73 @@ class Message(BaseModel):
     role: str
     content: Optional[str] = None
     tool_calls: Optional[List] = None
+    model: Optional[str] = None
+    _parsed_tool_calls: Optional[List] = PrivateAttr(default=None)
+
+
+class RunMetrics(BaseModel):
+    """
+    Summary of a run, attached to its `Response`.
+
+    Attributes:
+        duration (float): Wall-clock seconds of the whole run.
+        model_calls (int): Number of completions (turns).
+        tool_calls (int): Number of agent functions called.
+        handoffs (int): Number of agent switches.
+        retries (int): Completions retried by a `RequestScheduler`.
+        tool_timeouts (int): Tool calls stopped waiting for at their deadline.
+        deadline_exceeded (bool): Whether the run stopped at its `max_duration`.
+        messages (int): Number of messages the run added.
+        prompt_messages (int): Messages sent to the model, summed over calls.
+        estimated_prompt_tokens (int): Estimated tokens sent, summed over calls.
+        estimated_completion_tokens (int): Estimated tokens generated.
+        time_to_first_chunk (float): Seconds to the first streamed chunk.
+        timings (dict): Total seconds spent in each step ("prompt_build",
+            "schema_build", "model_call", "tool_call", ...). Only filled
+            with a tracer: the default one leaves steps untimed.
+    """
+
+    duration: float = 0.0
+    model_calls: int = 0
+    tool_calls: int = 0
+    handoffs: int = 0
+    retries: int = 0
+    tool_timeouts: int = 0
+    deadline_exceeded: bool = False
+    messages: int = 0
+    prompt_messages: int = 0
+    estimated_prompt_tokens: int = 0
+    estimated_completion_tokens: int = 0
+    time_to_first_chunk: Optional[float] = None
+    timings: Dict[str, float] = {}
+
+
+class ContextDiff(BaseModel):
+    """
+    The `context_variables` changes of one turn of a run.
+
+    Attributes:
+        turn (int): The turn, counted from 0.
+        version (int): The context version at the end of the turn.
+        changed (dict): The keys set, or whose mutable value was changed in
+            place, with their value at the end of the turn. Mutable values
+            are the context's own objects, so later in-place changes show
+            through.
+        removed (list): The keys deleted.
+    """
+
+    turn: int
+    version: int
+    changed: dict = {}
+    removed: List[str] = []
 
 
 class Response(BaseModel):
     messages: List = []
     agent: Optional[Agent] = None
     context_variables: dict = {}
+    metrics: Optional[RunMetrics] = None
+    context_diffs: List[ContextDiff] = []
 
 
 class Result(BaseModel):
@@ -43,3 +110,20 @@ class Result(BaseModel):
     value: str = ""
     agent: Optional[Agent] = None
     context_variables: dict = {}
+
+
+class BatchResult(BaseModel):
+    """
+    The outcome of one conversation of `Anthill.run_batch`.
+
+    Attributes:
+        index (int): The position of the conversation in the batch input.
+        response (Response): The run response, if it succeeded.
+        error (Exception): The exception raised by the run, if it failed.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    response: Optional[Response] = None
+    error: Optional[Exception] = None
@@ -1,4 +1,5 @@
 import inspect
+import math
 from datetime import datetime
 
 
@@ -8,3 +9,8 @@ def debug_print(debug: bool, *args: str) -> None:
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     message = " ".join(map(str, args))
     print(f"\033[97m[\033[90m{timestamp}\033[97m]\033[90m {message}\033[0m")
+
+
+def estimate_tokens(chars: int) -> int:
+    """Rough token count for a text length, at about four characters per token."""
+    return math.ceil(chars / 4)
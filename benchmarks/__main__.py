@@ -0,0 +1,102 @@
+"""
+Run the orchestration loop benchmarks and print machine-readable results.
+
+    python -m benchmarks [--scenario tool_loop] [--iterations 50] [--latency 0] [--output results.json]
+
+For every scenario and mode (`run` and `run_and_stream`) this reports runs
+per second, p50/p99 seconds per turn over every turn of every run, and the
+peak traced allocation of a run.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from anthill import Anthill
+
+from .scenarios import SCENARIOS
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class TurnClock:
+    """Client wrapper timing turns: each completion request starts a new one."""
+
+    def __init__(self, client):
+        self.client = client
+        self.starts = []
+
+    def reset(self):
+        self.client.reset()
+        self.starts.clear()
+
+    def chat_completion(self, **kwargs):
+        self.starts.append(time.perf_counter())
+        return self.client.chat_completion(**kwargs)
+
+
+def bench(scenario, stream, iterations, client_kwargs):
+    clock = TurnClock(scenario.client(**client_kwargs))
+    anthill = Anthill(client=clock)
+    # warm up the manifest, prompt and pydantic caches
+    scenario.run(anthill, stream)
+
+    turn_times = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run_start = time.perf_counter()
+        response = scenario.run(anthill, stream)
+        # a turn runs until the next request, the first one from the start of the run
+        bounds = [run_start, *clock.starts[1:], time.perf_counter()]
+        turn_times.extend(end - begin for begin, end in zip(bounds, bounds[1:]))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    scenario.run(anthill, stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "scenario": scenario.name,
+        "mode": "run_and_stream" if stream else "run",
+        "iterations": iterations,
+        "turns": response.metrics.model_calls,
+        "ops_per_sec": iterations / elapsed,
+        "turn_p50_sec": statistics.median(turn_times),
+        "turn_p99_sec": percentile(turn_times, 99),
+        "peak_alloc_bytes": peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anthill orchestration loop benchmarks")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run, repeatable (default: all)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake model latency in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Delay between streamed chunks")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    client_kwargs = {"latency": args.latency, "chunk_delay": args.chunk_delay}
+    results = []
+    for name in args.scenario or sorted(SCENARIOS):
+        scenario = SCENARIOS[name]()
+        for stream in (False, True):
+            results.append(bench(scenario, stream, args.iterations, client_kwargs))
+
+    report = json.dumps({"python": sys.version.split()[0], "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
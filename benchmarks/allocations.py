@@ -0,0 +1,108 @@
+"""
+Allocations of the run loop bookkeeping: entering a run with a large history
+and context, and appending each assistant turn to the history.
+
+    python -m benchmarks.allocations
+
+"before" reproduces the deepcopy / JSON round-trip bookkeeping `run` used to
+do, "after" is the copy-on-write path it does now.
+"""
+import copy
+import json
+import tracemalloc
+
+from anthill import Anthill, Agent
+from anthill.context import ContextVariables
+from anthill.history import ConversationBuffer
+from anthill.types import Message
+
+from .fake_client import FakeClient
+
+HISTORY_SIZE = 200
+TURNS = 50
+
+
+def make_history(size):
+    history = []
+    for i in range(size // 2):
+        history.append({"role": "user", "content": f"Question number {i} about my booking?"})
+        history.append({"role": "assistant", "sender": "Agent", "content": f"Answer number {i}.",
+                        "tool_calls": None})
+    return history
+
+
+def make_context():
+    return {
+        "customer": {"id": "customer_12345", "name": "John Doe", "orders": [{"id": i, "items": list(range(20))}
+                                                                         for i in range(200)]},
+        "flight": {"number": 1919, "segments": [{"from": "LGA", "to": "LAX", "seat": f"{i}A"} for i in range(50)]},
+    }
+
+
+def make_message():
+    return Message(sender="Agent", role="assistant",
+                   tool_calls=[{"name": "lookup", "arguments": {"item_id": "item_123", "quantity": 2}}])
+
+
+def measure(fn, repeat):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    for _ in range(repeat):
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    return {"peak_bytes": peak - start, "live_blocks": blocks}
+
+
+def entry_before(history, context):
+    return copy.deepcopy(history), copy.deepcopy(context)
+
+
+def entry_after(history, context):
+    return ConversationBuffer(history), ContextVariables(context)
+
+
+def append_before(history, message):
+    history.append(json.loads(message.model_dump_json()))
+
+
+def append_after(history, message):
+    history.append(message.model_dump())
+
+
+def run_loop(turns):
+    def lookup(item_id: str, quantity: int):
+        return "in stock"
+
+    agent = Agent(name="Agent", model="fake/model", functions=[lookup])
+    fake = FakeClient([[("lookup", {"item_id": "item_123", "quantity": 2})]], record_calls=False)
+    client = Anthill(client=fake)
+    history, context = make_history(HISTORY_SIZE), make_context()
+    # Each turn appends the assistant message and the tool result.
+    return fake, lambda: client.run(agent=agent, messages=history, context_variables=context, max_turns=2 * turns)
+
+
+def main():
+    history, context = make_history(HISTORY_SIZE), make_context()
+    message = make_message()
+
+    results = {
+        "entry_before": measure(lambda: entry_before(history, context), 1),
+        "entry_after": measure(lambda: entry_after(history, context), 1),
+    }
+    for name, fn in (("append_before", append_before), ("append_after", append_after)):
+        turns = []
+        results[name] = measure(lambda: fn(turns, message), TURNS)
+        results[name]["per_turn_bytes"] = results[name]["peak_bytes"] // TURNS
+
+    fake, run = run_loop(TURNS)
+    results["run_after"] = measure(run, 1)
+    results["run_after"]["per_turn_bytes"] = results["run_after"]["peak_bytes"] // fake.position
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+import time
+import typing
+
+from anthill.types import AgentResponse
+
+
+def response_models(response_type):
+    """Map each func_name literal found in a response type to its model."""
+    models = {}
+    stack = [response_type]
+    while stack:
+        tp = stack.pop()
+        if isinstance(tp, type) and "func_name" in getattr(tp, "model_fields", {}):
+            name = typing.get_args(tp.model_fields["func_name"].annotation)[0]
+            models[name] = tp
+        stack.extend(typing.get_args(tp))
+    return models
+
+
+class FakeClient:
+    """
+    Deterministic in-process stand-in for the pulsar client, shared by the
+    benchmarks and the test suite.
+
+    Each scripted response is either a string (an agent response) or a list
+    of ``(name, arguments)`` tool calls, returned as the parsed pydantic
+    objects the real client produces. Responses are replayed in order and the
+    last one repeats; ``reset()`` starts over. Exceptions in ``failures`` are
+    raised by the first calls, one per call, before any response is returned.
+
+    Args:
+        responses: The scripted responses.
+        latency: Seconds before a completion (or its first chunk) is returned.
+        chunk_size: Characters per streamed chunk of an agent response.
+        chunk_delay: Seconds between streamed chunks.
+        failures: Exceptions raised by the first calls.
+        record_calls: Whether to keep the parameters of every call in ``calls``.
+    """
+
+    def __init__(self, responses, latency: float = 0.0, chunk_size: int = 4, chunk_delay: float = 0.0,
+                 failures=None, record_calls: bool = True):
+        self.responses = list(responses)
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.failures = list(failures or [])
+        self.record_calls = record_calls
+        self.calls = []
+        self.position = 0
+        self._models = {}
+
+    def reset(self):
+        self.position = 0
+        self.calls = []
+
+    def _next(self, messages, model, system, response_type, stream, kwargs):
+        if self.record_calls:
+            self.calls.append(dict(messages=list(messages), model=model, system=system,
+                                   response_type=response_type, stream=stream, **kwargs))
+        if self.failures:
+            raise self.failures.pop(0)
+        response = self.responses[min(self.position, len(self.responses) - 1)]
+        self.position += 1
+        return response
+
+    def _parse(self, response, response_type):
+        if isinstance(response, str):
+            return AgentResponse(func_name="agent_response", content=response)
+        models = self._models.get(response_type)
+        if models is None:
+            models = self._models[response_type] = response_models(response_type)
+        return [models[name](func_name=name, **args) for name, args in response]
+
+    def _chunks(self, response, response_type):
+        """The partial responses of a streamed response, as the pulsar parser yields them."""
+        if isinstance(response, str):
+            ends = range(self.chunk_size, len(response) + self.chunk_size, self.chunk_size)
+            return [AgentResponse(func_name="agent_response", content=response[:end]) for end in ends]
+        parsed = self._parse(response, response_type)
+        return [parsed[:end] for end in range(1, len(parsed) + 1)]
+
+    def _stream(self, response, response_type):
+        for index, chunk in enumerate(self._chunks(response, response_type)):
+            if index and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield chunk
+
+    def chat_completion(self, messages, model, system=None, response_type=str, stream=False, **kwargs):
+        response = self._next(messages, model, system, response_type, stream, kwargs)
+        if self.latency:
+            time.sleep(self.latency)
+        if stream:
+            return self._stream(response, response_type)
+        return self._parse(response, response_type)
+
+
+class AsyncFakeClient(FakeClient):
+    """FakeClient with an async chat_completion, sleeping and streaming on the event loop."""
+
+    async def _astream(self, chunks):
+        for index, chunk in enumerate(chunks):
+            if index and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield chunk
+
+    async def chat_completion(self, messages, model, system=None, response_type=str, stream=False, **kwargs):
+        response = self._next(messages, model, system, response_type, stream, kwargs)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if stream:
+            return self._astream(self._chunks(response, response_type))
+        return self._parse(response, response_type)
@@ -0,0 +1,79 @@
+"""
+Memory of stored history entries: plain dicts against `MessageRecord`s.
+
+    python -m benchmarks.history_memory [--messages 1000000]
+
+Builds the same conversation both ways (a third user messages, a third
+assistant messages as `Message.model_dump()` returns them, a third tool
+results) and reports the traced bytes the entries hold, without their
+content strings, which both formats share.
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from anthill.history import MessageRecord, to_dicts
+
+
+def make_entry(i, content):
+    kind = i % 3
+    if kind == 0:
+        return {"role": "user", "content": content}
+    if kind == 1:
+        return {"sender": "Support Agent", "role": "assistant", "content": content, "tool_calls": None,
+                "model": "openai/gpt-4o-mini"}
+    return {"role": "tool", "tool_name": "lookup_order", "content": content}
+
+
+def measure(build, contents):
+    tracemalloc.start()
+    entries = build(contents)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return entries, size
+
+
+def build_dicts(contents):
+    return [make_entry(i, content) for i, content in enumerate(contents)]
+
+
+def build_records(contents):
+    return [MessageRecord.from_dict(make_entry(i, content)) for i, content in enumerate(contents)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="History entry memory benchmark")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    contents = [f"message {i}" for i in range(args.messages)]
+    dicts, dict_bytes = measure(build_dicts, contents)
+    del dicts
+    records, record_bytes = measure(build_records, contents)
+
+    start = time.perf_counter()
+    converted = to_dicts(records)
+    to_dicts_sec = time.perf_counter() - start
+    start = time.perf_counter()
+    [MessageRecord.from_dict(entry) for entry in converted]
+    from_dicts_sec = time.perf_counter() - start
+
+    report = {
+        "python": sys.version.split()[0],
+        "messages": args.messages,
+        "dict_bytes": dict_bytes,
+        "record_bytes": record_bytes,
+        "dict_bytes_per_message": dict_bytes / args.messages,
+        "record_bytes_per_message": record_bytes / args.messages,
+        "saving": 1 - record_bytes / dict_bytes,
+        "to_dicts_sec": to_dicts_sec,
+        "from_dicts_sec": from_dicts_sec,
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
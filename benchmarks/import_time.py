@@ -0,0 +1,73 @@
+"""
+Import time of the package, measured in fresh interpreters with
+`python -X importtime`.
+
+    python -m benchmarks.import_time [--repeat 5] [--budget 250]
+
+Reports the best cumulative time of each statement and the heavy optional
+dependencies it loaded; exits non-zero when one goes over `--budget` ms.
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+STATEMENTS = ["import anthill", "from anthill import Anthill, Agent"]
+
+# dependencies that must only load when the feature using them is used
+LAZY_MODULES = ["jinja2", "pulsar", "requests", "dill", "streamlit", "asyncio", "sqlite3"]
+
+DEFAULT_BUDGET_MS = 350.0
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def _top_level_imports(statement):
+    probe = f"{statement}; import sys; print(sorted(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        # top level imports have a single space of indentation
+        if match and len(match.group(3)) == 1:
+            times[match.group(4)] = int(match.group(2))
+    return times, json.loads(result.stdout.strip().replace("'", '"'))
+
+
+def measure(statement, startup=frozenset()):
+    """
+    Cumulative import time in ms of `statement`, leaving out the modules the
+    interpreter imports at startup, and the lazy modules it loaded.
+    """
+    times, loaded = _top_level_imports(statement)
+    return sum(us for name, us in times.items() if name not in startup) / 1000, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anthill import time benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per statement")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="Maximum import time in ms")
+    args = parser.parse_args(argv)
+
+    startup = frozenset(_top_level_imports("pass")[0])
+    results = []
+    for statement in STATEMENTS:
+        runs = [measure(statement, startup) for _ in range(args.repeat)]
+        results.append({
+            "statement": statement,
+            "import_ms": min(ms for ms, _ in runs),
+            "loaded": runs[0][1],
+        })
+
+    print(json.dumps({"python": sys.version.split()[0], "budget_ms": args.budget, "results": results}, indent=2))
+    over = [r["statement"] for r in results if r["import_ms"] > args.budget]
+    if over:
+        print(f"over the {args.budget:g} ms budget: {', '.join(over)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark scenarios for the orchestration loop. Each scenario builds a fresh
+`Anthill` over a `FakeClient`, a starting agent and the input messages.
+"""
+from anthill import Anthill, Agent
+
+from .fake_client import FakeClient
+
+MODEL = "fake/model"
+
+
+class Scenario:
+    def __init__(self, name, agent, script, messages, context_variables=None):
+        self.name = name
+        self.agent = agent
+        self.script = script
+        self.messages = messages
+        self.context_variables = context_variables or {}
+
+    def client(self, **client_kwargs) -> FakeClient:
+        return FakeClient(self.script, **{"chunk_size": 16, "record_calls": False, **client_kwargs})
+
+    def run(self, anthill: Anthill, stream: bool):
+        anthill.client.reset()
+        if stream:
+            for chunk in anthill.run(agent=self.agent, messages=self.messages,
+                                     context_variables=self.context_variables, stream=True):
+                if "response" in chunk:
+                    return chunk["response"]
+        return anthill.run(agent=self.agent, messages=self.messages, context_variables=self.context_variables)
+
+
+def user_message(content="Hi!"):
+    return [{"role": "user", "content": content}]
+
+
+def lookup_order(order_id: str):
+    """Look up an order by id."""
+    return f"Order {order_id} shipped."
+
+
+def single_turn():
+    agent = Agent(name="Agent", model=MODEL, instructions="You are a helpful agent.")
+    return Scenario("single_turn", agent, ["Hello! How can I help you today?"], user_message())
+
+
+def tool_loop(turns=50):
+    agent = Agent(name="Agent", model=MODEL, functions=[lookup_order])
+    script = [[("lookup_order", {"order_id": str(i)})] for i in range(turns - 1)]
+    script.append("All your orders shipped.")
+    return Scenario(f"tool_loop_{turns}", agent, script, user_message("Where are my orders?"))
+
+
+def make_transfer(agent):
+    def transfer():
+        return agent
+    return transfer
+
+
+def handoff_chain(length=5):
+    agents = [Agent(name=f"Agent {i}", model=MODEL, instructions=f"You are agent {i}.") for i in range(length)]
+    script = []
+    for i in range(length - 1):
+        transfer = make_transfer(agents[i + 1])
+        transfer.__name__ = f"transfer_to_agent_{i + 1}"
+        agents[i].functions.append(transfer)
+        script.append([(transfer.__name__, {})])
+    script.append("You reached the last agent.")
+    return Scenario(f"handoff_chain_{length}", agents[0], script, user_message("Transfer me."))
+
+
+def large_history(size=1000):
+    history = []
+    for i in range(size // 2):
+        history.append({"role": "user", "content": f"Question {i} about my order?"})
+        history.append({"role": "assistant", "sender": "Agent", "content": f"Answer {i} about your order.",
+                        "tool_calls": None})
+    history.append({"role": "user", "content": "One more question."})
+    agent = Agent(name="Agent", model=MODEL, functions=[lookup_order])
+    return Scenario(f"large_history_{size}", agent, [[("lookup_order", {"order_id": "1"})], "Done."], history)
+
+
+def many_tools(count=30):
+    functions = []
+    for i in range(count):
+        def tool(query: str, limit: int = 10):
+            return "ok"
+
+        tool.__name__ = f"tool_{i}"
+        tool.__doc__ = f"Tool number {i}."
+        functions.append(tool)
+    agent = Agent(name="Agent", model=MODEL, functions=functions)
+    script = [[(f"tool_{i}", {"query": "x"})] for i in range(0, count, 3)] + ["Done."]
+    return Scenario(f"many_tools_{count}", agent, script, user_message("Use your tools."))
+
+
+SCENARIOS = {
+    "single_turn": single_turn,
+    "tool_loop": tool_loop,
+    "handoff_chain": handoff_chain,
+    "large_history": large_history,
+    "many_tools": many_tools,
+}
@@ -1,9 +1,9 @@
-from pulsar.client import Client
+from anthill.clients import default_client_manager
 
 from pydantic import BaseModel
 from typing import Optional
 
-__client = Client()
+__client = default_client_manager()
 
 
 class BoolEvalResult(BaseModel):
@@ -0,0 +1,4 @@
+"""The scripted clients of the test suite, shared with the benchmarks so the two can't drift."""
+from benchmarks.fake_client import AsyncFakeClient, FakeClient, response_models
+
+__all__ = ["AsyncFakeClient", "FakeClient", "response_models"]
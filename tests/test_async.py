@@ -0,0 +1,75 @@
+import asyncio
+
+from anthill import Anthill, Agent
+from anthill.types import Message
+from tests.fake_client import AsyncFakeClient, FakeClient
+
+
+def get_weather(location):
+    return f"It's sunny in {location}."
+
+
+async def get_time(context_variables):
+    await asyncio.sleep(0)
+    return f"noon for {context_variables['name']}"
+
+
+def make_agent():
+    return Agent(name="A", model="fake/model", functions=[get_weather, get_time])
+
+
+def test_arun_with_async_client_and_async_tool():
+    client = AsyncFakeClient([[("get_weather", {"location": "Paris"}), ("get_time", {})], "Sunny at noon."])
+
+    response = asyncio.run(Anthill(client=client).arun(
+        agent=make_agent(), messages=[{"role": "user", "content": "Hi"}], context_variables={"name": "John"}))
+
+    assert [m["role"] for m in response.messages] == ["assistant", "tool", "tool", "assistant"]
+    assert response.messages[1]["content"] == "Tool get_weather finished with status: It's sunny in Paris."
+    assert response.messages[2]["content"] == "Tool get_time finished with status: noon for John"
+    assert response.messages[-1]["content"] == "Sunny at noon."
+
+
+def test_arun_with_sync_client():
+    client = FakeClient(["Hello!"])
+
+    response = asyncio.run(Anthill(client=client).arun(
+        agent=make_agent(), messages=[{"role": "user", "content": "Hi"}]))
+
+    assert response.messages[-1]["content"] == "Hello!"
+
+
+def test_arun_stream_matches_run_and_stream():
+    script = [[("get_weather", {"location": "Paris"})], "It is sunny in Paris today."]
+    messages = [{"role": "user", "content": "Weather?"}]
+
+    async def collect():
+        client = Anthill(client=AsyncFakeClient(script))
+        return [chunk async for chunk in client.arun_stream(agent=make_agent(), messages=messages)]
+
+    async_chunks = asyncio.run(collect())
+    sync_chunks = list(Anthill(client=FakeClient(script)).run(agent=make_agent(), messages=messages, stream=True))
+
+    def normalize(chunk):
+        return chunk.model_dump() if isinstance(chunk, Message) else chunk
+
+    assert [normalize(c) for c in async_chunks[:-1]] == [normalize(c) for c in sync_chunks[:-1]]
+    assert async_chunks[-1]["response"].messages == sync_chunks[-1]["response"].messages
+
+
+def test_arun_runs_conversations_concurrently():
+    client = AsyncFakeClient(["Hello!"], latency=0.2)
+    anthill = Anthill(client=client)
+
+    async def main():
+        messages = [{"role": "user", "content": "Hi"}]
+        return await asyncio.gather(*[anthill.arun(agent=make_agent(), messages=messages) for _ in range(10)])
+
+    loop = asyncio.new_event_loop()
+    start = loop.time()
+    responses = loop.run_until_complete(main())
+    elapsed = loop.time() - start
+    loop.close()
+
+    assert len(responses) == 10
+    assert elapsed < 1.0
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from anthill import Anthill, Agent
+from anthill.types import AgentResponse
+
+
+class EchoClient:
+    """Answers with the last user message after a delay, failing on "fail"."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def chat_completion(self, messages, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            content = messages[-1]["content"]
+            time.sleep(self.delay if content != "slow" else 4 * self.delay)
+            if content == "fail":
+                raise RuntimeError("provider error")
+            return AgentResponse(func_name="agent_response", content=content)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+AGENT = Agent(name="Echo", model="fake/model")
+
+
+def conversations(contents):
+    return [[{"role": "user", "content": c}] for c in contents]
+
+
+def test_run_batch_keeps_input_order_and_isolates_errors():
+    client = Anthill(client=EchoClient())
+    results = client.run_batch(AGENT, conversations(["slow", "one", "fail", "two"]), max_concurrency=4)
+
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    assert results[0].response.messages[-1]["content"] == "slow"
+    assert results[1].response.messages[-1]["content"] == "one"
+    assert results[2].response is None and isinstance(results[2].error, RuntimeError)
+    assert results[3].response.messages[-1]["content"] == "two"
+
+
+def test_run_batch_bounds_concurrency():
+    echo = EchoClient()
+    Anthill(client=echo).run_batch(AGENT, conversations([str(i) for i in range(12)]), max_concurrency=3)
+    assert echo.max_active == 3
+
+
+def test_run_batch_iter_yields_as_completed():
+    client = Anthill(client=EchoClient())
+    indexes = [r.index for r in client.run_batch_iter(AGENT, conversations(["slow", "fast"]), max_concurrency=2)]
+    assert indexes == [1, 0]
+
+
+def test_run_batch_rejects_stream():
+    client = Anthill(client=EchoClient(delay=0))
+    with pytest.raises(ValueError):
+        client.run_batch(AGENT, conversations(["a"]), stream=True)
+    with pytest.raises(ValueError):
+        client.run_batch_iter(AGENT, conversations(["a"]), stream=True)
+
+    results = client.run_batch(AGENT, conversations(["a"]), stream=False)
+    assert results[0].response.messages[-1]["content"] == "a"
+
+
+def test_per_conversation_context_variables():
+    def instructions(context_variables):
+        return f"Talk to {context_variables['name']}"
+
+    agent = Agent(name="Echo", model="fake/model", instructions=instructions)
+    results = Anthill(client=EchoClient(delay=0)).run_batch(
+        agent, conversations(["a", "b"]), context_variables=[{"name": "Ann"}, {"name": "Bob"}])
+
+    assert [r.response.context_variables for r in results] == [{"name": "Ann"}, {"name": "Bob"}]
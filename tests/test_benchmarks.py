@@ -0,0 +1,42 @@
+import json
+import time
+
+from anthill import Anthill, Agent
+from benchmarks.__main__ import bench, main
+from benchmarks.scenarios import SCENARIOS, Scenario, user_message
+
+
+def test_benchmarks_smoke(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    main(["--iterations", "1", "--output", str(output)])
+    capsys.readouterr()
+
+    results = json.loads(output.read_text())["results"]
+    assert len(results) == 2 * len(SCENARIOS)
+    for result in results:
+        assert result["ops_per_sec"] > 0
+        assert result["turn_p99_sec"] >= result["turn_p50_sec"] > 0
+
+
+def test_scenarios_complete():
+    expected_turns = {"single_turn": 1, "tool_loop": 50, "handoff_chain": 5, "large_history": 2, "many_tools": 11}
+    for name, make in SCENARIOS.items():
+        scenario = make()
+        response = scenario.run(Anthill(client=scenario.client()), stream=False)
+        assert response.metrics.model_calls == expected_turns[name]
+        assert not response.messages[-1].get("tool_calls")
+
+
+def test_percentiles_are_taken_over_single_turns():
+    def lookup(step: int):
+        """Look a step up."""
+        if step == 3:
+            time.sleep(0.05)
+        return "ok"
+
+    script = [[("lookup", {"step": i})] for i in range(9)] + ["Done."]
+    agent = Agent(name="Agent", model="fake/model", functions=[lookup])
+    result = bench(Scenario("slow_turn", agent, script, user_message()), False, 1, {})
+
+    assert result["turn_p99_sec"] >= 0.05
+    assert result["turn_p50_sec"] < 0.01
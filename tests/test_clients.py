@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from anthill import Anthill
+from anthill.clients import ClientManager, default_client_manager
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI-like chat completions endpoint keeping connections alive."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+
+        if payload.get("stream"):
+            chunks = [{"choices": [{"delta": {"content": text}}]} for text in ("Hel", "lo")]
+            body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps({"choices": [{"message": {"content": "Hello"}}]})
+            content_type = "application/json"
+
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = server.in_flight = server.max_in_flight = 0
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_manager(server, **kwargs):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return ClientManager(provider_kwargs={"openaiapilike": {"base_url": base_url}}, **kwargs)
+
+
+def complete(manager, stream=False):
+    return manager.chat_completion(
+        messages=[{"role": "user", "content": "Hi"}], model="openaiapilike/stub", stream=stream)
+
+
+def test_calls_reuse_one_connection(server):
+    manager = make_manager(server)
+
+    for _ in range(5):
+        assert "Hello" in str(complete(manager))
+
+    assert server.connections == 1
+    assert manager.provider_client("openaiapilike") is manager.provider_client("openaiapilike")
+
+
+def test_streams_reuse_the_pool(server):
+    manager = make_manager(server)
+
+    for _ in range(3):
+        chunks = list(complete(manager, stream=True))
+        assert chunks
+
+    assert server.connections == 1
+
+
+def test_concurrency_limit_per_provider(server):
+    server.delay = 0.05
+    manager = make_manager(server, max_concurrency={"openaiapilike": 2})
+
+    threads = [threading.Thread(target=complete, args=(manager,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert server.max_in_flight == 2
+
+
+def test_unstarted_stream_holds_no_slot(server):
+    manager = make_manager(server, max_concurrency=1)
+
+    pending = complete(manager, stream=True)
+    assert "Hello" in str(complete(manager))
+    pending.close()
+
+
+def test_anthill_defaults_to_the_shared_manager():
+    assert Anthill().client is default_client_manager()
+    assert Anthill().client is Anthill().client
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from anthill import Anthill, Agent
+from anthill.completion_cache import InMemoryCompletionCache, SQLiteCompletionCache
+from anthill.types import Message
+from tests.fake_client import FakeClient
+
+
+def get_weather(location):
+    return f"It's sunny in {location}."
+
+
+AGENT = Agent(name="A", model="fake/model", functions=[get_weather])
+MESSAGES = [{"role": "user", "content": "Weather in Paris?"}]
+SCRIPT = [[("get_weather", {"location": "Paris"})], "It is sunny in Paris."]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryCompletionCache()
+    return SQLiteCompletionCache(str(tmp_path / "completions.db"))
+
+
+def test_replays_cached_completions(cache):
+    first = Anthill(client=FakeClient(SCRIPT), completion_cache=cache).run(agent=AGENT, messages=MESSAGES)
+
+    client = FakeClient(["not cached"])
+    second = Anthill(client=client, completion_cache=cache).run(agent=AGENT, messages=MESSAGES)
+
+    assert client.calls == []
+    assert second.messages == first.messages
+
+
+def test_bypass_cache(cache):
+    Anthill(client=FakeClient(SCRIPT), completion_cache=cache).run(agent=AGENT, messages=MESSAGES)
+
+    client = FakeClient(["not cached"])
+    response = Anthill(client=client, completion_cache=cache).run(agent=AGENT, messages=MESSAGES, bypass_cache=True)
+
+    assert response.messages[-1]["content"] == "not cached"
+
+
+def test_key_depends_on_model_and_messages(cache):
+    anthill = Anthill(client=FakeClient(["first"]), completion_cache=cache)
+    anthill.run(agent=AGENT, messages=MESSAGES)
+
+    client = FakeClient(["second"])
+    anthill = Anthill(client=client, completion_cache=cache)
+    assert anthill.run(agent=AGENT, messages=MESSAGES, model_override="fake/other").messages[-1]["content"] == "second"
+    other = [{"role": "user", "content": "Weather in Rome?"}]
+    assert anthill.run(agent=AGENT, messages=other).messages[-1]["content"] == "second"
+
+
+def test_stream_records_and_replays_chunks(cache):
+    def content_chunks(chunks):
+        return [c.content for c in chunks if isinstance(c, Message)]
+
+    recorded = list(Anthill(client=FakeClient(["Sunny all day."]), completion_cache=cache).run(
+        agent=AGENT, messages=MESSAGES, stream=True))
+
+    client = FakeClient(["not cached"])
+    replayed = list(Anthill(client=client, completion_cache=cache).run(agent=AGENT, messages=MESSAGES, stream=True))
+    assert client.calls == []
+    assert content_chunks(replayed) == content_chunks(recorded)
+    assert len(content_chunks(replayed)) > 1
+
+    # a non streamed request gets the final chunk
+    response = Anthill(client=client, completion_cache=cache).run(agent=AGENT, messages=MESSAGES)
+    assert response.messages[-1]["content"] == "Sunny all day."
+
+
+def test_partially_consumed_stream_is_not_cached(cache):
+    stream = Anthill(client=FakeClient(["Sunny all day."]), completion_cache=cache).run(
+        agent=AGENT, messages=MESSAGES, stream=True)
+    next(stream), next(stream)
+    stream.close()
+
+    client = FakeClient(["fresh"])
+    response = Anthill(client=client, completion_cache=cache).run(agent=AGENT, messages=MESSAGES)
+    assert response.messages[-1]["content"] == "fresh"
+
+
+def test_arun_uses_cache(cache):
+    first = asyncio.run(Anthill(client=FakeClient(SCRIPT), completion_cache=cache).arun(agent=AGENT, messages=MESSAGES))
+
+    client = FakeClient(["not cached"])
+    second = asyncio.run(Anthill(client=client, completion_cache=cache).arun(agent=AGENT, messages=MESSAGES))
+    assert client.calls == []
+    assert second.messages == first.messages
+
+
+def test_hits_record_the_model_that_answered(cache):
+    agent = Agent(name="A", model="main/m", fallback_models=["backup/m"])
+    first = Anthill(client=FakeClient(["Hi"], failures=[ConnectionError("main is down")]),
+                    completion_cache=cache).run(agent=agent, messages=MESSAGES)
+    assert first.messages[-1]["model"] == "backup/m"
+
+    client = FakeClient(["not cached"])
+    anthill = Anthill(client=client, completion_cache=cache)
+    replayed = anthill.run(agent=agent, messages=MESSAGES)
+    streamed = list(anthill.run(agent=agent, messages=MESSAGES, stream=True))[-1]["response"]
+    awaited = asyncio.run(anthill.arun(agent=agent, messages=MESSAGES))
+
+    assert client.calls == []
+    for response in (replayed, streamed, awaited):
+        assert response.messages[-1]["model"] == "backup/m"
@@ -0,0 +1,165 @@
+import copy
+import json
+import pickle
+
+from anthill import Anthill, Agent
+from anthill.context import ContextVariables, ContextView
+from anthill.types import Result
+from tests.fake_client import FakeClient
+
+
+def test_reads_copy_mutable_values_once():
+    base = {"cart": ["apple"], "user": "John"}
+    context = ContextVariables(base)
+
+    context["cart"].append("pear")
+    context.get("cart").append("plum")
+
+    assert base == {"cart": ["apple"], "user": "John"}
+    assert context.to_dict() == {"cart": ["apple", "pear", "plum"], "user": "John"}
+
+
+def test_untouched_values_are_shared():
+    base = {"cart": ["apple"], "orders": [1, 2]}
+    context = ContextVariables(base)
+    context["cart"]
+
+    result = context.to_dict()
+    assert result["orders"] is base["orders"]
+    assert result["cart"] is not base["cart"]
+
+
+def test_behaves_like_a_dict():
+    context = ContextVariables({"a": 1})
+    context.update({"b": [2]}, c=3)
+
+    assert isinstance(context, dict)
+    assert json.loads(json.dumps(context)) == {"a": 1, "b": [2], "c": 3}
+    assert context.pop("c") == 3
+    assert context.setdefault("d", 4) == 4
+    assert dict(context.items()) == {"a": 1, "b": [2], "d": 4}
+
+
+def test_copies_and_merges():
+    base = {"cart": ["apple"], "user": "John"}
+    context = ContextVariables(base)
+
+    shallow = copy.copy(context)
+    shallow["user"] = "Ann"
+    shallow["cart"].append("pear")
+    for clone in (copy.deepcopy(context), pickle.loads(pickle.dumps(context))):
+        assert isinstance(clone, ContextVariables) and clone == {"cart": ["apple"], "user": "John"}
+    assert context.checkpoint() == ({}, set())
+    assert base == {"cart": ["apple"], "user": "John"}
+
+    merged = context | {"tier": "gold"}
+    assert isinstance(merged, ContextVariables) and "tier" not in context
+    context |= {"tier": "gold"}
+    assert context.checkpoint() == ({"tier": "gold"}, set())
+    context.clear()
+    assert context == {} and context.checkpoint() == ({}, {"cart", "user", "tier"})
+
+
+def test_run_leaves_inputs_unchanged():
+    def add_to_cart(item, context_variables):
+        context_variables["cart"].append(item)
+        return "Added"
+
+    agent = Agent(name="A", model="fake/model", functions=[add_to_cart])
+    client = FakeClient([[("add_to_cart", {"item": "pear"})], "Done."])
+    messages = [{"role": "user", "content": "Add a pear"}]
+    context = {"cart": ["apple"]}
+
+    response = Anthill(client=client).run(agent=agent, messages=messages, context_variables=context)
+
+    assert context == {"cart": ["apple"]}
+    assert messages == [{"role": "user", "content": "Add a pear"}]
+    assert response.context_variables == {"cart": ["apple", "pear"]}
+    assert response.messages[0]["tool_calls"] == [{"name": "add_to_cart", "arguments": {"item": "pear"}}]
+
+
+def test_copies_made_by_tools_leave_inputs_unchanged():
+    def rename(context_variables):
+        merged = {**context_variables}
+        merged["customer"]["name"] = "Changed"
+        dict(context_variables)["orders"].append(3)
+        return "Renamed"
+
+    agent = Agent(name="A", model="fake/model", functions=[rename])
+    context = {"customer": {"name": "Ann"}, "orders": [1, 2]}
+
+    response = Anthill(client=FakeClient([[("rename", {})], "Done."])).run(
+        agent=agent, messages=[], context_variables=context)
+
+    assert context == {"customer": {"name": "Ann"}, "orders": [1, 2]}
+    assert response.context_variables == {"customer": {"name": "Changed"}, "orders": [1, 2, 3]}
+
+
+def test_changes_bump_versions_and_mark_keys_dirty():
+    context = ContextVariables({"user": "John", "cart": ["apple"], "tier": "gold"})
+    assert context.version == 0 and not context.dirty
+
+    context["user"] = "John"
+    context["user"]
+    assert context.version == 0 and not context.dirty
+
+    context["user"] = "Jane"
+    context["cart"].append("pear")
+    del context["tier"]
+
+    assert context.dirty == {"user", "cart", "tier"}
+    assert context.key_version("user") < context.key_version("cart") < context.key_version("tier")
+    assert context.key_version("missing") == 0
+
+    changed, removed = context.checkpoint()
+    assert changed == {"user": "Jane", "cart": ["apple", "pear"]}
+    assert removed == {"tier"}
+    assert not context.dirty and context.turn == 1
+
+
+def test_checkpoint_reports_mutable_values_only_when_they_changed():
+    record = {"name": "John", "flights": [{"number": "AA1", "seat": "12A"}]}
+    context = ContextVariables({"customer_context": record})
+
+    for _ in range(3):
+        ContextView(context).get("customer_context")
+        assert context.checkpoint() == ({}, set())
+    assert context.key_version("customer_context") == 3
+
+    context["customer_context"]["flights"][0]["seat"] = "14C"
+    changed, _ = context.checkpoint()
+    assert changed == {"customer_context": {"name": "John", "flights": [{"number": "AA1", "seat": "14C"}]}}
+
+    context["customer_context"]
+    assert context.checkpoint() == ({}, set())
+    assert record["flights"][0]["seat"] == "12A"
+
+
+def test_view_reads_missing_keys_as_empty_strings():
+    context = ContextVariables({"name": "John"})
+    view = ContextView(context)
+
+    assert f"{view['name']} {view['missing']}" == "John "
+    assert view.get("missing") is None
+    assert "missing" not in context and len(view) == 1
+
+
+def test_run_reports_context_diffs_per_turn():
+    def set_seat(seat, context_variables):
+        context_variables["seat"] = seat
+        return "Done"
+
+    def cancel():
+        return Result(value="Cancelled", context_variables={"seat": None, "status": "cancelled"})
+
+    agent = Agent(name="A", model="fake/model", functions=[set_seat, cancel],
+                  instructions=lambda context_variables: f"Help {context_variables['name']}.")
+    client = FakeClient([[("set_seat", {"seat": "12A"})], [("cancel", {})], "Cancelled."])
+
+    response = Anthill(client=client).run(agent=agent, messages=[], context_variables={"name": "John"})
+
+    assert [(d.turn, d.changed, d.removed) for d in response.context_diffs] == [
+        (0, {"seat": "12A"}, []),
+        (1, {"seat": None, "status": "cancelled"}, []),
+    ]
+    assert response.context_diffs[-1].version == 3
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from anthill import Anthill, Agent
+from tests.fake_client import FakeClient
+
+
+class GatedClient(FakeClient):
+    """Holds the stream after the second tool call until `gate` is set."""
+
+    def __init__(self, responses, gate):
+        super().__init__(responses)
+        self.gate = gate
+        self.gate_was_open = None
+
+    def _stream(self, response, response_type):
+        for index, chunk in enumerate(super()._stream(response, response_type)):
+            if index == 2 and isinstance(chunk, list):
+                self.gate_was_open = self.gate.wait(timeout=2)
+            yield chunk
+
+
+def test_first_tool_runs_while_stream_is_arriving():
+    gate = threading.Event()
+
+    def first(x):
+        gate.set()
+        return f"first {x}"
+
+    def second(x):
+        return f"second {x}"
+
+    agent = Agent(name="A", model="fake/model", functions=[first, second])
+    client = GatedClient([[("first", {"x": "a"}), ("second", {"x": "b"}), ("first", {"x": "c"})], "Done."], gate)
+
+    chunks = list(Anthill(client=client).run_and_stream(
+        agent=agent, messages=[{"role": "user", "content": "Hi"}], early_tool_dispatch=True))
+
+    assert client.gate_was_open
+    tool_messages = [m["content"] for m in chunks[-1]["response"].messages if m["role"] == "tool"]
+    assert tool_messages == [
+        "Tool first finished with status: first a",
+        "Tool second finished with status: second b",
+        "Tool first finished with status: first c",
+    ]
+
+
+def test_sequential_order_is_kept_when_not_parallel():
+    order = []
+
+    def slow(x):
+        time.sleep(0.05)
+        order.append(x)
+        return x
+
+    def fast(x):
+        order.append(x)
+        return x
+
+    agent = Agent(name="A", model="fake/model", functions=[slow, fast])
+    client = FakeClient([[("slow", {"x": "1"}), ("fast", {"x": "2"})], "Done."])
+
+    list(Anthill(client=client).run_and_stream(
+        agent=agent, messages=[{"role": "user", "content": "Hi"}], early_tool_dispatch=True))
+
+    assert order == ["1", "2"]
+
+
+def test_handoff_and_context_through_early_dispatch():
+    other = Agent(name="B", model="fake/model")
+
+    def greet(context_variables):
+        return f"hello {context_variables['name']}"
+
+    def transfer():
+        return other
+
+    agent = Agent(name="A", model="fake/model", functions=[greet, transfer])
+    client = FakeClient([[("greet", {}), ("transfer", {})], "Done."])
+
+    response = Anthill(client=client).run(
+        agent=agent, messages=[{"role": "user", "content": "Hi"}], context_variables={"name": "Ann"},
+        stream=True, early_tool_dispatch=True)
+    response = list(response)[-1]["response"]
+
+    assert response.messages[1]["content"] == "Tool greet finished with status: hello Ann"
+    assert response.agent.name == "B"
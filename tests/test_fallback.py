@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import pytest
+
+from anthill import Anthill, Agent
+from anthill.tracing import RecordingTracer
+from tests.fake_client import FakeClient
+
+
+class ModelClient(FakeClient):
+    """Answers with the model's name, after a per-model delay or failure."""
+
+    def __init__(self, delays=None, failing=()):
+        super().__init__(["unused"])
+        self.delays = delays or {}
+        self.failing = set(failing)
+
+    def chat_completion(self, messages, model, system=None, response_type=str, stream=False, **kwargs):
+        self.calls.append(dict(model=model, stream=stream))
+        time.sleep(self.delays.get(model, 0))
+        if model in self.failing:
+            raise ConnectionError(f"{model} is down")
+        if stream:
+            return self._stream(f"answer from {model}", response_type)
+        return self._parse(f"answer from {model}", response_type)
+
+
+def make_agent(**kwargs):
+    return Agent(name="A", model="main/model", fallback_models=["backup/one", "backup/two"], **kwargs)
+
+
+def run(client, agent, tracer=None, **kwargs):
+    return Anthill(client=client, tracer=tracer).run(
+        agent=agent, messages=[{"role": "user", "content": "Hi"}], **kwargs)
+
+
+def test_falls_back_in_order():
+    client = ModelClient(failing={"main/model", "backup/one"})
+
+    response = run(client, make_agent(), tracer=RecordingTracer())
+
+    assert [c["model"] for c in client.calls] == ["main/model", "backup/one", "backup/two"]
+    assert response.messages[-1]["content"] == "answer from backup/two"
+    assert response.messages[-1]["model"] == "backup/two"
+    assert response.metrics.timings["fallback"] == 0
+
+
+def test_all_models_failing_raises():
+    client = ModelClient(failing={"main/model", "backup/one", "backup/two"})
+
+    with pytest.raises(ConnectionError):
+        run(client, make_agent())
+
+
+def test_model_override_is_pinned():
+    client = ModelClient(failing={"pinned/model"})
+
+    with pytest.raises(ConnectionError):
+        run(client, make_agent(), model_override="pinned/model")
+    assert [c["model"] for c in client.calls] == ["pinned/model"]
+
+
+def test_hedged_request_takes_the_first_response():
+    client = ModelClient(delays={"main/model": 0.5})
+    start = time.perf_counter()
+
+    response = run(client, make_agent(hedge_after=0.05))
+
+    assert time.perf_counter() - start < 0.4
+    assert response.messages[-1]["model"] == "backup/one"
+    assert [c["model"] for c in client.calls] == ["main/model", "backup/one"]
+
+
+def test_fast_primary_is_not_hedged():
+    client = ModelClient()
+
+    response = run(client, make_agent(hedge_after=0.5))
+
+    assert response.messages[-1]["model"] == "main/model"
+    assert len(client.calls) == 1
+
+
+def test_hedged_stream_records_model():
+    client = ModelClient(delays={"main/model": 0.5})
+
+    chunks = list(run(client, make_agent(hedge_after=0.05), stream=True))
+
+    messages = [c for c in chunks if not isinstance(c, dict)]
+    assert messages[-1].model == "backup/one"
+    assert chunks[-1]["response"].messages[-1]["content"] == "answer from backup/one"
+
+
+def test_async_fallback_and_hedge():
+    client = ModelClient(delays={"main/model": 0.5}, failing={"backup/one"})
+
+    response = asyncio.run(Anthill(client=client).arun(
+        agent=make_agent(hedge_after=0.05), messages=[{"role": "user", "content": "Hi"}]))
+
+    # the hedge failed, so the still slow primary is hedged again
+    assert response.messages[-1]["model"] == "backup/two"
+
+    client = ModelClient(failing={"main/model"})
+    response = asyncio.run(Anthill(client=client).arun(
+        agent=make_agent(), messages=[{"role": "user", "content": "Hi"}]))
+    assert response.messages[-1]["model"] == "backup/one"
+
+
+
+class SignalClient(FakeClient):
+    """
+    Async client whose main model answers the moment a backup is called, so
+    both calls of a hedge finish in the same loop iteration. It keeps its
+    streams alive, so only an explicit close can finish them.
+    """
+
+    def __init__(self):
+        super().__init__(["unused"])
+        self.streams = []
+        self.started = set()
+        self.closed = set()
+        self.called = None
+
+    async def chat_completion(self, messages, model, system=None, response_type=str, stream=True, **kwargs):
+        if self.called is None:
+            self.called = asyncio.Event()
+        if model == "main/model":
+            await self.called.wait()
+        else:
+            self.called.set()
+        stream = self._tracked(model, self._stream(f"answer from {model}", response_type))
+        self.streams.append(stream)
+        return stream
+
+    async def _tracked(self, model, chunks):
+        try:
+            for chunk in chunks:
+                self.started.add(model)
+                yield chunk
+        finally:
+            self.closed.add(model)
+
+
+def test_async_hedge_closes_streams_finished_with_the_winner():
+    client = SignalClient()
+
+    async def consume():
+        events = [event async for event in Anthill(client=client).arun_stream(
+            agent=make_agent(hedge_after=0.05), messages=[{"role": "user", "content": "Hi"}])]
+        await asyncio.sleep(0.05)
+        # checked before asyncio.run closes leftover generators itself
+        return events, set(client.closed)
+
+    events, closed = asyncio.run(consume())
+
+    assert events[-1]["response"].messages[-1]["content"].startswith("answer from")
+    assert client.started == {"main/model", "backup/one"}
+    assert closed == client.started
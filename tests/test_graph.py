@@ -0,0 +1,111 @@
+import pytest
+
+from anthill import Anthill, Agent
+from anthill.graph import AgentGraph, AgentGraphError, AgentGraphWarning, handoff_targets
+from anthill.types import Result
+from tests.fake_client import FakeClient
+
+
+def transfer_to_sales():
+    """Transfer to Sales Agent."""
+    return sales_agent
+
+
+def transfer_back_to_triage():
+    return triage_agent
+
+
+def transfer_to_nowhere():
+    return missing_agent  # noqa: F821
+
+
+def make_transfer(agent):
+    def transfer_to_refunds():
+        return agent
+    return transfer_to_refunds
+
+
+def refund(item_id):
+    return f"refunded {item_id}"
+
+
+refunds_agent = Agent(name="Refunds Agent", model="fake/model", functions=[refund])
+triage_agent = Agent(name="Triage Agent", model="fake/model", instructions="Triage.",
+                     functions=[transfer_to_sales, make_transfer(refunds_agent)])
+sales_agent = Agent(name="Sales Agent", model="fake/model",
+                    instructions=lambda context_variables: f"Sell to {context_variables['name']}.",
+                    functions=[transfer_back_to_triage])
+refunds_agent.functions.append(transfer_back_to_triage)
+
+
+def test_discovers_agents_through_globals_and_closures():
+    graph = AgentGraph(triage_agent)
+
+    assert {a.name for a in graph.agents} == {"Triage Agent", "Sales Agent", "Refunds Agent"}
+    assert graph.get("Refunds Agent") is refunds_agent
+    assert graph.node(triage_agent).handoffs["transfer_to_refunds"] == [refunds_agent]
+    assert handoff_targets(transfer_back_to_triage) == [triage_agent]
+
+
+def test_precompiles_static_prompts_only():
+    graph = AgentGraph(triage_agent)
+
+    assert "Triage." in graph.node(triage_agent).system_prompt
+    assert graph.node(sales_agent).system_prompt is None
+    assert "transfer_to_sales" in graph.node(triage_agent).manifest.tool_map
+
+
+def test_invalid_graphs_are_rejected():
+    broken = Agent(name="Broken", model="fake/model", functions=[transfer_to_nowhere])
+    with pytest.raises(AgentGraphError, match="missing_agent"):
+        AgentGraph(broken)
+
+    def transfer_to_nobody():
+        return None
+
+    with pytest.raises(AgentGraphError, match="transfer_to_nobody"):
+        AgentGraph(Agent(name="Lonely", model="fake/model", functions=[transfer_to_nobody]))
+
+    twin = Agent(name="Triage Agent", model="fake/model")
+
+    def transfer_to_twin():
+        return twin
+
+    with pytest.raises(AgentGraphError, match="two agents"):
+        AgentGraph(Agent(name="Triage Agent", model="fake/model", functions=[transfer_to_twin]))
+
+
+def test_only_returned_agents_are_handoffs():
+    twin = Agent(name="Sales Agent", model="fake/model")
+
+    def check_escalation(context_variables):
+        # mentions an agent with a taken name, but never hands off to it
+        if context_variables.get("agent") is twin:
+            return "escalated"
+        return Result(value="routed", agent=sales_agent)
+
+    graph = AgentGraph(Agent(name="Front Desk", model="fake/model", functions=[check_escalation]))
+
+    assert graph.node(graph.root).handoffs["check_escalation"] == [sales_agent]
+    assert twin not in graph
+
+    def transfer_indirectly():
+        target = refunds_agent
+        return target
+
+    with pytest.warns(AgentGraphWarning, match="Refunds Agent"):
+        graph = AgentGraph(Agent(name="Router", model="fake/model", functions=[transfer_indirectly]))
+    assert len(graph) == 1
+
+
+def test_run_uses_the_precompiled_state():
+    client = FakeClient([[("transfer_to_sales", {})], "Bees!"])
+    anthill = Anthill(client=client, graph=AgentGraph(triage_agent))
+
+    response = anthill.run(agent=triage_agent, messages=[{"role": "user", "content": "Hi"}],
+                           context_variables={"name": "Ann"})
+
+    assert response.agent is sales_agent
+    assert response.messages[-1]["content"] == "Bees!"
+    assert "Triage." in client.calls[0]["system"]
+    assert "Sell to Ann." in client.calls[1]["system"]
@@ -0,0 +1,117 @@
+import json
+import pickle
+
+import pytest
+
+from anthill import Anthill, Agent, ConversationBuffer
+from anthill.history import MessageRecord, project_history
+from benchmarks.history_memory import main as history_memory
+from tests.fake_client import FakeClient
+
+
+def lookup(item_id):
+    return f"Item {item_id} is in stock."
+
+
+HISTORY = [
+    {"role": "user", "content": "Is item 1 in stock?"},
+    {"role": "assistant", "content": None, "sender": "A",
+     "tool_calls": [{"name": "lookup", "arguments": {"item_id": "1"}}]},
+    {"role": "tool", "tool_name": "lookup", "content": "Tool lookup finished with status: yes"},
+    {"role": "assistant", "content": "Yes it is.", "sender": "A", "tool_calls": None},
+]
+
+
+def test_buffer_matches_full_projection():
+    buffer = ConversationBuffer(HISTORY[:2])
+    buffer.extend(HISTORY[2:])
+
+    assert buffer.entries == HISTORY
+    assert buffer.messages == project_history(HISTORY)
+
+
+def test_project_reuses_the_messages_of_kept_entries():
+    buffer = ConversationBuffer(HISTORY * 3)
+    summary = {"role": "user", "content": "Summary of the earlier conversation: stock checks"}
+    reduced = [summary] + buffer.entries[-3:]
+
+    messages, chars = buffer.project(reduced)
+
+    assert messages == project_history(reduced)
+    assert chars == sum(len(m["content"]) for m in messages)
+    assert messages[-1] is buffer.messages[-1]
+
+
+def test_copy_does_not_share_lists():
+    buffer = ConversationBuffer(HISTORY)
+    fork = buffer.copy()
+    fork.append({"role": "user", "content": "Thanks"})
+
+    assert len(buffer) == len(HISTORY)
+    assert len(fork.messages) == len(buffer.messages) + 1
+
+
+def test_run_reuses_buffer_across_runs():
+    agent = Agent(name="A", model="fake/model", functions=[lookup])
+    client = FakeClient([[("lookup", {"item_id": "1"})], "Yes it is.", "You're welcome."])
+    anthill = Anthill(client=client)
+
+    buffer = ConversationBuffer([{"role": "user", "content": "Is item 1 in stock?"}])
+    response = anthill.run(agent=agent, messages=buffer)
+    assert len(buffer) == 1
+
+    buffer.extend(response.messages)
+    buffer.append({"role": "user", "content": "Thanks"})
+    anthill.run(agent=agent, messages=buffer)
+
+    assert client.calls[-1]["messages"] == project_history(buffer.entries)
+
+
+def test_record_round_trip():
+    for entry in HISTORY + [{"role": "tool", "tool_call_id": "call_1", "content": "ok"}]:
+        record = MessageRecord.from_dict(entry)
+        assert record.to_dict() == entry
+        assert record == entry
+        assert {**record} == entry
+        assert pickle.loads(pickle.dumps(record)) == entry
+
+
+def test_record_reads_like_a_dict():
+    record = MessageRecord.from_dict({"role": "tool", "tool_name": "lookup", "content": "ok", "tool_call_id": "c"})
+
+    assert record["role"] == "tool"
+    assert record["tool_call_id"] == "c"
+    assert record.get("sender") is None
+    assert record.get("tool_calls", []) == []
+    assert "tool_name" in record and "model" not in record
+    assert len(record) == 4
+    with pytest.raises(KeyError):
+        record["sender"]
+
+
+def test_record_interns_names():
+    first = MessageRecord.from_dict(json.loads('{"role": "assistant", "sender": "Support", "content": "a"}'))
+    second = MessageRecord.from_dict(json.loads('{"role": "assistant", "sender": "Support", "content": "b"}'))
+
+    assert first.role is second.role
+    assert first.sender is second.sender
+
+
+def test_buffer_stores_records_and_runs_return_dicts():
+    agent = Agent(name="A", model="fake/model", functions=[lookup])
+    client = FakeClient([[("lookup", {"item_id": "1"})], "Yes it is."])
+    buffer = ConversationBuffer(HISTORY[:1])
+
+    response = Anthill(client=client).run(agent=agent, messages=buffer)
+
+    assert all(type(entry) is MessageRecord for entry in buffer.entries)
+    assert buffer.to_dicts() == HISTORY[:1]
+    assert all(type(message) is dict for message in response.messages)
+    json.dumps(response.messages)
+
+
+def test_history_memory_benchmark_smoke(capsys):
+    report = history_memory(["--messages", "3000"])
+    capsys.readouterr()
+
+    assert report["record_bytes"] < report["dict_bytes"]
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.import_time import LAZY_MODULES, measure
+
+
+def loaded_modules(statement):
+    probe = f"{statement}; import sys; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def test_import_loads_no_heavy_dependencies():
+    assert loaded_modules("import anthill") == []
+    assert loaded_modules("from anthill import Anthill, Agent, Response, ConversationBuffer") == []
+    assert loaded_modules("from anthill.repl import run_demo_loop, run_demo_app") == []
+
+
+def test_dependencies_load_on_first_use():
+    assert "jinja2" in loaded_modules(
+        "from anthill.prompt import get_template; get_template('{{ name }}')")
+    assert "sqlite3" in loaded_modules(
+        "from anthill.sessions import SQLiteSessionStore; SQLiteSessionStore(':memory:')")
+
+
+def test_lazy_exports():
+    import anthill
+
+    assert set(anthill.__all__) <= set(dir(anthill))
+    assert anthill.Anthill.__name__ == "Anthill"
+    with pytest.raises(AttributeError):
+        anthill.Missing
+
+
+def test_import_time_benchmark_smoke():
+    import_ms, loaded = measure("import anthill")
+    assert import_ms > 0
+    assert loaded == []
@@ -0,0 +1,93 @@
+from anthill import Anthill, Agent
+from anthill.context import ContextVariables
+from anthill.instructions import InstructionsCache
+from anthill.manifest import get_manifest
+from tests.fake_client import FakeClient
+
+
+def make_instructions(calls):
+    def instructions(context_variables):
+        calls.append(1)
+        return f"Help {context_variables['name']} with order {context_variables.get('order')}."
+    return instructions
+
+
+def lookup(context_variables):
+    context_variables["looked_up"] = True
+    return "Found"
+
+
+def rename(name, context_variables):
+    context_variables["name"] = name
+    return "Renamed"
+
+
+def test_prompt_reused_until_a_read_key_changes():
+    calls = []
+    agent = Agent(name="A", model="fake/model", functions=[lookup, rename], instructions=make_instructions(calls))
+    client = FakeClient([[("lookup", {})], [("rename", {"name": "Jane"})], "Done."])
+    cache = InstructionsCache()
+
+    Anthill(client=client, instructions_cache=cache).run(
+        agent=agent, messages=[], context_variables={"name": "John", "order": 7})
+
+    systems = [call["system"] for call in client.calls]
+    assert "Help John with order 7." in systems[0]
+    assert systems[1] == systems[0]
+    assert "Help Jane with order 7." in systems[2]
+    assert len(calls) == 2
+    assert cache.cache_info()[:2] == (1, 2)
+
+
+def test_prompt_reused_across_runs_with_equal_values():
+    calls = []
+    agent = Agent(name="A", model="fake/model", instructions=make_instructions(calls))
+    anthill = Anthill(client=FakeClient(["Hi."]), instructions_cache=InstructionsCache())
+
+    anthill.run(agent=agent, messages=[], context_variables={"name": "John", "other": 1})
+    anthill.run(agent=agent, messages=[], context_variables={"name": "John", "other": 2})
+    anthill.run(agent=agent, messages=[], context_variables={"name": "Jane"})
+
+    assert len(calls) == 2
+    assert anthill.instructions_cache.hits == 1
+
+
+def test_mutable_values_are_tracked_by_version():
+    calls = []
+
+    def instructions(context_variables):
+        calls.append(1)
+        return f"Cart: {', '.join(context_variables['cart'])}"
+
+    agent = Agent(name="A", model="fake/model", instructions=instructions)
+    manifest = get_manifest(agent)
+    cache = InstructionsCache()
+    context = ContextVariables({"cart": ["apple"]})
+
+    def render(view):
+        return agent.instructions(view)
+
+    assert cache.system_prompt(agent, manifest, context, render) == "Cart: apple"
+    assert cache.system_prompt(agent, manifest, context, render) == "Cart: apple"
+    context["cart"].append("pear")
+    assert cache.system_prompt(agent, manifest, context, render) == "Cart: apple, pear"
+    # same values, but another run: the version can't be compared
+    assert cache.system_prompt(agent, manifest, ContextVariables({"cart": ["apple", "pear"]}), render)
+    assert len(calls) == 3
+
+
+def test_iterating_the_context_depends_on_its_keys():
+    calls = []
+
+    def instructions(context_variables):
+        calls.append(1)
+        return f"Known: {sorted(context_variables)}"
+
+    agent = Agent(name="A", model="fake/model", instructions=instructions)
+    manifest = get_manifest(agent)
+    cache = InstructionsCache()
+
+    for context in [{"a": 1}, {"a": 1}, {"a": 1, "b": 2}]:
+        cache.system_prompt(agent, manifest, ContextVariables(context), lambda view: agent.instructions(view))
+
+    assert len(calls) == 2
@@ -0,0 +1,152 @@
+import asyncio
+import functools
+
+from anthill import Anthill, Agent
+from anthill.completion_cache import InMemoryCompletionCache
+from anthill.invoker import ToolInvoker
+from anthill.manifest import get_manifest
+from anthill.tool_cache import cached_tool
+from tests.fake_client import AsyncFakeClient, FakeClient
+
+
+class Inventory:
+    def __init__(self, stock):
+        self.stock = stock
+
+    def check_stock(self, item):
+        """Check the stock of an item."""
+        return f"{self.stock.get(item, 0)} {item} left"
+
+
+class Greeter:
+    """Greets a user."""
+
+    def __call__(self, name, context_variables):
+        return f"Hello {name} from {context_variables['store']}"
+
+
+class AsyncGreeter:
+    async def __call__(self, name):
+        return f"Hi {name}"
+
+
+def convert(amount: float, currency: str, rate: float = 1.0):
+    """Convert an amount."""
+    return f"{amount * rate:.2f} {currency}"
+
+
+def no_context(item):
+    context_variables = {"shadowed": True}
+    return f"{item}: {context_variables}"
+
+
+def test_signature_analysis():
+    assert ToolInvoker(Greeter()).takes_context
+    assert not ToolInvoker(no_context).takes_context
+    assert ToolInvoker(Inventory({}).check_stock).name == "check_stock"
+
+    invoker = ToolInvoker(functools.partial(convert, rate=2.0))
+    assert invoker.name == "convert"
+    assert invoker.doc == "Convert an amount."
+    assert invoker({"amount": 3, "currency": "EUR"}) == "6.00 EUR"
+
+    greeter = ToolInvoker(Greeter())
+    assert greeter.name == "Greeter" and greeter.doc == "Greets a user."
+    assert ToolInvoker(AsyncGreeter()).is_async
+
+
+def test_arguments_read_from_the_validated_model():
+    manifest = get_manifest(Agent(name="A", model="fake/model", functions=[convert]))
+    model = manifest.model_map["convert"](func_name="convert", amount=2, currency="USD")
+    invoker = manifest.invokers["convert"]
+
+    # fields the model didn't set keep the function's defaults
+    assert invoker.arguments(model) == {"amount": 2, "currency": "USD"}
+    assert invoker(invoker.arguments(model)) == "2.00 USD"
+
+
+def test_run_with_methods_partials_and_instances():
+    inventory = Inventory({"pear": 3})
+    agent = Agent(name="A", model="fake/model",
+                  functions=[inventory.check_stock, functools.partial(convert, rate=0.5), Greeter(), no_context])
+    client = FakeClient([[
+        ("check_stock", {"item": "pear"}),
+        ("convert", {"amount": 10, "currency": "GBP"}),
+        ("Greeter", {"name": "Ann"}),
+        ("no_context", {"item": "plum"}),
+    ], "Done."])
+
+    response = Anthill(client=client).run(agent=agent, messages=[], context_variables={"store": "Main St"})
+
+    results = [m["content"] for m in response.messages if m["role"] == "tool"]
+    assert results == [
+        "Tool check_stock finished with status: 3 pear left",
+        "Tool convert finished with status: 5.00 GBP",
+        "Tool Greeter finished with status: Hello Ann from Main St",
+        "Tool no_context finished with status: plum: {'shadowed': True}",
+    ]
+    assert "Check the stock of an item." in client.calls[0]["system"]
+
+
+def test_async_callable_instance_runs_on_the_loop():
+    agent = Agent(name="A", model="fake/model", functions=[AsyncGreeter()])
+    client = AsyncFakeClient([[("AsyncGreeter", {"name": "Bo"})], "Done."])
+
+    response = asyncio.run(Anthill(client=client).arun(agent=agent, messages=[]))
+
+    assert response.messages[1]["content"] == "Tool AsyncGreeter finished with status: Hi Bo"
+
+
+def test_cached_tools_go_through_the_invoker():
+    calls = []
+
+    @cached_tool
+    def lookup(item):
+        calls.append(item)
+        return item.upper()
+
+    invoker = ToolInvoker(lookup)
+    assert invoker({"item": "a"}) == invoker({"item": "a"}) == "A"
+    assert calls == ["a"]
+
+
+def test_every_path_passes_the_same_arguments():
+    calls = []
+
+    def weather(city: str = "Paris", days: int = 3):
+        """Forecast."""
+        calls.append((city, days))
+        return "sunny"
+
+    agent = Agent(name="A", model="fake/model", functions=[weather])
+    script = [[("weather", {}), ("weather", {"days": 1})], "Done."]
+    expected = [("Paris", 3), ("Paris", 1)]
+
+    def run(anthill, **kwargs):
+        calls.clear()
+        result = anthill.run(agent=agent, messages=[], **kwargs)
+        if kwargs.get("stream"):
+            list(result)
+        return list(calls)
+
+    async def arun_stream(anthill):
+        calls.clear()
+        async for _ in anthill.arun_stream(agent=agent, messages=[]):
+            pass
+        return list(calls)
+
+    async def arun(anthill):
+        calls.clear()
+        await anthill.arun(agent=agent, messages=[])
+        return list(calls)
+
+    assert run(Anthill(client=FakeClient(script))) == expected
+    assert run(Anthill(client=FakeClient(script)), stream=True) == expected
+    assert run(Anthill(client=FakeClient(script)), stream=True, early_tool_dispatch=True) == expected
+    assert asyncio.run(arun(Anthill(client=AsyncFakeClient(script)))) == expected
+    assert asyncio.run(arun_stream(Anthill(client=AsyncFakeClient(script)))) == expected
+
+    cached = Anthill(client=FakeClient(script), completion_cache=InMemoryCompletionCache())
+    run(cached)
+    assert run(cached) == expected  # replayed from the cache
+    assert run(cached, stream=True) == expected
@@ -0,0 +1,45 @@
+from anthill import Anthill, Agent
+from anthill.manifest import clear_manifest_cache, get_manifest
+from tests.fake_client import FakeClient
+
+
+def get_weather(location):
+    """Get the weather for a location."""
+    return f"It's sunny in {location}."
+
+
+def get_time(context_variables):
+    return "noon"
+
+
+def test_manifest_is_shared_across_agents_with_same_functions():
+    clear_manifest_cache()
+    agent_a = Agent(name="A", model="fake/model", functions=[get_weather])
+    agent_b = Agent(name="B", model="fake/model", functions=[get_weather])
+
+    manifest = get_manifest(agent_a)
+    assert get_manifest(agent_b) is manifest
+    assert manifest.tool_map == {"get_weather": get_weather}
+    assert [t["name"] for t in manifest.tool_list] == ["get_weather", "agent_response"]
+
+
+def test_manifest_invalidated_when_functions_change():
+    agent = Agent(name="A", model="fake/model", functions=[get_weather])
+    manifest = get_manifest(agent)
+
+    agent.functions.append(get_time)
+    updated = get_manifest(agent)
+    assert updated is not manifest
+    assert set(updated.tool_map) == {"get_weather", "get_time"}
+    assert "context_variables" not in updated.models[1].model_fields
+
+
+def test_run_reuses_manifest_across_turns():
+    clear_manifest_cache()
+    agent = Agent(name="A", model="fake/model", functions=[get_weather])
+    client = FakeClient([[("get_weather", {"location": "Paris"})], "Sunny!"])
+
+    response = Anthill(client=client).run(agent=agent, messages=[{"role": "user", "content": "Weather?"}])
+
+    assert response.messages[-1]["content"] == "Sunny!"
+    assert client.calls[0]["response_type"] is client.calls[1]["response_type"]
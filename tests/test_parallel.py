@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import anthill.core
+from anthill import Anthill, Agent
+from anthill.types import Result
+from tests.fake_client import FakeClient
+
+other_agent = Agent(name="Other", model="fake/model")
+last_agent = Agent(name="Last", model="fake/model")
+
+
+def slow_lookup(key):
+    time.sleep(0.2 if key == "a" else 0.05)
+    return Result(value=f"value {key}", context_variables={"last": key, key: True})
+
+
+def transfer_to_other():
+    return other_agent
+
+
+def transfer_to_last():
+    return last_agent
+
+
+def make_agent(**kwargs):
+    return Agent(name="A", model="fake/model", functions=[slow_lookup, transfer_to_other, transfer_to_last], **kwargs)
+
+
+SCRIPT = [
+    [("slow_lookup", {"key": "a"}), ("slow_lookup", {"key": "b"}), ("slow_lookup", {"key": "c"})],
+    "Done.",
+]
+
+
+def run(agent, **kwargs):
+    client = Anthill(client=FakeClient(SCRIPT))
+    start = time.perf_counter()
+    response = client.run(agent=agent, messages=[{"role": "user", "content": "Go"}], **kwargs)
+    return response, time.perf_counter() - start
+
+
+def test_parallel_results_keep_call_order():
+    response, elapsed = run(make_agent(parallel_tool_calls=True))
+
+    assert elapsed < 0.3
+    assert [m["content"] for m in response.messages[1:4]] == [
+        "Tool slow_lookup finished with status: value a",
+        "Tool slow_lookup finished with status: value b",
+        "Tool slow_lookup finished with status: value c",
+    ]
+    # context updates are merged in call order, so the last call wins
+    assert response.context_variables == {"last": "c", "a": True, "b": True, "c": True}
+
+
+def test_run_kwarg_overrides_agent_setting():
+    _, elapsed = run(make_agent(parallel_tool_calls=True), parallel_tool_calls=False)
+    assert elapsed >= 0.3
+
+    _, elapsed = run(make_agent(), parallel_tool_calls=True)
+    assert elapsed < 0.3
+
+
+def test_last_handoff_wins():
+    script = [[("transfer_to_last", {}), ("transfer_to_other", {})], "Hi."]
+    client = Anthill(client=FakeClient(script))
+    response = client.run(agent=make_agent(parallel_tool_calls=True), messages=[{"role": "user", "content": "Go"}])
+    assert response.agent.name == "Other"
+
+
+def test_arun_parallel():
+    client = Anthill(client=FakeClient(SCRIPT))
+    start = time.perf_counter()
+    response = asyncio.run(client.arun(agent=make_agent(), messages=[{"role": "user", "content": "Go"}],
+                                       parallel_tool_calls=True))
+
+    assert time.perf_counter() - start < 0.3
+    assert response.context_variables["last"] == "c"
+
+
+class SlowCopyList(list):
+    def __deepcopy__(self, memo):
+        items = list(self)
+        time.sleep(0.05)
+        return SlowCopyList(items)
+
+
+def test_parallel_calls_share_the_first_copy_of_a_context_value():
+    def add_to_cart(item, context_variables):
+        context_variables["cart"].append(item)
+        return "Added"
+
+    agent = Agent(name="A", model="fake/model", functions=[add_to_cart], parallel_tool_calls=True)
+    script = [[("add_to_cart", {"item": "pear"}), ("add_to_cart", {"item": "plum"})], "Done."]
+
+    cart = SlowCopyList(["apple"])
+    response = Anthill(client=FakeClient(script)).run(agent=agent, messages=[], context_variables={"cart": cart})
+
+    assert sorted(response.context_variables["cart"]) == ["apple", "pear", "plum"]
+    assert cart == ["apple"]
+
+
+def test_concurrent_runs_share_one_pool(monkeypatch):
+    class SlowPool(ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.02)  # widen the window between the check and the assignment
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(anthill.core, "ThreadPoolExecutor", SlowPool)
+    client = Anthill(client=FakeClient(["Done."]))
+    barrier = threading.Barrier(4)
+    pools = []
+
+    def reach():
+        barrier.wait()
+        pools.append(client.tool_executor)
+
+    threads = [threading.Thread(target=reach) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(pool) for pool in pools}) == 1
+    client.close()
@@ -0,0 +1,40 @@
+from jinja2 import Environment
+
+from anthill.prompt import PROMPT, build_prompt, clear_prompt_cache, get_template
+
+
+TOOL_LIST = [
+    {"name": "get_weather", "doc": "Get the weather for a location."},
+    {"name": "agent_response", "doc": "Use this tool to answer/ask to user"},
+]
+
+
+def render_uncached(source, agent_name, instructions, tool_list):
+    return Environment().from_string(source).render(
+        agent_name=agent_name, instructions=instructions, tool_list=tool_list
+    )
+
+
+def test_build_prompt_matches_full_render():
+    clear_prompt_cache()
+    for instructions in ["You are a helpful agent.", "- one\n- two", ""]:
+        expected = render_uncached(PROMPT, "Weather Agent", instructions, TOOL_LIST)
+        assert build_prompt("Weather Agent", instructions, TOOL_LIST) == expected
+
+
+def test_template_compiled_once():
+    clear_prompt_cache()
+    build_prompt("Agent", "first", TOOL_LIST)
+    build_prompt("Agent", "second", TOOL_LIST)
+    build_prompt("Other Agent", "third", [])
+    assert get_template.cache_info().misses == 1
+
+
+def test_custom_template():
+    template = "{{ agent_name }} says: {{ instructions }}"
+    assert build_prompt("Agent", "hello", [], template=template) == "Agent says: hello"
+
+
+def test_custom_template_without_single_instructions_slot():
+    template = "{{ instructions | upper }} / {{ instructions }}"
+    assert build_prompt("Agent", "hi", [], template=template) == "HI / hi"
@@ -0,0 +1,149 @@
+import asyncio
+
+from anthill import Anthill, Agent
+from anthill.history import MessageRecord
+from anthill.tracing import RecordingTracer
+from anthill.reduction import (
+    DropToolChatter,
+    HistoryPipeline,
+    RollingSummary,
+    TokenWindow,
+    TruncateToolResults,
+    entry_tokens,
+    history_tokens,
+)
+from tests.fake_client import FakeClient
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+def assistant(text):
+    return {"role": "assistant", "sender": "A", "content": text, "tool_calls": None}
+
+
+def tool_call(name):
+    return {"role": "assistant", "sender": "A", "content": None, "tool_calls": [{"name": name, "arguments": {}}]}
+
+
+def tool_result(name, text="ok"):
+    return {"role": "tool", "tool_name": name, "content": f"Tool {name} finished with status: {text}"}
+
+
+def conversation(turns):
+    entries = []
+    for i in range(turns):
+        entries += [user(f"question {i} " + "x" * 40), tool_call("lookup"), tool_result("lookup"),
+                    assistant(f"answer {i} " + "y" * 40)]
+    return entries
+
+
+def test_token_window_keeps_recent_entries_within_budget():
+    entries = conversation(20)
+
+    reduced = TokenWindow(max_tokens=100, keep_first=1)(entries)
+
+    assert reduced[0] == entries[0]
+    assert reduced[-1] == entries[-1]
+    assert history_tokens(reduced) <= 100
+    assert reduced[1]["role"] != "tool"
+    assert TokenWindow(max_tokens=10_000)(entries) is entries
+
+
+def test_truncate_tool_results_keeps_the_last_one():
+    entries = [user("hi"), tool_result("a", "z" * 100), tool_result("b", "z" * 100)]
+
+    reduced = TruncateToolResults(max_chars=20, keep_last=1)(entries)
+
+    assert reduced[1]["content"].endswith("characters truncated]")
+    assert reduced[2] is entries[2]
+    assert entries[1]["content"].endswith("z")
+
+
+def test_drop_tool_chatter_before_last_turn():
+    entries = conversation(3)
+
+    reduced = DropToolChatter()(entries)
+
+    assert [e["role"] for e in reduced] == ["user", "assistant", "user", "assistant",
+                                            "user", "assistant", "tool", "assistant"]
+
+
+def test_rolling_summary_only_summarizes_new_entries():
+    calls = []
+
+    def summarize(previous, entries):
+        calls.append(len(entries))
+        return f"{previous}+{len(entries)}"
+
+    policy = RollingSummary(summarize, max_tokens=120, keep_tokens=60)
+    entries = conversation(4)
+
+    first = policy(entries)
+    entries += conversation(6)[16:]
+    second = policy(entries)
+
+    assert first[0]["content"].startswith("Summary of the earlier conversation: ")
+    assert len(calls) == 2
+    assert sum(calls) == len(entries) - (len(second) - 1)
+    assert second[-1] == entries[-1]
+
+
+def test_rolling_summary_is_not_shared_by_conversations_differing_in_the_middle():
+    def summarize(previous, entries):
+        return previous + "|" + ",".join(entry["content"] or "" for entry in entries)
+
+    policy = RollingSummary(summarize, max_tokens=120, keep_tokens=60)
+    alice = conversation(4)
+    alice[4] = user("alice-password")
+    bob = conversation(4)
+    bob[4] = user("bob-question")
+
+    policy(alice)
+    reduced = policy(bob)
+
+    assert "bob-question" in reduced[0]["content"]
+    assert "alice-password" not in reduced[0]["content"]
+
+
+def test_entry_tokens_are_memoized_on_records():
+    record = MessageRecord.from_dict(user("question " + "x" * 40))
+
+    assert record._tokens is None
+    tokens = entry_tokens(record)
+    assert record._tokens == tokens == entry_tokens(user("question " + "x" * 40))
+
+
+def test_agent_history_policy_is_applied_before_the_completion():
+    client = FakeClient(["Done."])
+    agent = Agent(name="A", model="fake/model",
+                  history_policy=HistoryPipeline(DropToolChatter(), TokenWindow(max_tokens=60)))
+
+    response = Anthill(client=client, tracer=RecordingTracer()).run(
+        agent=agent, messages=conversation(10) + [user("last")])
+
+    sent = client.calls[0]["messages"]
+    assert sent[-1]["content"] == "last"
+    assert len(sent) < 10
+    assert response.metrics.timings["history_reduction"] >= 0
+
+
+def test_async_runs_reduce_the_history_off_the_event_loop():
+    loops = []
+
+    def summarize(previous, entries):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return "earlier questions"
+
+    agent = Agent(name="A", model="fake/model",
+                  history_policy=RollingSummary(summarize, max_tokens=120, keep_tokens=60))
+    client = FakeClient(["Done."])
+
+    asyncio.run(Anthill(client=client).arun(agent=agent, messages=conversation(4)))
+
+    assert loops == [None]
+    assert "earlier questions" in client.calls[0]["messages"][0]["content"]
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+from pulsar.client import RetryableAPIError
+
+from anthill import Anthill, Agent
+from anthill.clients import ClientManager
+from anthill.scheduler import PRIORITY_BATCH, RequestScheduler, TokenBucket, request_priority
+from anthill.tracing import RecordingTracer
+from tests.fake_client import FakeClient
+
+
+def rate_limited(retry_after=None):
+    return RetryableAPIError(message="rate limit reached", status_code=429, retry_after=retry_after)
+
+
+def make_agent():
+    return Agent(name="A", model="fake/model")
+
+
+def test_retries_retryable_errors_and_records_metrics():
+    sleeps = []
+    client = FakeClient(["Hello!"], failures=[rate_limited(), rate_limited(2.5)])
+    scheduler = RequestScheduler(client, base_delay=0.1, sleep=sleeps.append)
+
+    response = Anthill(client=scheduler).run(agent=make_agent(), messages=[{"role": "user", "content": "Hi"}])
+
+    assert response.messages[-1]["content"] == "Hello!"
+    assert len(client.calls) == 3
+    assert sleeps[0] <= 0.1
+    assert sleeps[1] == 2.5
+    assert response.metrics.retries == 2
+    assert scheduler.stats.retries == 2
+
+
+def test_gives_up_after_max_retries_and_on_other_errors():
+    scheduler = RequestScheduler(FakeClient(["Hi"], failures=[rate_limited()] * 3), max_retries=2,
+                                 sleep=lambda _: None)
+    with pytest.raises(RetryableAPIError):
+        scheduler.chat_completion(messages=[], model="fake/model")
+
+    scheduler = RequestScheduler(FakeClient(["Hi"], failures=[ValueError("bad request")]))
+    with pytest.raises(ValueError):
+        scheduler.chat_completion(messages=[], model="fake/model")
+    assert scheduler.stats.retries == 0
+    assert scheduler.stats.failures == 1
+
+
+def test_stream_retries_before_the_first_chunk():
+    client = FakeClient(["Streamed!"], failures=[ConnectionError("reset")])
+    scheduler = RequestScheduler(client, sleep=lambda _: None)
+
+    chunks = list(Anthill(client=scheduler).run(
+        agent=make_agent(), messages=[{"role": "user", "content": "Hi"}], stream=True))
+
+    assert chunks[-1]["response"].messages[-1]["content"] == "Streamed!"
+    assert chunks[-1]["response"].metrics.retries == 1
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=10, capacity=1)
+
+    assert bucket.take() == 0
+    assert 0 < bucket.take() <= 0.1
+
+
+def test_token_bucket_throttles_and_recovers():
+    bucket = TokenBucket(rate=10, capacity=1)
+    bucket.take()
+
+    bucket.throttle(retry_after=0.5)
+    assert bucket.rate == 5
+    assert 0.6 < bucket.take() <= 0.7  # the retry-after, then one token at the halved rate
+
+    for _ in range(10):
+        bucket.recover()
+    assert bucket.rate == 10
+
+
+def test_rate_limited_calls_slow_the_lane_down():
+    client = FakeClient(["Hi"], failures=[rate_limited(1.0), rate_limited()])
+    scheduler = RequestScheduler(client, rate_limits={"fake": 100}, sleep=lambda _: None)
+
+    scheduler.chat_completion(messages=[], model="fake/model")
+
+    assert scheduler.stats.throttles == 2
+    assert scheduler._lane("fake/model").bucket.rate == 25 + 10  # halved twice, then one success
+
+
+class RetriesClientManager(ClientManager):
+    """Records the provider retries each call asks for, and answers without a provider."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.retries = []
+
+    def chat_completion(self, messages, model, stream=False, max_retries=None, **kwargs):
+        self.retries.append(max_retries)
+        return FakeClient(["Hi"]).chat_completion(messages, model, stream=stream, **kwargs)
+
+
+def test_only_the_scheduler_retries():
+    manager = RetriesClientManager(max_retries=2)
+
+    RequestScheduler(manager).chat_completion(messages=[], model="fake/model")
+    list(RequestScheduler(manager).chat_completion(messages=[], model="fake/model", stream=True))
+    RequestScheduler(manager, max_retries=0).chat_completion(messages=[], model="fake/model")
+
+    assert manager.retries == [0, 0, None]
+    # the shared manager itself keeps its retries
+    assert manager.max_retries == 2
+
+    manager = ClientManager(provider_kwargs={"openaiapilike": {"base_url": "http://127.0.0.1:1"}}, max_retries=2)
+    assert manager.provider_client("openaiapilike").max_retries == 2
+    assert manager.provider_client("openaiapilike", max_retries=0).max_retries == 0
+    assert manager.provider_client("openaiapilike") is not manager.provider_client("openaiapilike", 0)
+
+
+def test_rate_limit_queues_and_reports_wait():
+    scheduler = RequestScheduler(FakeClient(["Hi"]), rate_limits={"fake": 20}, burst={"fake": 1})
+
+    responses = [Anthill(client=scheduler, tracer=RecordingTracer()).run(
+        agent=make_agent(), messages=[{"role": "user", "content": "Hi"}]) for _ in range(3)]
+
+    assert responses[-1].metrics.timings["queue_wait"] > 0.02
+    assert scheduler.stats.max_queue_wait > 0.02
+    assert scheduler.wait_turn("other/model") == 0
+
+
+def test_interactive_requests_go_before_batch():
+    scheduler = RequestScheduler(FakeClient(["Hi"]), rate_limits={"fake/model": 10}, burst={"fake/model": 1})
+    scheduler.wait_turn("fake/model")  # empty the bucket
+    order = []
+
+    def request(name, priority):
+        with request_priority(priority):
+            scheduler.wait_turn("fake/model", priority)
+        order.append(name)
+
+    batch = [threading.Thread(target=request, args=(f"batch{i}", PRIORITY_BATCH)) for i in range(2)]
+    for thread in batch:
+        thread.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=request, args=("interactive", 0))
+    interactive.start()
+    for thread in batch + [interactive]:
+        thread.join()
+
+    assert order[0] == "interactive"
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from anthill import Anthill, Agent
+from anthill.sessions import JsonLinesSessionStore, SQLiteSessionStore
+from tests.fake_client import FakeClient
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "jsonl":
+        yield JsonLinesSessionStore(str(tmp_path / "sessions"))
+    else:
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        yield store
+        store.close()
+
+
+def make_messages(n):
+    return [{"role": "user", "content": f"message {i}"} for i in range(n)]
+
+
+def test_append_and_load(store):
+    store.append("s1", make_messages(3))
+    store.append("s1", make_messages(5)[3:])
+    store.append("s2", make_messages(1))
+
+    assert store.load("s1") == make_messages(5)
+    assert store.load("s1", last=2) == make_messages(5)[3:]
+    assert store.load("missing") == []
+    assert store.sessions() == ["s1", "s2"]
+
+
+def test_load_buffer_is_a_copy_kept_up_to_date(store):
+    store.append("s1", make_messages(2))
+    buffer = store.load_buffer("s1")
+    buffer.append({"role": "user", "content": "not stored"})
+
+    store.append("s1", make_messages(3)[2:])
+
+    assert list(store.load_buffer("s1")) == make_messages(3)
+
+
+def test_compact_keeps_last_messages(store):
+    for message in make_messages(10):
+        store.append("s1", [message])
+
+    store.compact("s1", keep_last=4)
+
+    assert store.load("s1") == make_messages(10)[6:]
+    assert list(store.load_buffer("s1")) == make_messages(10)[6:]
+
+
+def test_import_logs(store, tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    session = [{"task_id": "t", "role": "user", "content": "Hi"},
+               {"task_id": "t", "role": "assistant", "content": "Hello"}]
+    (logs / "session_20240402-112114.json").write_text(json.dumps(session))
+
+    imported = store.import_logs(str(logs / "session_*.json"))
+
+    assert imported == ["session_20240402-112114"]
+    assert store.load("session_20240402-112114") == session
+    assert store.import_logs(str(logs / "session_*.json")) == []
+
+
+def test_run_with_session_appends_only_new_messages(store):
+    agent = Agent(name="A", model="fake/model")
+    client = FakeClient(["First answer.", "Second answer."])
+    anthill = Anthill(client=client, session_store=store)
+
+    first = anthill.run(agent=agent, messages=[{"role": "user", "content": "One"}], session_id="s1")
+    second = anthill.run(agent=agent, messages=[{"role": "user", "content": "Two"}], session_id="s1")
+
+    assert [m["content"] for m in first.messages] == ["First answer."]
+    assert [m["content"] for m in second.messages] == ["Second answer."]
+    assert [m["content"] for m in store.load("s1")] == ["One", "First answer.", "Two", "Second answer."]
+    assert [m["content"] for m in client.calls[-1]["messages"]] == ["One", "First answer.", "Two"]
+
+
+def test_stream_with_session(store):
+    agent = Agent(name="A", model="fake/model")
+    anthill = Anthill(client=FakeClient(["Streamed."]), session_store=store)
+
+    list(anthill.run(agent=agent, messages=[{"role": "user", "content": "Hi"}], stream=True, session_id="s1"))
+
+    assert [m["content"] for m in store.load("s1")] == ["Hi", "Streamed."]
+
+
+def test_session_id_requires_a_store():
+    agent = Agent(name="A", model="fake/model")
+
+    with pytest.raises(ValueError):
+        Anthill(client=FakeClient(["Hi"])).run(agent=agent, messages=[], session_id="s1")
@@ -0,0 +1,88 @@
+import asyncio
+
+from anthill import Anthill, Agent
+from anthill.manifest import get_manifest
+from anthill.stream import ContentDelta, DeltaTracker, ToolCallArgsDelta, ToolCallEnd, ToolCallStart
+from anthill.types import AgentResponse
+from tests.fake_client import AsyncFakeClient, FakeClient
+
+
+def get_weather(location):
+    return f"It's sunny in {location}."
+
+
+def make_agent():
+    return Agent(name="A", model="fake/model", functions=[get_weather])
+
+
+def events_of(chunks):
+    return [c for c in chunks if not isinstance(c, dict)]
+
+
+def test_content_deltas_concatenate_to_the_message():
+    client = FakeClient(["Hello there, friend!"], chunk_size=4)
+
+    chunks = list(Anthill(client=client).run_and_stream(
+        agent=make_agent(), messages=[{"role": "user", "content": "Hi"}], stream_deltas=True))
+
+    deltas = events_of(chunks)
+    assert all(isinstance(d, ContentDelta) and d.sender == "A" for d in deltas)
+    assert "".join(d.delta for d in deltas) == "Hello there, friend!"
+    assert chunks[-1]["response"].messages[-1]["content"] == "Hello there, friend!"
+
+
+def test_tool_call_events_and_final_history():
+    client = FakeClient([[("get_weather", {"location": "Paris"}), ("get_weather", {"location": "Rome"})], "Done."])
+
+    chunks = list(Anthill(client=client).run_and_stream(
+        agent=make_agent(), messages=[{"role": "user", "content": "Hi"}], stream_deltas=True))
+
+    kinds = [type(e).__name__ for e in events_of(chunks)]
+    assert kinds[:6] == ["ToolCallStart", "ToolCallArgsDelta", "ToolCallEnd",
+                         "ToolCallStart", "ToolCallArgsDelta", "ToolCallEnd"]
+    ends = [e for e in events_of(chunks) if isinstance(e, ToolCallEnd)]
+    assert [(e.index, e.name, e.arguments) for e in ends] == [
+        (0, "get_weather", {"location": "Paris"}), (1, "get_weather", {"location": "Rome"})]
+
+    response = chunks[-1]["response"]
+    assert response.messages[0]["tool_calls"][1]["arguments"] == {"location": "Rome"}
+    assert response.messages[-1]["content"] == "Done."
+
+
+def test_tracker_only_reports_changed_arguments():
+    model = get_manifest(make_agent()).model_map["get_weather"]
+    tracker = DeltaTracker("A")
+
+    events = tracker.feed([model(func_name="get_weather", location="Pa")])
+    events += tracker.feed([model(func_name="get_weather", location="Pa")])
+    events += tracker.feed([model(func_name="get_weather", location="Paris")])
+    events += tracker.finish()
+
+    assert isinstance(events[0], ToolCallStart)
+    args = [e.arguments for e in events if isinstance(e, ToolCallArgsDelta)]
+    assert args == [{"location": "Pa"}, {"location": "Paris"}]
+    assert events[-1].arguments == {"location": "Paris"}
+
+
+def test_tracker_ignores_repeated_content():
+    tracker = DeltaTracker("A")
+    chunk = AgentResponse(func_name="agent_response", content="Hi")
+
+    assert [e.delta for e in tracker.feed(chunk)] == ["Hi"]
+    assert tracker.feed(chunk) == []
+    assert tracker.finish() == []
+
+
+def test_arun_stream_deltas():
+    client = AsyncFakeClient([[("get_weather", {"location": "Paris"})], "Sunny."])
+
+    async def collect():
+        return [c async for c in Anthill(client=client).arun_stream(
+            agent=make_agent(), messages=[{"role": "user", "content": "Hi"}], stream_deltas=True)]
+
+    chunks = asyncio.run(collect())
+
+    events = events_of(chunks)
+    assert isinstance(events[0], ToolCallStart)
+    assert "".join(e.delta for e in events if isinstance(e, ContentDelta)) == "Sunny."
+    assert chunks[-1]["response"].messages[-1]["content"] == "Sunny."
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+from anthill import Anthill, Agent
+from anthill.timeouts import tool_timeout
+from tests.fake_client import AsyncFakeClient, FakeClient
+
+release = threading.Event()
+
+
+def slow_query(sql):
+    release.wait(5)
+    return "rows"
+
+
+def quick_lookup(item):
+    return f"{item} found"
+
+
+@tool_timeout(0.05)
+def strict_query(sql):
+    release.wait(5)
+    return "rows"
+
+
+def teardown_function():
+    release.set()
+    release.clear()
+
+
+def test_sync_tool_timeout_becomes_error_message():
+    agent = Agent(name="A", model="fake/model", functions=[slow_query, quick_lookup], tool_timeout=0.1)
+    client = FakeClient([[("slow_query", {"sql": "SELECT"}), ("quick_lookup", {"item": "pear"})], "Sorry."])
+
+    start = time.perf_counter()
+    response = Anthill(client=client).run(agent=agent, messages=[])
+
+    assert time.perf_counter() - start < 2
+    timed_out, found = response.messages[1], response.messages[2]
+    assert timed_out == {
+        "role": "tool",
+        "tool_name": "slow_query",
+        "content": "Tool slow_query failed: timed out after 0.1 seconds",
+        "error": {"type": "timeout", "timeout": 0.1},
+    }
+    assert found["content"] == "Tool quick_lookup finished with status: pear found"
+    assert response.metrics.tool_timeouts == 1
+    assert "timed out" in client.calls[-1]["messages"][2]["content"]
+
+
+def test_tool_timeout_overrides_agent_default():
+    agent = Agent(name="A", model="fake/model", functions=[strict_query], tool_timeout=10)
+    client = FakeClient([[("strict_query", {"sql": "SELECT"})], "Sorry."])
+
+    start = time.perf_counter()
+    response = Anthill(client=client).run(agent=agent, messages=[])
+
+    assert time.perf_counter() - start < 2
+    assert response.messages[1]["error"] == {"type": "timeout", "timeout": 0.05}
+
+
+def test_parallel_calls_time_out_independently():
+    agent = Agent(name="A", model="fake/model", functions=[slow_query, quick_lookup],
+                  tool_timeout=0.1, parallel_tool_calls=True)
+    client = FakeClient([[("slow_query", {"sql": "1"}), ("slow_query", {"sql": "2"}),
+                          ("quick_lookup", {"item": "pear"})], "Done."])
+
+    response = Anthill(client=client).run(agent=agent, messages=[])
+
+    assert [m.get("error") is not None for m in response.messages[1:4]] == [True, True, False]
+
+
+def test_async_tool_is_cancelled():
+    cancelled = []
+
+    async def search(query):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(query)
+            raise
+        return "results"
+
+    agent = Agent(name="A", model="fake/model", functions=[search], tool_timeout=0.05)
+    client = AsyncFakeClient([[("search", {"query": "shoes"})], "Nothing."])
+
+    response = asyncio.run(Anthill(client=client).arun(agent=agent, messages=[]))
+
+    assert cancelled == ["shoes"]
+    assert response.messages[1]["error"]["type"] == "timeout"
+
+
+def test_run_budget_bounds_turns_and_tool_calls():
+    def wait_a_bit(step):
+        time.sleep(0.05)
+        return "waited"
+
+    agent = Agent(name="A", model="fake/model", functions=[wait_a_bit, slow_query])
+    client = FakeClient([[("wait_a_bit", {"step": "1"})], [("wait_a_bit", {"step": "2"})],
+                         [("slow_query", {"sql": "SELECT"})]])
+
+    start = time.perf_counter()
+    response = Anthill(client=client).run(agent=agent, messages=[], max_duration=0.3)
+
+    assert time.perf_counter() - start < 2
+    assert response.metrics.deadline_exceeded
+    # the hung call only got what was left of the budget
+    assert response.messages[-1]["error"]["type"] == "timeout"
+    assert response.messages[-1]["error"]["timeout"] < 0.3
+
+
+def test_timed_out_call_cannot_change_the_context():
+    def book(seat, context_variables):
+        context_variables["seat"] = seat
+        context_variables["log"].append(seat)
+        return "Booked"
+
+    def stuck_booking(seat, context_variables):
+        release.wait(5)
+        context_variables["seat"] = seat
+        context_variables["log"].append(seat)
+        return "Booked"
+
+    agent = Agent(name="A", model="fake/model", functions=[book, stuck_booking], tool_timeout=0.1)
+    client = FakeClient([[("book", {"seat": "12A"}), ("stuck_booking", {"seat": "14C"})], "Done."])
+    context = {"log": []}
+
+    with Anthill(client=client) as anthill:
+        response = anthill.run(agent=agent, messages=[], context_variables=context)
+        release.set()
+        time.sleep(0.05)
+
+    assert response.messages[2]["error"]["type"] == "timeout"
+    assert response.context_variables == {"seat": "12A", "log": ["12A"]}
+    assert context == {"log": []}
+
+
+def test_calls_queued_behind_hung_ones_report_no_free_worker():
+    agent = Agent(name="A", model="fake/model", functions=[slow_query, quick_lookup], tool_timeout=0.1)
+    client = FakeClient([[("slow_query", {"sql": "SELECT"}), ("quick_lookup", {"item": "pear"})], "Sorry."])
+
+    with Anthill(client=client, max_timed_tool_workers=1) as anthill:
+        response = anthill.run(agent=agent, messages=[])
+
+    assert response.messages[1]["content"] == "Tool slow_query failed: timed out after 0.1 seconds"
+    assert response.messages[2]["content"] == (
+        "Tool quick_lookup failed: no worker was free to start it within 0.1 seconds")
+    assert response.messages[2]["error"] == {"type": "timeout", "timeout": 0.1, "started": False}
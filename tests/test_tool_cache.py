@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from anthill import Anthill, Agent
+from anthill.tool_cache import ToolCache, cached_tool
+from tests.fake_client import FakeClient
+
+
+def test_lru_eviction_and_counters():
+    cache = ToolCache(maxsize=2)
+    calls = []
+
+    def lookup(key):
+        calls.append(key)
+        return key.upper()
+
+    for key in ["a", "b", "a", "c", "b"]:
+        cache.call(lookup, {"key": key})
+
+    # "b" was the least recently used when "c" was added
+    assert calls == ["a", "b", "c", "b"]
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (1, 4, 2, 2)
+
+
+def test_ttl_expiry():
+    cache = ToolCache(ttl=0.05)
+    assert cache.call(lambda x: [x], {"x": 1}) == [1]
+    assert cache.cache_info().hits == 0
+    cache.call(lambda x: [x], {"x": 1})
+    assert cache.cache_info().hits == 1
+
+    time.sleep(0.06)
+    cache.call(lambda x: [x], {"x": 1})
+    assert cache.cache_info().misses == 2
+
+
+def test_key_ignores_context_unless_asked():
+    args_a = {"x": 1, "context_variables": {"user": "a"}}
+    args_b = {"x": 1, "context_variables": {"user": "b"}}
+
+    assert ToolCache().make_key(args_a) == ToolCache().make_key(args_b)
+    assert ToolCache(include_context=True).make_key(args_a) != ToolCache(include_context=True).make_key(args_b)
+    assert ToolCache().make_key({"a": 1, "b": 2}) == ToolCache().make_key({"b": 2, "a": 1})
+
+
+def test_run_uses_tool_cache():
+    calls = []
+
+    @cached_tool
+    def get_price(item_id):
+        calls.append(item_id)
+        return "10$"
+
+    agent = Agent(name="A", model="fake/model", functions=[get_price])
+    script = [[("get_price", {"item_id": "1"})], [("get_price", {"item_id": "1"})], "It costs 10$."]
+    client = Anthill(client=FakeClient(script))
+    response = client.run(agent=agent, messages=[{"role": "user", "content": "Price?"}])
+
+    assert calls == ["1"]
+    assert response.messages[3]["content"] == "Tool get_price finished with status: 10$"
+    assert get_price.tool_cache.cache_info().hits == 1
+
+
+def test_arun_caches_async_tools():
+    calls = []
+
+    @cached_tool(maxsize=10)
+    async def get_stock(item_id):
+        calls.append(item_id)
+        return "in stock"
+
+    agent = Agent(name="A", model="fake/model", functions=[get_stock])
+    script = [[("get_stock", {"item_id": "1"}), ("get_stock", {"item_id": "1"})], "In stock."]
+    client = Anthill(client=FakeClient(script))
+    asyncio.run(client.arun(agent=agent, messages=[{"role": "user", "content": "Stock?"}]))
+
+    assert calls == ["1"]
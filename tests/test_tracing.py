@@ -0,0 +1,77 @@
+import json
+import time
+
+from anthill import Anthill, Agent
+from anthill.tracing import JsonLinesExporter, RecordingTracer
+from tests.fake_client import FakeClient
+
+support_agent = Agent(name="Support", model="fake/model")
+
+
+def lookup(item_id):
+    time.sleep(0.01)
+    return "in stock"
+
+
+def transfer_to_support():
+    return support_agent
+
+
+AGENT = Agent(name="Sales", model="fake/model", functions=[lookup, transfer_to_support])
+SCRIPT = [[("lookup", {"item_id": "1"}), ("transfer_to_support", {})], "How can I help?"]
+MESSAGES = [{"role": "user", "content": "Is item 1 in stock?"}]
+
+
+def test_response_metrics():
+    response = Anthill(client=FakeClient(SCRIPT)).run(agent=AGENT, messages=MESSAGES)
+    metrics = response.metrics
+
+    assert (metrics.model_calls, metrics.tool_calls, metrics.handoffs, metrics.messages) == (2, 2, 1, 4)
+    assert metrics.estimated_prompt_tokens > 0 and metrics.estimated_completion_tokens > 0
+    assert metrics.duration >= 0.01
+    assert metrics.time_to_first_chunk is None
+    # without a tracer steps are counted, not timed
+    assert metrics.timings == {}
+
+
+def test_tracer_times_steps():
+    response = Anthill(client=FakeClient(SCRIPT), tracer=RecordingTracer()).run(agent=AGENT, messages=MESSAGES)
+    metrics = response.metrics
+
+    assert (metrics.model_calls, metrics.tool_calls, metrics.handoffs) == (2, 2, 1)
+    assert metrics.timings["tool_call"] >= 0.01
+    assert {"prompt_build", "schema_build", "model_call"} <= set(metrics.timings)
+    assert metrics.duration >= metrics.timings["tool_call"]
+
+
+def test_recording_tracer_spans():
+    tracer = RecordingTracer()
+    Anthill(client=FakeClient(SCRIPT), tracer=tracer).run(agent=AGENT, messages=MESSAGES)
+
+    names = [span.name for span in tracer.spans]
+    assert names.count("model_call") == 2
+    assert names.count("prompt_build") == 2
+    assert names[-1] == "run"
+    assert len({span.run_id for span in tracer.spans}) == 1
+    handoff = next(span for span in tracer.spans if span.name == "handoff")
+    assert handoff.attributes == {"from": "Sales", "to": "Support"}
+    assert [s.attributes["tool"] for s in tracer.spans if s.name == "tool_call"] == ["lookup", "transfer_to_support"]
+
+
+def test_stream_time_to_first_chunk():
+    chunks = list(Anthill(client=FakeClient(["Hello there!"])).run(agent=AGENT, messages=MESSAGES, stream=True))
+    metrics = chunks[-1]["response"].metrics
+
+    assert metrics.time_to_first_chunk is not None
+    assert metrics.model_calls == 1
+
+
+def test_json_lines_exporter(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = JsonLinesExporter(str(path))
+    Anthill(client=FakeClient(SCRIPT), tracer=exporter).run(agent=AGENT, messages=MESSAGES)
+    exporter.close()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert spans[-1]["name"] == "run"
+    assert set(spans[0]) == {"run_id", "name", "start", "duration", "attributes"}